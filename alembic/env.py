@@ -2,11 +2,14 @@ import asyncio
 from logging.config import fileConfig
 
 from sqlalchemy import pool
-from sqlalchemy.ext.asyncio import async_engine_from_config
+from sqlalchemy.ext.asyncio import create_async_engine
 
 from alembic import context
 from app.configs.config import settings
 from app.database.database import Base
+from app.models.accrual import AccrualEntry, AccrualRun  # noqa: F401
+from app.models.hold import Hold  # noqa: F401
+from app.models.operation import Operation  # noqa: F401
 from app.models.wallet import Wallet  # noqa: F401
 
 config = context.config
@@ -37,14 +40,12 @@ def do_run_migrations(connection):
 
 
 async def run_async_migrations() -> None:
-    connectable = async_engine_from_config(
-        config.get_section(config.config_ini_section, {}),
-        prefix="sqlalchemy.",
-        poolclass=pool.NullPool,
-    )
-    async with connectable.connect() as connection:
-        await connection.run_sync(do_run_migrations)
-    await connectable.dispose()
+    # Схема одинакова на всех шардах: миграции применяются к каждому.
+    for url in settings.shard_urls:
+        connectable = create_async_engine(url, poolclass=pool.NullPool)
+        async with connectable.connect() as connection:
+            await connection.run_sync(do_run_migrations)
+        await connectable.dispose()
 
 
 def run_migrations_online() -> None:
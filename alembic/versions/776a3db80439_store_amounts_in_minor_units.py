@@ -0,0 +1,160 @@
+"""store_amounts_in_minor_units
+
+Revision ID: 776a3db80439
+Revises: 73abd647a1c0
+Create Date: 2026-10-19 11:40:03.517224
+
+Переводит wallets.balance и operations.amount из NUMERIC(18, 2)
+в BIGINT (минорные единицы) без долгой эксклюзивной блокировки:
+
+1. Добавляется nullable-колонка BIGINT и триггер, который заполняет её
+   при каждой вставке и изменении строки, пока идёт перенос.
+2. Существующие строки заполняются пачками по BATCH_SIZE, каждая пачка
+   фиксируется отдельной транзакцией (autocommit).
+3. NOT NULL проверяется через CHECK ... NOT VALID + VALIDATE CONSTRAINT,
+   которые не блокируют запись.
+4. Старая колонка удаляется, новая переименовывается — короткая
+   блокировка только на изменение каталога.
+
+Все DDL-шаги выполняются с lock_timeout, чтобы миграция не вставала
+в очередь за долгими транзакциями и не блокировала запросы за собой.
+После autocommit-блока lock_timeout сбрасывается.
+
+Шаги повторяемы: прерванную миграцию (например, по lock_timeout)
+можно запустить снова. Уже переведённая колонка пропускается, DDL
+выполняется через IF NOT EXISTS / IF EXISTS / CREATE OR REPLACE,
+а заполнение продолжается со строк, где новая колонка ещё пустая.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '776a3db80439'
+down_revision: Union[str, None] = '73abd647a1c0'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BATCH_SIZE = 10_000
+LOCK_TIMEOUT = "5s"
+
+COLUMNS = [("wallets", "balance"), ("operations", "amount")]
+
+
+def _convert_column(table: str, column: str, new_type: str, expression: str) -> None:
+    """Онлайн-конвертация колонки через временную колонку и триггер.
+
+    Args:
+        table: Имя таблицы.
+        column: Имя конвертируемой колонки.
+        new_type: SQL-тип новой колонки.
+        expression: SQL-выражение нового значения от ``{column}``.
+    """
+    tmp = f"{column}_new"
+    trigger = f"{table}_{tmp}_sync"
+
+    connection = op.get_bind()
+    current_type = connection.execute(
+        sa.text(
+            "SELECT format_type(atttypid, atttypmod) FROM pg_attribute "
+            "WHERE attrelid = CAST(:table AS regclass) AND attname = :column "
+            "AND NOT attisdropped"
+        ),
+        {"table": table, "column": column},
+    ).scalar()
+    if current_type == new_type.lower().replace(" ", ""):
+        # Колонка уже переведена при прошлом, прерванном позже запуске.
+        return
+
+    with op.get_context().autocommit_block():
+        op.execute(f"SET lock_timeout = '{LOCK_TIMEOUT}'")
+        try:
+            _backfill_column(table, column, new_type, expression)
+        finally:
+            op.execute("RESET lock_timeout")
+
+    op.execute(f"SET LOCAL lock_timeout = '{LOCK_TIMEOUT}'")
+    op.execute(f"DROP TRIGGER IF EXISTS {trigger} ON {table}")
+    op.execute(f"DROP FUNCTION IF EXISTS {trigger}()")
+    op.drop_column(table, column)
+    op.alter_column(table, tmp, new_column_name=column)
+
+
+def _backfill_column(table: str, column: str, new_type: str, expression: str) -> None:
+    """Добавить временную колонку с триггером и заполнить её пачками.
+
+    Выполняется в autocommit: каждая команда и каждая пачка фиксируются
+    сразу. Повторный запуск продолжает с незаполненных строк.
+
+    Args:
+        table: Имя таблицы.
+        column: Имя конвертируемой колонки.
+        new_type: SQL-тип новой колонки.
+        expression: SQL-выражение нового значения от ``{column}``.
+    """
+    tmp = f"{column}_new"
+    trigger = f"{table}_{tmp}_sync"
+    check = f"{table}_{tmp}_not_null"
+
+    op.execute(f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS {tmp} {new_type}")
+    op.execute(
+        f"""
+        CREATE OR REPLACE FUNCTION {trigger}() RETURNS trigger AS $$
+        BEGIN
+            NEW.{tmp} := {expression.format(column=f"NEW.{column}")};
+            RETURN NEW;
+        END
+        $$ LANGUAGE plpgsql
+        """
+    )
+    op.execute(
+        f"CREATE OR REPLACE TRIGGER {trigger} BEFORE INSERT OR UPDATE ON {table} "
+        f"FOR EACH ROW EXECUTE FUNCTION {trigger}()"
+    )
+
+    connection = op.get_bind()
+    last_id = None
+    while True:
+        last_id = connection.execute(
+            sa.text(
+                f"""
+                WITH batch AS (
+                    SELECT id FROM {table}
+                    WHERE {tmp} IS NULL
+                      AND (CAST(:last_id AS uuid) IS NULL OR id > :last_id)
+                    ORDER BY id
+                    LIMIT :batch_size
+                ), updated AS (
+                    UPDATE {table} t SET {tmp} = {expression.format(column=f"t.{column}")}
+                    FROM batch WHERE t.id = batch.id
+                )
+                SELECT id FROM batch ORDER BY id DESC LIMIT 1
+                """
+            ),
+            {"last_id": last_id, "batch_size": BATCH_SIZE},
+        ).scalar()
+        if last_id is None:
+            break
+
+    op.execute(f"ALTER TABLE {table} DROP CONSTRAINT IF EXISTS {check}")
+    op.execute(
+        f"ALTER TABLE {table} ADD CONSTRAINT {check} "
+        f"CHECK ({tmp} IS NOT NULL) NOT VALID"
+    )
+    op.execute(f"ALTER TABLE {table} VALIDATE CONSTRAINT {check}")
+    op.execute(f"ALTER TABLE {table} ALTER COLUMN {tmp} SET NOT NULL")
+    op.execute(f"ALTER TABLE {table} DROP CONSTRAINT IF EXISTS {check}")
+
+
+def upgrade() -> None:
+    for table, column in COLUMNS:
+        _convert_column(table, column, "BIGINT", "round({column} * 100)::bigint")
+
+
+def downgrade() -> None:
+    for table, column in COLUMNS:
+        _convert_column(
+            table, column, "NUMERIC(18, 2)", "({column} / 100.0)::numeric(18, 2)"
+        )
@@ -6,17 +6,38 @@
 from typing import Annotated
 
 from fastapi import Depends
-from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.database.database import get_session
+from app.database.database import ShardSessions, get_sessions
+from app.services.hold import HoldService
+from app.services.operation import OperationService
 from app.services.wallet import WalletService
 
 
 def get_wallet_service(
-    session: Annotated[AsyncSession, Depends(get_session)],
+    sessions: Annotated[ShardSessions, Depends(get_sessions)],
 ) -> WalletService:
     """Dependency для создания экземпляра WalletService."""
-    return WalletService(session)
+    return WalletService(sessions)
 
 
 WalletServiceDep = Annotated[WalletService, Depends(get_wallet_service)]
+
+
+def get_operation_service(
+    sessions: Annotated[ShardSessions, Depends(get_sessions)],
+) -> OperationService:
+    """Dependency для создания экземпляра OperationService."""
+    return OperationService(sessions)
+
+
+OperationServiceDep = Annotated[OperationService, Depends(get_operation_service)]
+
+
+def get_hold_service(
+    sessions: Annotated[ShardSessions, Depends(get_sessions)],
+) -> HoldService:
+    """Dependency для создания экземпляра HoldService."""
+    return HoldService(sessions)
+
+
+HoldServiceDep = Annotated[HoldService, Depends(get_hold_service)]
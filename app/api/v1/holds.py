@@ -0,0 +1,53 @@
+"""
+Роутер API v1 для работы с холдами.
+
+Определяет эндпоинты получения, списания (capture) и отмены (release)
+холда. Холд создаётся через POST /wallets/{wallet_id}/holds.
+"""
+
+import uuid
+
+from fastapi import APIRouter, Request
+
+from app.api.dependencies import HoldServiceDep
+from app.limiter import limiter
+from app.schemas.hold import HoldResponse
+from app.tracing import traced_handler
+
+router = APIRouter(prefix="/holds", tags=["holds"])
+
+
+@router.get("/{hold_id}", response_model=HoldResponse)
+@limiter.limit("30/minute")
+@traced_handler
+async def get_hold(
+    request: Request,
+    hold_id: uuid.UUID,
+    service: HoldServiceDep,
+):
+    """Получает холд по его UUID."""
+    return await service.get_hold(hold_id)
+
+
+@router.post("/{hold_id}/capture", response_model=HoldResponse)
+@limiter.limit("10/minute")
+@traced_handler
+async def capture_hold(
+    request: Request,
+    hold_id: uuid.UUID,
+    service: HoldServiceDep,
+):
+    """Списывает зарезервированную сумму с баланса кошелька."""
+    return await service.capture(hold_id)
+
+
+@router.post("/{hold_id}/release", response_model=HoldResponse)
+@limiter.limit("10/minute")
+@traced_handler
+async def release_hold(
+    request: Request,
+    hold_id: uuid.UUID,
+    service: HoldServiceDep,
+):
+    """Отменяет холд и возвращает сумму в доступный баланс."""
+    return await service.release(hold_id)
@@ -0,0 +1,27 @@
+"""
+Роутер API v1 для работы с асинхронными операциями.
+
+Определяет эндпоинт получения статуса операции,
+принятой в режиме mode=async.
+"""
+
+import uuid
+
+from fastapi import APIRouter, Request
+
+from app.api.dependencies import OperationServiceDep
+from app.limiter import limiter
+from app.schemas.operation import OperationResponse
+
+router = APIRouter(prefix="/operations", tags=["operations"])
+
+
+@router.get("/{operation_id}", response_model=OperationResponse)
+@limiter.limit("30/minute")
+async def get_operation(
+    request: Request,
+    operation_id: uuid.UUID,
+    service: OperationServiceDep,
+):
+    """Получает статус асинхронной операции по её UUID."""
+    return await service.get_operation(operation_id)
@@ -2,50 +2,235 @@
 Роутер API v1 для работы с кошельками.
 
 Определяет эндпоинты создания, получения и операций над кошельками.
-Эндпоинты защищены rate limiter-ом.
+Эндпоинты защищены rate limiter-ом и размечены span-ами трассировки.
+Версия кошелька передаётся в заголовке ETag и используется для условных
+запросов: If-None-Match (GET) и If-Match (операции).
 """
 
 import uuid
+from typing import Annotated
 
-from fastapi import APIRouter, Request
+from fastapi import APIRouter, Header, HTTPException, Request, Response, status
+from fastapi.responses import JSONResponse
+from pydantic_core import to_json
 
-from app.api.dependencies import WalletServiceDep
+from app.api.dependencies import (
+    HoldServiceDep,
+    OperationServiceDep,
+    WalletServiceDep,
+)
+from app.configs.config import settings
 from app.limiter import limiter
-from app.schemas.wallet import WalletOperation, WalletResponse
+from app.models.operation import Operation
+from app.schemas.hold import HoldCreate, HoldResponse
+from app.schemas.operation import OperationMode, OperationResponse
+from app.schemas.wallet import (
+    WalletBatchRequest,
+    WalletBatchResponse,
+    WalletOperation,
+    WalletResponse,
+)
+from app.tracing import traced_handler
 
 router = APIRouter(prefix="/wallets", tags=["wallets"])
 
 
+def _etag(version: int) -> str:
+    """Сформировать ETag по версии кошелька."""
+    return f'"{version}"'
+
+
+def _accepted(
+    request: Request, operation: Operation, headers: dict[str, str] | None = None
+) -> JSONResponse:
+    """Ответ 202 с операцией, принятой в очередь, и ссылкой на её статус."""
+    return JSONResponse(
+        status_code=status.HTTP_202_ACCEPTED,
+        content=OperationResponse.model_validate(operation).model_dump(mode="json"),
+        headers={
+            "Location": str(
+                request.url_for("get_operation", operation_id=operation.id)
+            ),
+            **(headers or {}),
+        },
+    )
+
+
+def _is_async(request: Request) -> bool:
+    """Запрос операции в режиме mode=async (у очереди свой rate limit)."""
+    return request.query_params.get("mode") == OperationMode.ASYNC.value
+
+
+def _parse_etags(header: str, weak: bool) -> set[int] | None:
+    """Разобрать значение If-Match / If-None-Match в набор версий.
+
+    Args:
+        header: Значение заголовка.
+        weak: Учитывать ли слабые ETag (W/"..."): да для If-None-Match,
+            нет для If-Match, где требуется строгое сравнение.
+
+    Returns:
+        Набор версий или None для «*» (подходит любая версия).
+    """
+    if header.strip() == "*":
+        return None
+    versions = set()
+    for tag in header.split(","):
+        tag = tag.strip()
+        if weak:
+            tag = tag.removeprefix("W/")
+        tag = tag.removeprefix('"').removesuffix('"')
+        if tag.isdigit():
+            versions.add(int(tag))
+    return versions
+
+
+@router.post("/batch", response_model=WalletBatchResponse)
+@limiter.limit("30/minute")
+@traced_handler
+async def get_wallets(
+    request: Request,
+    body: WalletBatchRequest,
+    service: WalletServiceDep,
+):
+    """Получает балансы нескольких кошельков одним запросом.
+
+    Несуществующие кошельки перечисляются в поле missing, а не дают 404.
+    Сервис возвращает тело ответа из значений БД, поэтому оно
+    сериализуется в JSON напрямую, без проверки по response_model.
+    """
+    result = await service.get_wallets(body.ids)
+    return Response(content=to_json(result), media_type="application/json")
+
+
 @router.get("/{wallet_id}", response_model=WalletResponse)
 @limiter.limit("30/minute")
+@traced_handler
 async def get_wallet(
     request: Request,
+    response: Response,
     wallet_id: uuid.UUID,
     service: WalletServiceDep,
+    if_none_match: Annotated[str | None, Header()] = None,
 ):
-    """Получает текущий баланс кошелька по его UUID."""
-    return await service.get_wallet(wallet_id)
+    """Получает текущий баланс кошелька по его UUID.
 
+    Если версия из If-None-Match совпадает с текущей, возвращает 304
+    без тела; для проверки читается только колонка version.
+    """
+    if if_none_match is not None:
+        version = await service.get_wallet_version(wallet_id)
+        versions = _parse_etags(if_none_match, weak=True)
+        if versions is None or version in versions:
+            return Response(
+                status_code=status.HTTP_304_NOT_MODIFIED,
+                headers={"ETag": _etag(version)},
+            )
+    wallet = await service.get_wallet(wallet_id)
+    response.headers["ETag"] = _etag(wallet.version)
+    return wallet
 
-@router.post("/{wallet_id}/operation", response_model=WalletResponse)
-@limiter.limit("10/minute")
+
+@router.post(
+    "/{wallet_id}/operation",
+    response_model=WalletResponse,
+    responses={status.HTTP_202_ACCEPTED: {"model": OperationResponse}},
+)
+@limiter.limit("10/minute", exempt_when=_is_async)
+@limiter.limit(
+    settings.operation_async_rate_limit,
+    exempt_when=lambda request: not _is_async(request),
+)
+@traced_handler
 async def wallet_operation(
     request: Request,
+    response: Response,
     wallet_id: uuid.UUID,
     body: WalletOperation,
     service: WalletServiceDep,
+    operation_service: OperationServiceDep,
+    mode: OperationMode = OperationMode.SYNC,
+    if_match: Annotated[str | None, Header()] = None,
 ):
-    """Выполняет операцию пополнения (DEPOSIT) или снятия (WITHDRAW)."""
-    return await service.perform_operation(
-        wallet_id=wallet_id, operation_type=body.operation_type, amount=body.amount
+    """Выполняет операцию пополнения (DEPOSIT) или снятия (WITHDRAW).
+
+    В режиме mode=async операция только сохраняется в очередь: ответ
+    202 содержит её UUID, а статус доступен по GET /operations/{id}.
+
+    С заголовком If-Match операция выполняется без блокировки строки
+    и только если версия кошелька совпадает с ETag; иначе — 412.
+
+    Если очередь кошелька длиннее, чем синхронный запрос применяет
+    за раз, операция ставится в очередь: ответ 202 с Retry-After.
+    """
+    if mode == OperationMode.ASYNC:
+        if if_match is not None:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="If-Match is not supported in async mode",
+            )
+        operation = await operation_service.enqueue(
+            wallet_id=wallet_id,
+            operation_type=body.operation_type,
+            amount=body.amount_minor,
+        )
+        return _accepted(request, operation)
+    wallet = await service.perform_operation(
+        wallet_id=wallet_id,
+        operation_type=body.operation_type,
+        amount=body.amount_minor,
+        expected_versions=(
+            _parse_etags(if_match, weak=False) if if_match is not None else None
+        ),
+    )
+    if isinstance(wallet, Operation):
+        return _accepted(
+            request,
+            wallet,
+            {"Retry-After": str(settings.operation_queued_retry_after)},
+        )
+    response.headers["ETag"] = _etag(wallet.version)
+    return wallet
+
+
+@router.post(
+    "/{wallet_id}/holds",
+    response_model=HoldResponse,
+    status_code=status.HTTP_201_CREATED,
+)
+@limiter.limit("10/minute")
+@traced_handler
+async def authorize_hold(
+    request: Request,
+    response: Response,
+    wallet_id: uuid.UUID,
+    body: HoldCreate,
+    service: HoldServiceDep,
+):
+    """Резервирует сумму на кошельке (холд) на ttl_seconds секунд.
+
+    Сумма сразу вычитается из доступного баланса; списать её можно
+    через POST /holds/{id}/capture, отменить — через
+    POST /holds/{id}/release.
+    """
+    hold = await service.authorize(
+        wallet_id=wallet_id,
+        amount=body.amount_minor,
+        ttl_seconds=body.ttl_seconds,
     )
+    response.headers["Location"] = str(request.url_for("get_hold", hold_id=hold.id))
+    return hold
 
 
 @router.post("", response_model=WalletResponse, status_code=201)
 @limiter.limit("5/minute")
+@traced_handler
 async def create_wallet(
     request: Request,
+    response: Response,
     service: WalletServiceDep,
 ):
     """Создает новый кошелёк с нулевым балансом."""
-    return await service.create_wallet()
+    wallet = await service.create_wallet()
+    response.headers["ETag"] = _etag(wallet.version)
+    return wallet
@@ -8,13 +8,50 @@ from pydantic_settings import BaseSettings
 
 
 class Settings(BaseSettings):
-    """Настройки подключения к базе данных."""
+    """Настройки приложения: подключение к БД, фоновые воркеры и нагрузка."""
 
     db_host: str = "localhost"
     db_port: int = 5432
     db_user: str = "postgres"
     db_password: str = "postgres"
     db_name: str = "wallet_db"
+    db_shards: list[str] = []
+    shard_slots: int = 1024
+
+    operation_workers: int = 4
+    operation_batch_size: int = 100
+    operation_poll_interval: float = 0.1
+    operation_async_rate_limit: str = "1000/minute"
+    operation_sync_drain_limit: int = 100
+    operation_queued_retry_after: int = 1
+
+    hold_default_ttl_seconds: int = 900
+    hold_max_ttl_seconds: int = 7 * 24 * 3600
+    hold_sweeper_enabled: bool = True
+    hold_sweeper_batch_size: int = 5000
+    hold_sweeper_interval: float = 1.0
+
+    accrual_chunk_size: int = 1000
+    accrual_pause: float = 0.05
+    accrual_lock_timeout_ms: int = 200
+    rebalance_lock_timeout_ms: int = 1000
+    rebalance_attempts: int = 10
+
+    load_shedding_enabled: bool = True
+    load_shedding_read_limit: int = 8
+    load_shedding_write_limit: int = 4
+    load_shedding_read_max_limit: int = 10
+    load_shedding_write_max_limit: int = 5
+    load_shedding_min_limit: int = 1
+    load_shedding_target_latency_ms: float = 50.0
+    load_shedding_backoff: float = 0.9
+    load_shedding_latency_half_life: float = 1.0
+    load_shedding_retry_after: int = 1
+
+    tracing_enabled: bool = False
+    tracing_export: bool = True
+    tracing_export_path: str = "traces.jsonl"
+    tracing_slow_request_ms: float = 500.0
 
     @property
     def database_url(self) -> str:
@@ -24,6 +61,11 @@ class Settings(BaseSettings):
             f"@{self.db_host}:{self.db_port}/{self.db_name}"
         )
 
+    @property
+    def shard_urls(self) -> list[str]:
+        """DSN шардов; без DB_SHARDS — единственный шард из DB_*."""
+        return self.db_shards or [self.database_url]
+
     model_config = {"env_prefix": ""}
 
 
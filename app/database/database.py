@@ -1,14 +1,35 @@
 """
 Настройка асинхронного подключения к базе данных.
 
-Содержит движок SQLAlchemy, фабрику сессий и базовый класс моделей.
+Содержит базовый класс моделей и маршрутизацию по шардам: кошельки
+распределяются между базами из DB_SHARDS по фиксированной карте слотов.
+Слот кошелька определяется стабильным хешем его UUID (md5), который
+одинаково вычисляется в Python и в SQL; каждому слоту принадлежит ровно
+один шард. Владение слотами хранится на самих шардах (таблица
+shard_slots), поэтому перенос слота между шардами выполняется онлайн
+(см. app/database/rebalance.py), а приложение обновляет карту при промахе.
 """
 
-from collections.abc import AsyncGenerator
+import asyncio
+import enum
+import hashlib
+import logging
+import uuid
+from collections.abc import (
+    AsyncGenerator,
+    Awaitable,
+    Callable,
+    Collection,
+    Iterable,
+)
+from dataclasses import dataclass
 from datetime import datetime
+from typing import TypeVar
 
-from sqlalchemy import func
+from sqlalchemy import Column, Enum, Integer, Table, func, select, text
+from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.ext.asyncio import (
+    AsyncEngine,
     AsyncSession,
     async_sessionmaker,
     create_async_engine,
@@ -16,9 +37,23 @@ from sqlalchemy.ext.asyncio import (
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column
 
 from app.configs.config import settings
+from app.load_shedding import disarm_deadline
+from app.tracing import instrument_engine, span, tracing_active
+
+logger = logging.getLogger("wallet_api")
 
-engine = create_async_engine(settings.database_url, echo=False)
-async_session_factory = async_sessionmaker(engine, expire_on_commit=False)
+T = TypeVar("T")
+
+HASH_SPACE = 1 << 32
+# Хеш кошелька в SQL: первые 4 байта md5 от UUID, как в shard_hash().
+# Записан в каноническом виде PostgreSQL, чтобы alembic check не видел
+# расхождения с индексом ix_wallets_shard_hash.
+SHARD_HASH_SQL = (
+    """(((('x'::text || "left"(md5(uuid_send(id)), 8)))::bit(32))::bigint)"""
+)
+LOCATE_ATTEMPTS = 3
+# lock_not_available (lock_timeout) и deadlock_detected.
+LOCK_CONFLICT_SQLSTATES = frozenset({"55P03", "40P01"})
 
 
 class Base(DeclarativeBase):
@@ -30,7 +65,370 @@ class Base(DeclarativeBase):
     )
 
 
-async def get_session() -> AsyncGenerator[AsyncSession, None]:
-    """Dependency для получения асинхронной сессии БД."""
-    async with async_session_factory() as session:
-        yield session
+class ShardSession(AsyncSession):
+    """Сессия шарда.
+
+    Перед фиксацией снимает дедлайн запроса (X-Request-Timeout): истёкший
+    дедлайн прерывает запрос до COMMIT, а начатая фиксация не
+    прерывается.
+    """
+
+    async def commit(self) -> None:
+        await disarm_deadline()
+        await super().commit()
+
+
+class SlotStatus(str, enum.Enum):
+    """Состояние слота на шарде."""
+
+    OWNED = "OWNED"
+    INCOMING = "INCOMING"
+
+
+shard_slots = Table(
+    "shard_slots",
+    Base.metadata,
+    Column("slot", Integer, primary_key=True, autoincrement=False),
+    Column(
+        "status",
+        Enum(SlotStatus, native_enum=False, length=16),
+        nullable=False,
+    ),
+)
+
+
+class SlotMovingError(Exception):
+    """Слот кошелька переносится между шардами и временно недоступен."""
+
+
+def shard_hash(wallet_id: uuid.UUID) -> int:
+    """Стабильный 32-битный хеш UUID кошелька."""
+    return int.from_bytes(hashlib.md5(wallet_id.bytes).digest()[:4], "big")
+
+
+def slot_for(wallet_id: uuid.UUID, slots: int = settings.shard_slots) -> int:
+    """Номер слота кошелька.
+
+    Пространство хешей делится на slots равных диапазонов, поэтому
+    кошельки слота — это диапазон хешей, который читается по индексу
+    ix_wallets_shard_hash.
+    """
+    return shard_hash(wallet_id) * slots >> 32
+
+
+def slot_hash_range(
+    first: int, last: int, slots: int = settings.shard_slots
+) -> tuple[int, int]:
+    """Диапазон хешей [начало, конец) для слотов с first по last включительно."""
+    return -(-first * HASH_SPACE // slots), -(-(last + 1) * HASH_SPACE // slots)
+
+
+@dataclass
+class Shard:
+    """
+    Подключение к одному шарду.
+
+    Attributes:
+        index: Номер шарда (позиция DSN в DB_SHARDS).
+        engine: Асинхронный движок SQLAlchemy.
+        session_factory: Фабрика сессий шарда.
+    """
+
+    index: int
+    engine: AsyncEngine
+    session_factory: async_sessionmaker[ShardSession]
+
+
+class ShardRouter:
+    """
+    Маршрутизатор кошельков по шардам.
+
+    Карта «слот → шард» собирается из таблиц shard_slots всех шардов
+    и кэшируется в процессе. Если ни один шард не владеет слотами,
+    слоты распределяются при первом запуске (см. _claim_initial).
+
+    Args:
+        urls: DSN шардов.
+        slots: Число слотов; после первого запуска не меняется.
+        **engine_kwargs: Параметры create_async_engine.
+    """
+
+    def __init__(
+        self,
+        urls: Collection[str],
+        slots: int = settings.shard_slots,
+        **engine_kwargs,
+    ):
+        self.slots = slots
+        self.shards = []
+        for index, url in enumerate(urls):
+            engine = create_async_engine(url, **engine_kwargs)
+            self.shards.append(
+                Shard(
+                    index,
+                    engine,
+                    async_sessionmaker(
+                        engine, class_=ShardSession, expire_on_commit=False
+                    ),
+                )
+            )
+        self._owners: list[int | None] | None = None
+
+    def slot_for(self, wallet_id: uuid.UUID) -> int:
+        """Номер слота кошелька."""
+        return slot_for(wallet_id, self.slots)
+
+    async def owners(self) -> list[int | None]:
+        """Карта слотов: индекс шарда-владельца или None, если слот переносится."""
+        if self._owners is None:
+            await self.refresh()
+        return self._owners
+
+    async def refresh(self) -> None:
+        """Перечитать владение слотами со всех шардов."""
+        owners: list[int | None] = [None] * self.slots
+        claimed = False
+        for shard in self.shards:
+            async with shard.session_factory() as session:
+                rows = await session.execute(
+                    select(shard_slots.c.slot, shard_slots.c.status)
+                )
+                for slot, slot_status in rows:
+                    claimed = True
+                    if slot_status == SlotStatus.OWNED:
+                        owners[slot] = shard.index
+        if not claimed:
+            owners = await self._claim_initial()
+        self._owners = owners
+
+    async def _claim_initial(self) -> list[int | None]:
+        """Распределить слоты при первом запуске.
+
+        Слоты раздаются по шардам по кругу, только если ни на одном шарде
+        ещё нет кошельков. Если шарды добавлены к работающей базе, её
+        кошельки лежат на первом шарде: все слоты достаются ему, а
+        выравнивание выполняет перенос слотов (rebalance --even). Иначе
+        часть существующих кошельков оказалась бы в слотах других шардов
+        и перестала бы находиться.
+
+        Повторный или параллельный вызов безопасен: распределение
+        детерминировано, а уже занятые слоты пропускаются.
+
+        Returns:
+            Карта слотов.
+        """
+        count = len(self.shards)
+        populated = False
+        for shard in self.shards:
+            async with shard.session_factory() as session:
+                if await session.scalar(text("SELECT EXISTS (SELECT 1 FROM wallets)")):
+                    populated = True
+        if populated:
+            owners = [0] * self.slots
+            if count > 1:
+                logger.warning(
+                    "Кошельки уже есть: все слоты назначены шарду 0, "
+                    "выравнивание — python -m app.database.rebalance --even"
+                )
+        else:
+            owners = [slot % count for slot in range(self.slots)]
+        for shard in self.shards:
+            rows = [
+                {"slot": slot, "status": SlotStatus.OWNED}
+                for slot, owner in enumerate(owners)
+                if owner == shard.index
+            ]
+            if not rows:
+                continue
+            async with shard.session_factory() as session:
+                await session.execute(
+                    insert(shard_slots).values(rows).on_conflict_do_nothing()
+                )
+                await session.commit()
+        return owners
+
+    async def shard_for(self, wallet_id: uuid.UUID) -> Shard:
+        """Шард, которому принадлежит кошелёк.
+
+        Raises:
+            SlotMovingError: Слот кошелька сейчас переносится.
+        """
+        slot = self.slot_for(wallet_id)
+        index = (await self.owners())[slot]
+        if index is None:
+            await self.refresh()
+            index = self._owners[slot]
+            if index is None:
+                raise SlotMovingError(f"Slot {slot} is being moved")
+        return self.shards[index]
+
+    async def group_by_shard(
+        self, wallet_ids: Iterable[uuid.UUID]
+    ) -> dict[int, list[uuid.UUID]]:
+        """Разложить кошельки по шардам-владельцам.
+
+        Карта слотов читается один раз на весь список, поэтому большой
+        список не проходит через shard_for по одному кошельку.
+
+        Returns:
+            UUID кошельков по индексам шардов, в исходном порядке.
+
+        Raises:
+            SlotMovingError: Слот одного из кошельков сейчас переносится.
+        """
+        owners = await self.owners()
+        groups: dict[int, list[uuid.UUID]] = {}
+        for wallet_id in wallet_ids:
+            index = owners[self.slot_for(wallet_id)]
+            if index is None:
+                index = (await self.shard_for(wallet_id)).index
+            groups.setdefault(index, []).append(wallet_id)
+        return groups
+
+    async def owns(
+        self, session: AsyncSession, slots: Collection[int], lock: bool = False
+    ) -> bool:
+        """
+        Проверить, что шард сессии владеет всеми слотами.
+
+        При lock=True строки слотов блокируются FOR SHARE до конца
+        транзакции: перенос слота (FOR UPDATE) дождётся её завершения,
+        а вставка после переноса увидит, что слот уже не принадлежит шарду.
+
+        Args:
+            session: Сессия шарда.
+            slots: Номера слотов.
+            lock: Блокировать ли строки слотов.
+
+        Returns:
+            True, если все слоты принадлежат шарду.
+        """
+        slots = set(slots)
+        stmt = select(shard_slots.c.slot).where(
+            shard_slots.c.slot.in_(slots),
+            shard_slots.c.status == SlotStatus.OWNED,
+        )
+        if lock:
+            stmt = stmt.with_for_update(read=True)
+        result = await session.execute(stmt)
+        return len(result.all()) == len(slots)
+
+    async def dispose(self) -> None:
+        """Закрыть пулы соединений всех шардов."""
+        for shard in self.shards:
+            await shard.engine.dispose()
+
+
+class ShardSessions:
+    """
+    Сессии одного запроса к шардам.
+
+    Сессия шарда открывается при первом обращении и переиспользуется
+    до закрытия; транзакции разных шардов независимы.
+
+    Args:
+        router: Маршрутизатор шардов.
+    """
+
+    def __init__(self, router: ShardRouter):
+        self.router = router
+        self._sessions: dict[int, AsyncSession] = {}
+
+    async def for_shard(self, shard: Shard) -> AsyncSession:
+        """Сессия шарда.
+
+        При трассировке соединение из пула берётся сразу, чтобы время
+        ожидания пула попало в span db.checkout.
+        """
+        session = self._sessions.get(shard.index)
+        if session is None:
+            session = shard.session_factory()
+            self._sessions[shard.index] = session
+            if tracing_active():
+                with span("db.checkout"):
+                    await session.connection()
+        return session
+
+    async def for_wallet(self, wallet_id: uuid.UUID) -> AsyncSession:
+        """Сессия шарда, которому принадлежит кошелёк."""
+        return await self.for_shard(await self.router.shard_for(wallet_id))
+
+    async def locate(
+        self,
+        wallet_id: uuid.UUID,
+        fetch: Callable[[AsyncSession], Awaitable[T | None]],
+    ) -> tuple[AsyncSession, T | None]:
+        """
+        Выполнить fetch на шарде кошелька с учётом переноса слотов.
+
+        Если fetch ничего не нашёл, а шард уже не владеет слотом
+        (карта в процессе устарела), транзакция откатывается, карта
+        перечитывается и fetch повторяется на новом шарде.
+
+        Args:
+            wallet_id: UUID кошелька.
+            fetch: Запрос к сессии шарда.
+
+        Returns:
+            Сессия шарда и результат fetch (None — кошелька нет).
+
+        Raises:
+            SlotMovingError: Слот кошелька сейчас переносится.
+        """
+        slot = self.router.slot_for(wallet_id)
+        for _ in range(LOCATE_ATTEMPTS):
+            session = await self.for_wallet(wallet_id)
+            result = await fetch(session)
+            if result is not None or await self.router.owns(session, [slot]):
+                return session, result
+            await session.rollback()
+            await self.router.refresh()
+        raise SlotMovingError(f"Slot {slot} is being moved")
+
+    async def find(
+        self, fetch: Callable[[AsyncSession], Awaitable[T | None]]
+    ) -> tuple[AsyncSession, T] | None:
+        """
+        Выполнить fetch на всех шардах одновременно.
+
+        Нужен для запросов по id холда или операции, шард которых по id
+        не определить: задержка поиска — как у одного запроса, а не
+        сумма запросов ко всем шардам.
+
+        Args:
+            fetch: Запрос к сессии шарда.
+
+        Returns:
+            Сессия шарда и первый найденный результат или None.
+        """
+        sessions = [await self.for_shard(shard) for shard in self.router.shards]
+        results = await asyncio.gather(*(fetch(session) for session in sessions))
+        for session, result in zip(sessions, results, strict=True):
+            if result is not None:
+                return session, result
+        return None
+
+    async def close(self) -> None:
+        """Закрыть открытые сессии."""
+        for session in self._sessions.values():
+            await session.close()
+        self._sessions.clear()
+
+    async def __aenter__(self) -> "ShardSessions":
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.close()
+
+
+shard_router = ShardRouter(settings.shard_urls, echo=False)
+
+if settings.tracing_enabled:
+    for _shard in shard_router.shards:
+        instrument_engine(_shard.engine.sync_engine)
+
+
+async def get_sessions() -> AsyncGenerator[ShardSessions, None]:
+    """Dependency для получения сессий шардов на время запроса."""
+    async with ShardSessions(shard_router) as sessions:
+        yield sessions
@@ -0,0 +1,381 @@
+"""
+Онлайн-перенос слотов кошельков между шардами.
+
+Слот переносится короткими транзакциями, не останавливая приложение:
+
+1. На целевом шарде слот помечается INCOMING, остатки прерванного
+   переноса удаляются.
+2. На исходном шарде строка слота блокируется FOR UPDATE (создание
+   кошельков в слоте ждёт), затем холды слота, его кошельки (операции
+   над ними ждут) и ожидающие операции, каждые в порядке id. Порядок
+   «холд, затем кошелёк» совпадает с capture/release и sweeper, а
+   «кошелёк, затем операции» — с обработкой очереди.
+   Кошельки, их холды, операции и начисления копируются на целевой
+   шард, и его транзакция фиксируется.
+3. На исходном шарде кошельки слота и сам слот удаляются.
+4. На целевом шарде слот становится OWNED.
+
+Ожидавшие запросы после шага 3 не находят кошелёк на старом шарде,
+перечитывают карту слотов и повторяются на новом. Если процесс прервался,
+повторный запуск продолжает с того же места: слот, принадлежащий
+исходному шарду, переносится заново, а слот без владельца завершается.
+Ожидание блокировок ограничено таймаутом; при его истечении или
+взаимоблокировке перенос слота повторяется.
+
+Запуск (DSN шардов берутся из DB_SHARDS):
+
+    python -m app.database.rebalance --even
+    python -m app.database.rebalance --slots 0-127 --to 2
+"""
+
+import argparse
+import asyncio
+import logging
+import logging.config
+import time
+import uuid
+
+from sqlalchemy import Uuid, any_, bindparam, delete, insert, select, text, update
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.configs.config import settings
+from app.database.database import (
+    LOCK_CONFLICT_SQLSTATES,
+    SHARD_HASH_SQL,
+    ShardRouter,
+    SlotStatus,
+    shard_slots,
+    slot_hash_range,
+)
+from app.logger.config import dict_config
+from app.models.accrual import AccrualEntry
+from app.models.hold import Hold
+from app.models.operation import Operation
+from app.models.wallet import Wallet
+from app.schemas.operation import OperationStatus
+
+logger = logging.getLogger("wallet_api")
+
+
+class SlotMover:
+    """
+    Перенос слотов между шардами.
+
+    Args:
+        router: Маршрутизатор шардов.
+        pause: Пауза между слотами в секундах, чтобы перенос
+            не вытеснял рабочую нагрузку.
+        lock_timeout_ms: Сколько перенос ждёт блокировки на исходном
+            шарде, мс.
+        attempts: Число попыток переноса слота при конфликте блокировок.
+    """
+
+    def __init__(
+        self,
+        router: ShardRouter,
+        pause: float = 0.1,
+        lock_timeout_ms: int = settings.rebalance_lock_timeout_ms,
+        attempts: int = settings.rebalance_attempts,
+    ):
+        self.router = router
+        self.pause = pause
+        self.lock_timeout_ms = lock_timeout_ms
+        self.attempts = attempts
+
+    async def move(self, slot: int, target: int) -> int:
+        """
+        Перенести слот на шард target.
+
+        Args:
+            slot: Номер слота.
+            target: Индекс целевого шарда.
+
+        Returns:
+            Число перенесённых кошельков.
+
+        Raises:
+            DBAPIError: Блокировки слота не удалось получить за attempts
+                попыток.
+        """
+        await self.router.refresh()
+        source = (await self.router.owners())[slot]
+        if source == target:
+            return 0
+        if source is None:
+            await self._finish(slot, target)
+            return 0
+
+        started = time.perf_counter()
+        for attempt in range(1, self.attempts + 1):
+            try:
+                moved = await self._transfer(slot, source, target)
+                break
+            except DBAPIError as exc:
+                if (
+                    getattr(exc.orig, "sqlstate", None) not in LOCK_CONFLICT_SQLSTATES
+                    or attempt == self.attempts
+                ):
+                    raise
+                logger.warning(
+                    "Слот %s: строки заняты, перенос повторяется (попытка %s из %s)",
+                    slot,
+                    attempt,
+                    self.attempts,
+                )
+                await asyncio.sleep(max(self.pause, self.lock_timeout_ms / 1000))
+        if moved is None:
+            return 0
+        await self._finish(slot, target)
+        logger.info(
+            "Слот %s перенесён: шард %s -> %s, кошельков=%s, %.0f мс",
+            slot,
+            source,
+            target,
+            len(moved),
+            (time.perf_counter() - started) * 1000,
+        )
+        return len(moved)
+
+    async def move_many(self, moves: list[tuple[int, int]]) -> int:
+        """Перенести слоты по списку пар (слот, целевой шард).
+
+        Returns:
+            Общее число перенесённых кошельков.
+        """
+        total = 0
+        for number, (slot, target) in enumerate(moves, start=1):
+            total += await self.move(slot, target)
+            logger.info("Перенесено слотов: %s из %s", number, len(moves))
+            await asyncio.sleep(self.pause)
+        return total
+
+    async def plan_even(self) -> list[tuple[int, int]]:
+        """
+        Составить план, выравнивающий число слотов на шардах.
+
+        Лишние слоты (с конца) переезжают с перегруженных шардов
+        на недогруженные.
+
+        Returns:
+            Список пар (слот, целевой шард).
+        """
+        await self.router.refresh()
+        owners = await self.router.owners()
+        count = len(self.router.shards)
+        owned: list[list[int]] = [[] for _ in range(count)]
+        for slot, index in enumerate(owners):
+            if index is not None:
+                owned[index].append(slot)
+        quotas = [
+            self.router.slots // count + (index < self.router.slots % count)
+            for index in range(count)
+        ]
+        surplus = [
+            slot for index in range(count) for slot in owned[index][quotas[index] :]
+        ]
+        moves = []
+        for index in range(count):
+            for _ in range(quotas[index] - len(owned[index])):
+                moves.append((surplus.pop(), index))
+        return moves
+
+    async def _transfer(
+        self, slot: int, source: int, target: int
+    ) -> list[uuid.UUID] | None:
+        """
+        Скопировать слот на целевой шард и удалить его с исходного.
+
+        Returns:
+            UUID перенесённых кошельков или None, если исходный шард
+            уже не владеет слотом.
+        """
+        async with (
+            self.router.shards[target].session_factory() as dst,
+            self.router.shards[source].session_factory() as src,
+        ):
+            await src.execute(
+                text(f"SET LOCAL lock_timeout = {int(self.lock_timeout_ms)}")
+            )
+            await self._prepare(dst, slot)
+            moved = await self._copy(src, dst, slot)
+            if moved is None:
+                await dst.rollback()
+                return None
+            await dst.commit()
+            await src.execute(
+                delete(Wallet).where(Wallet.id == any_(_ids_param(moved)))
+            )
+            await src.execute(delete(shard_slots).where(shard_slots.c.slot == slot))
+            await src.commit()
+        return moved
+
+    async def _prepare(self, dst: AsyncSession, slot: int) -> None:
+        """Пометить слот INCOMING и удалить остатки прерванного переноса."""
+        start, end = slot_hash_range(slot, slot, self.router.slots)
+        await dst.execute(
+            text(
+                f"DELETE FROM wallets WHERE {SHARD_HASH_SQL} >= :start "
+                f"AND {SHARD_HASH_SQL} < :end"
+            ),
+            {"start": start, "end": end},
+        )
+        await dst.execute(
+            pg_insert(shard_slots)
+            .values(slot=slot, status=SlotStatus.INCOMING)
+            .on_conflict_do_update(
+                index_elements=[shard_slots.c.slot],
+                set_={"status": SlotStatus.INCOMING},
+            )
+        )
+
+    async def _copy(
+        self, src: AsyncSession, dst: AsyncSession, slot: int
+    ) -> list[uuid.UUID] | None:
+        """
+        Заблокировать слот и его кошельки на исходном шарде и скопировать их.
+
+        Блокировки берутся в порядке: строка слота, холды слота, его
+        кошельки, ожидающие операции, внутри каждой таблицы — по id.
+        Capture/release и sweeper блокируют холд, затем кошелёк, а
+        обработка очереди — кошелёк, затем его операции, поэтому перенос
+        ни с кем из них не взаимоблокируется. Сортировка по id исключает
+        взаимоблокировку параллельных переносов соседних слотов.
+
+        Returns:
+            UUID скопированных кошельков или None, если исходный шард
+            уже не владеет слотом.
+        """
+        owned = await src.execute(
+            select(shard_slots.c.status)
+            .where(shard_slots.c.slot == slot)
+            .with_for_update()
+        )
+        if owned.scalar_one_or_none() != SlotStatus.OWNED:
+            return None
+
+        start, end = slot_hash_range(slot, slot, self.router.slots)
+        in_slot = text(f"{SHARD_HASH_SQL} >= :start AND {SHARD_HASH_SQL} < :end")
+        params = {"start": start, "end": end}
+        slot_wallets = select(Wallet.id).where(in_slot)
+        await src.execute(
+            select(Hold.id)
+            .where(Hold.wallet_id.in_(slot_wallets))
+            .order_by(Hold.id)
+            .with_for_update(),
+            params,
+        )
+        wallets = (
+            await src.execute(
+                select(Wallet.__table__)
+                .where(in_slot)
+                .order_by(Wallet.id)
+                .with_for_update(),
+                params,
+            )
+        ).all()
+        await src.execute(
+            select(Operation.id)
+            .where(
+                Operation.wallet_id.in_(slot_wallets),
+                Operation.status == OperationStatus.PENDING,
+            )
+            .order_by(Operation.id)
+            .with_for_update(),
+            params,
+        )
+        ids = [row.id for row in wallets]
+        if not ids:
+            return ids
+
+        holds = await src.execute(
+            select(Hold.__table__).where(Hold.wallet_id == any_(_ids_param(ids)))
+        )
+        operation_columns = [
+            column for column in Operation.__table__.c if column.name != "seq"
+        ]
+        operations = await src.execute(
+            select(*operation_columns)
+            .where(Operation.wallet_id == any_(_ids_param(ids)))
+            .order_by(Operation.seq)
+        )
+
+        entries = await src.execute(
+            select(AccrualEntry.__table__).where(
+                AccrualEntry.wallet_id == any_(_ids_param(ids))
+            )
+        )
+
+        await dst.execute(
+            insert(Wallet.__table__), [dict(row._mapping) for row in wallets]
+        )
+        for table, result in (
+            (Hold.__table__, holds),
+            (AccrualEntry.__table__, entries),
+        ):
+            rows = [dict(row._mapping) for row in result]
+            if rows:
+                await dst.execute(insert(table), rows)
+        operation_rows = [dict(row._mapping) for row in operations]
+        if operation_rows:
+            # seq назначается заново на целевом шарде; порядок вставки
+            # сохраняет порядок операций каждого кошелька.
+            await dst.execute(insert(Operation.__table__), operation_rows)
+        return ids
+
+    async def _finish(self, slot: int, target: int) -> None:
+        """Сделать целевой шард владельцем слота."""
+        async with self.router.shards[target].session_factory() as dst:
+            await dst.execute(
+                update(shard_slots)
+                .where(
+                    shard_slots.c.slot == slot,
+                    shard_slots.c.status == SlotStatus.INCOMING,
+                )
+                .values(status=SlotStatus.OWNED)
+            )
+            await dst.commit()
+        await self.router.refresh()
+
+
+def _ids_param(ids: list[uuid.UUID]):
+    """Список UUID одним параметром-массивом."""
+    return bindparam("ids", ids, type_=ARRAY(Uuid()))
+
+
+def _parse_slots(value: str) -> list[int]:
+    """Разобрать диапазон слотов вида 0-127 или 5."""
+    first, _, last = value.partition("-")
+    return list(range(int(first), int(last or first) + 1))
+
+
+async def main() -> None:
+    """Перенести слоты по аргументам командной строки."""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    group = parser.add_mutually_exclusive_group(required=True)
+    group.add_argument("--even", action="store_true", help="выровнять слоты")
+    group.add_argument("--slots", type=_parse_slots, help="слоты, например 0-127")
+    parser.add_argument("--to", type=int, help="целевой шард для --slots")
+    parser.add_argument("--pause", type=float, default=0.1, help="пауза, сек")
+    args = parser.parse_args()
+    if args.slots is not None and args.to is None:
+        parser.error("--slots требует --to")
+
+    logging.config.dictConfig(dict_config)
+    router = ShardRouter(settings.shard_urls)
+    mover = SlotMover(router, pause=args.pause)
+    try:
+        if args.even:
+            moves = await mover.plan_even()
+        else:
+            moves = [(slot, args.to) for slot in args.slots]
+        moved = await mover.move_many(moves)
+        logger.info("Перенос завершён: слотов=%s, кошельков=%s", len(moves), moved)
+    finally:
+        await router.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -4,7 +4,62 @@
 Единый экземпляр Limiter для всего приложения.
 """
 
+import functools
+import time
+from collections.abc import Awaitable, Callable
+from contextvars import ContextVar
+from typing import Any
+
 from slowapi import Limiter
 from slowapi.util import get_remote_address
 
-limiter = Limiter(key_func=get_remote_address)
+from app.tracing import add_span, tracing_active
+
+# Время входа в проверку лимитов текущего запроса; 0 — span уже записан.
+_check_started: ContextVar[int | None] = ContextVar("limiter_check", default=None)
+
+
+class TracedLimiter(Limiter):
+    """Limiter, замеряющий проверку лимитов как span limiter.
+
+    Декоратор limit() оборачивается снаружи и изнутри: время от входа
+    во внешний декоратор до вызова самого эндпоинта — это проверка
+    лимитов. Если на эндпоинте несколько лимитов, span один и охватывает
+    проверки всех слоёв: он открывается во внешнем слое и закрывается
+    во внутреннем, перед эндпоинтом.
+    """
+
+    def limit(self, *args: Any, **kwargs: Any) -> Callable[..., Any]:
+        decorator = super().limit(*args, **kwargs)
+
+        def wrap(func: Callable[..., Awaitable[Any]]) -> Callable[..., Awaitable[Any]]:
+            # Над эндпоинтом уже есть слой лимитов: span закроет он.
+            innermost = not getattr(func, "__limiter_traced__", False)
+
+            @functools.wraps(func)
+            async def checked(*f_args: Any, **f_kwargs: Any) -> Any:
+                started = _check_started.get()
+                if innermost and started:
+                    add_span("limiter", started, time.time_ns())
+                    _check_started.set(0)
+                return await func(*f_args, **f_kwargs)
+
+            limited = decorator(checked)
+
+            @functools.wraps(limited)
+            async def traced(*f_args: Any, **f_kwargs: Any) -> Any:
+                if not tracing_active() or _check_started.get() is not None:
+                    return await limited(*f_args, **f_kwargs)
+                token = _check_started.set(time.time_ns())
+                try:
+                    return await limited(*f_args, **f_kwargs)
+                finally:
+                    _check_started.reset(token)
+
+            traced.__limiter_traced__ = True
+            return traced
+
+        return wrap
+
+
+limiter = TracedLimiter(key_func=get_remote_address)
@@ -0,0 +1,328 @@
+"""
+Адаптивное ограничение нагрузки на БД (load shedding).
+
+Middleware ограничивает число одновременно выполняемых запросов к API,
+каждый из которых занимает соединение из пула шарда.
+Лимит подстраивается по наблюдаемой задержке по схеме AIMD: растёт на
+единицу за «окно» быстрых ответов (в том числе выше начального значения,
+до жёсткого потолка) и умножается на backoff, когда задержка превышает
+целевую. Лишние запросы сразу получают 503 с Retry-After, а не ждут
+соединения, пока клиент не отвалится по таймауту.
+
+Чтение и запись ограничиваются раздельно, поэтому поток операций
+не вытесняет GET /wallets/{id}. Клиент может передать оставшееся
+время ожидания в заголовке X-Request-Timeout (мс): если его заведомо
+не хватит на обработку, запрос отклоняется до обращения к БД, а принятый
+запрос прерывается с 504, если время истекает до фиксации транзакции.
+Начатая фиксация не прерывается, поэтому 504 означает, что изменения
+не применены.
+"""
+
+import asyncio
+import logging
+import math
+import time
+from contextvars import ContextVar
+
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.configs.config import settings
+
+logger = logging.getLogger("wallet_api")
+
+DEADLINE_HEADER = b"x-request-timeout"
+READ_METHODS = frozenset({"GET", "HEAD"})
+
+_deadline: ContextVar[asyncio.Timeout | None] = ContextVar(
+    "request_deadline", default=None
+)
+
+
+class AdaptiveLimit:
+    """
+    Адаптивный лимит одновременных запросов (AIMD).
+
+    Вызовы выполняются в одном event loop, поэтому синхронизация
+    не требуется.
+
+    Args:
+        name: Имя бюджета (read / write) для логов.
+        max_limit: Жёсткий потолок лимита.
+        min_limit: Минимальный лимит.
+        target_latency_ms: Задержка, выше которой лимит уменьшается.
+        backoff: Множитель уменьшения лимита.
+        initial_limit: Начальный лимит (None — max_limit).
+        latency_half_life: Время, за которое оценка задержки без новых
+            замеров убывает вдвое, сек.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        max_limit: int,
+        min_limit: int = settings.load_shedding_min_limit,
+        target_latency_ms: float = settings.load_shedding_target_latency_ms,
+        backoff: float = settings.load_shedding_backoff,
+        initial_limit: int | None = None,
+        latency_half_life: float = settings.load_shedding_latency_half_life,
+    ):
+        self.name = name
+        self.max_limit = max_limit
+        self.min_limit = min_limit
+        self.target_latency_ms = target_latency_ms
+        self.backoff = backoff
+        self.limit = float(min(initial_limit or max_limit, max_limit))
+        self.in_flight = 0
+        self.latency_half_life = latency_half_life
+        self.latency_ms = 0.0
+        self._last_sample = 0.0
+        self._last_decrease = 0.0
+
+    def expected_latency_ms(self) -> float:
+        """
+        Ожидаемая задержка запроса для проверки дедлайна клиента.
+
+        Оценка обновляется только завершёнными запросами. Без новых
+        замеров она убывает со временем, иначе после медленного
+        всплеска запросы с коротким дедлайном отклонялись бы всегда:
+        их никто не пропускает, и оценка не обновляется.
+
+        Returns:
+            EWMA задержки, уменьшенная по времени с последнего замера, мс.
+        """
+        elapsed = time.monotonic() - self._last_sample
+        return self.latency_ms * 0.5 ** (elapsed / self.latency_half_life)
+
+    def try_acquire(self) -> bool:
+        """Занять слот, если лимит не исчерпан.
+
+        Returns:
+            True, если слот занят; False, если запрос нужно отклонить.
+        """
+        if self.in_flight >= int(self.limit):
+            return False
+        self.in_flight += 1
+        return True
+
+    def release(self, latency_ms: float, overloaded: bool = False) -> None:
+        """
+        Освободить слот и скорректировать лимит по задержке запроса.
+
+        Уменьшение применяется не чаще одного раза за время запроса,
+        чтобы один всплеск медленных ответов не обрушил лимит до
+        минимума. Увеличение — только когда лимит действительно
+        использовался (занято не меньше половины слотов), и не выше
+        max_limit.
+
+        Args:
+            latency_ms: Длительность обработки запроса, мс.
+            overloaded: Признак перегрузки независимо от задержки
+                (например, ответ 5xx).
+        """
+        in_flight = self.in_flight
+        self.in_flight -= 1
+        estimate = self.expected_latency_ms()
+        if estimate:
+            self.latency_ms = estimate + 0.2 * (latency_ms - estimate)
+        else:
+            self.latency_ms = latency_ms
+        self._last_sample = time.monotonic()
+
+        if overloaded or latency_ms > self.target_latency_ms:
+            now = time.monotonic()
+            if now - self._last_decrease >= latency_ms / 1000:
+                self._last_decrease = now
+                self.limit = max(self.min_limit, self.limit * self.backoff)
+                logger.debug(
+                    "Лимит %s уменьшен до %.1f (задержка %.1f мс)",
+                    self.name,
+                    self.limit,
+                    latency_ms,
+                )
+        elif in_flight * 2 >= self.limit:
+            self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+
+
+class LoadShedder:
+    """
+    Раздельные адаптивные лимиты для чтения и записи.
+
+    Args:
+        read_limit: Начальный лимит одновременных запросов на чтение.
+        write_limit: Начальный лимит одновременных запросов на запись.
+        read_max_limit: Потолок лимита на чтение.
+        write_max_limit: Потолок лимита на запись.
+        read_paths: Пути POST-запросов, которые только читают данные.
+        retry_after: Значение заголовка Retry-After, секунды.
+    """
+
+    def __init__(
+        self,
+        read_limit: int = settings.load_shedding_read_limit,
+        write_limit: int = settings.load_shedding_write_limit,
+        read_max_limit: int = settings.load_shedding_read_max_limit,
+        write_max_limit: int = settings.load_shedding_write_max_limit,
+        read_paths: frozenset[str] = frozenset({"/api/v1/wallets/batch"}),
+        retry_after: int = settings.load_shedding_retry_after,
+    ):
+        self.enabled = True
+        self.read = AdaptiveLimit(
+            "read", max(read_max_limit, read_limit), initial_limit=read_limit
+        )
+        self.write = AdaptiveLimit(
+            "write", max(write_max_limit, write_limit), initial_limit=write_limit
+        )
+        self.read_paths = read_paths
+        self.retry_after = retry_after
+
+    def budget(self, scope: Scope) -> AdaptiveLimit:
+        """Выбрать бюджет запроса: чтение или запись."""
+        if scope["method"] in READ_METHODS or scope["path"] in self.read_paths:
+            return self.read
+        return self.write
+
+
+class LoadSheddingMiddleware:
+    """
+    ASGI middleware адаптивного ограничения нагрузки.
+
+    Ограничиваются только запросы к API (/api/...): документация
+    и служебные пути к БД не обращаются.
+
+    Args:
+        app: Оборачиваемое ASGI-приложение.
+        shedder: Набор лимитов (по умолчанию общий для приложения).
+    """
+
+    def __init__(self, app: ASGIApp, shedder: LoadShedder | None = None):
+        self.app = app
+        self.shedder = shedder if shedder is not None else load_shedder
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if (
+            scope["type"] != "http"
+            or not self.shedder.enabled
+            or not scope["path"].startswith("/api/")
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        budget = self.shedder.budget(scope)
+        try:
+            timeout_ms = _deadline_ms(scope)
+        except ValueError:
+            logger.warning("Некорректный заголовок X-Request-Timeout")
+            response = JSONResponse(
+                status_code=400, content={"detail": "Invalid X-Request-Timeout"}
+            )
+            await response(scope, receive, send)
+            return
+        expected_ms = budget.expected_latency_ms()
+        if timeout_ms is not None and timeout_ms <= expected_ms:
+            logger.warning(
+                "Запрос отклонён: дедлайн %s мс меньше ожидаемой задержки %.1f мс",
+                timeout_ms,
+                expected_ms,
+            )
+            await self._reject(scope, receive, send, "Request deadline cannot be met")
+            return
+        if not budget.try_acquire():
+            logger.warning(
+                "Запрос отклонён: лимит %s исчерпан (%s)",
+                budget.name,
+                int(budget.limit),
+            )
+            await self._reject(scope, receive, send, "Server is overloaded")
+            return
+
+        status_code = 500
+        started = time.perf_counter()
+        response_started = False
+        expired = False
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status_code, response_started
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                response_started = True
+            await send(message)
+
+        try:
+            async with asyncio.timeout(
+                timeout_ms / 1000 if timeout_ms is not None else None
+            ) as deadline:
+                token = _deadline.set(deadline)
+                try:
+                    await self.app(scope, receive, send_wrapper)
+                finally:
+                    _deadline.reset(token)
+        except TimeoutError:
+            expired = True
+            logger.warning(
+                "Дедлайн клиента истёк, запрос прерван: %s %s, %s мс",
+                scope["method"],
+                scope["path"],
+                timeout_ms,
+            )
+            if not response_started:
+                status_code = 504
+                response = JSONResponse(
+                    status_code=504, content={"detail": "Request deadline exceeded"}
+                )
+                await response(scope, receive, send)
+        finally:
+            latency_ms = (time.perf_counter() - started) * 1000
+            budget.release(latency_ms, overloaded=status_code >= 500 and not expired)
+
+    async def _reject(
+        self, scope: Scope, receive: Receive, send: Send, detail: str
+    ) -> None:
+        """Ответить 503 с Retry-After."""
+        response = JSONResponse(
+            status_code=503,
+            content={"detail": detail},
+            headers={"Retry-After": str(self.shedder.retry_after)},
+        )
+        await response(scope, receive, send)
+
+
+async def disarm_deadline() -> None:
+    """
+    Снять дедлайн запроса перед фиксацией транзакции.
+
+    Если дедлайн уже истёк, запрос прерывается здесь, до COMMIT, и
+    транзакция откатывается. Иначе дедлайн снимается, и фиксация с
+    ответом доводятся до конца: отмена посреди COMMIT оставила бы
+    клиенту 504 при уже применённых изменениях. Вне запроса
+    с X-Request-Timeout ничего не делает.
+    """
+    deadline = _deadline.get()
+    if deadline is None or deadline.when() is None:
+        return
+    if deadline.when() <= asyncio.get_running_loop().time():
+        if not deadline.expired():
+            deadline.reschedule(deadline.when())
+        await asyncio.sleep(0)
+    deadline.reschedule(None)
+
+
+def _deadline_ms(scope: Scope) -> float | None:
+    """Прочитать оставшееся время клиента из X-Request-Timeout (мс).
+
+    Returns:
+        Время в мс или None, если заголовка нет.
+
+    Raises:
+        ValueError: Значение не число или не конечное положительное число.
+    """
+    for name, value in scope["headers"]:
+        if name == DEADLINE_HEADER:
+            timeout_ms = float(value)
+            if not math.isfinite(timeout_ms) or timeout_ms <= 0:
+                raise ValueError(f"Invalid deadline: {value!r}")
+            return timeout_ms
+    return None
+
+
+load_shedder = LoadShedder()
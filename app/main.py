@@ -1,25 +1,56 @@
 """
 Точка входа приложения FastAPI.
 
-Создаёт экземпляр приложения, подключает роутеры, rate limiter и логирование.
+Создаёт экземпляр приложения, подключает роутеры, rate limiter, адаптивное
+ограничение нагрузки, логирование и (если включена) трассировку. Запускает
+фоновые воркеры асинхронных операций и sweeper истёкших холдов.
 """
 
+import asyncio
 import logging
 import logging.config
+from collections.abc import AsyncGenerator
+from contextlib import asynccontextmanager
 
 from fastapi import FastAPI, Request
 from fastapi.responses import JSONResponse
 from slowapi.errors import RateLimitExceeded
 from starlette.middleware.cors import CORSMiddleware
 
+from app.api.v1.holds import router as holds_router
+from app.api.v1.operations import router as operations_router
 from app.api.v1.wallets import router as wallets_router
+from app.configs.config import settings
+from app.database.database import SlotMovingError
 from app.limiter import limiter
+from app.load_shedding import LoadSheddingMiddleware
 from app.logger.config import dict_config
+from app.tracing import TracingMiddleware, default_exporter
+from app.workers.holds import HoldSweeper
+from app.workers.operations import OperationWorkerPool
 
 logging.config.dictConfig(dict_config)
 logger = logging.getLogger("wallet_api")
 
-app = FastAPI(title="Wallet API")
+trace_exporter = default_exporter() if settings.tracing_enabled else None
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncGenerator[None, None]:
+    """Запускает фоновые воркеры на время работы приложения."""
+    operation_workers = OperationWorkerPool()
+    operation_workers.start()
+    hold_sweeper = HoldSweeper()
+    if settings.hold_sweeper_enabled:
+        hold_sweeper.start()
+    yield
+    await hold_sweeper.stop()
+    await operation_workers.stop()
+    if trace_exporter is not None:
+        await asyncio.to_thread(trace_exporter.close)
+
+
+app = FastAPI(title="Wallet API", lifespan=lifespan)
 app.state.limiter = limiter
 
 
@@ -33,13 +64,33 @@ async def rate_limit_handler(request: Request, exc: RateLimitExceeded):
     )
 
 
+@app.exception_handler(SlotMovingError)
+async def slot_moving_handler(request: Request, exc: SlotMovingError):
+    """Обработчик запроса к кошельку, слот которого переносится между шардами."""
+    logger.warning("Слот переносится: %s", exc)
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "Wallet is being moved. Please try again later."},
+        headers={"Retry-After": str(settings.load_shedding_retry_after)},
+    )
+
+
 app.include_router(wallets_router, prefix="/api/v1")
+app.include_router(operations_router, prefix="/api/v1")
+app.include_router(holds_router, prefix="/api/v1")
+
+if settings.load_shedding_enabled:
+    app.add_middleware(LoadSheddingMiddleware)
 
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag", "Retry-After", "Server-Timing"],
 )
 
+if settings.tracing_enabled:
+    app.add_middleware(TracingMiddleware, exporter=trace_exporter)
+
 logger.info("Приложение Wallet API запущено")
@@ -1,3 +1,6 @@
+from app.models.accrual import AccrualEntry, AccrualRun
+from app.models.hold import Hold
+from app.models.operation import Operation
 from app.models.wallet import Wallet
 
-__all__ = ["Wallet"]
+__all__ = ["AccrualEntry", "AccrualRun", "Hold", "Operation", "Wallet"]
@@ -0,0 +1,75 @@
+"""
+Модели массовых начислений.
+
+Описывает таблицы accrual_runs (прогресс прогона на шарде) и
+accrual_entries (начисления по кошелькам в рамках прогона).
+"""
+
+import uuid
+from datetime import datetime
+
+from sqlalchemy import BigInteger, Enum, ForeignKey, String
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.database.database import Base
+from app.schemas.accrual import AccrualStatus
+
+
+class AccrualRun(Base):
+    """
+    Прогон начисления на одном шарде.
+
+    Строка обновляется в той же транзакции, что и чанк кошельков,
+    поэтому прерванный прогон продолжается с сохранённого курсора.
+
+    Attributes:
+        id: Идентификатор прогона, заданный при запуске.
+        rule: Правило начисления (AccrualRule в JSON).
+        cutoff: Начисление затрагивает кошельки, созданные не позже
+            этого момента (одинаков на всех шардах).
+        slot_map: Отпечаток карты слотов, с которой идёт текущий проход.
+        cursor: UUID последнего обработанного кошелька.
+        status: Статус прогона (RUNNING / COMPLETED).
+        chunks: Число обработанных чанков.
+        wallets: Число кошельков, которым начислено.
+        amount: Общая сумма начислений в минорных единицах.
+    """
+
+    __tablename__ = "accrual_runs"
+
+    id: Mapped[str] = mapped_column(String(64), primary_key=True)
+    rule: Mapped[dict] = mapped_column(JSONB)
+    cutoff: Mapped[datetime]
+    slot_map: Mapped[str] = mapped_column(String(32))
+    cursor: Mapped[uuid.UUID | None] = mapped_column(default=None)
+    status: Mapped[AccrualStatus] = mapped_column(
+        Enum(AccrualStatus, native_enum=False, length=16),
+        default=AccrualStatus.RUNNING,
+    )
+    chunks: Mapped[int] = mapped_column(BigInteger, default=0)
+    wallets: Mapped[int] = mapped_column(BigInteger, default=0)
+    amount: Mapped[int] = mapped_column(BigInteger, default=0)
+
+
+class AccrualEntry(Base):
+    """
+    Начисление кошельку в рамках прогона.
+
+    Первичный ключ (run_id, wallet_id) гарантирует, что прогон начисляет
+    кошельку не больше одного раза. Записи переносятся между шардами
+    вместе с кошельком, поэтому ссылки на accrual_runs нет.
+
+    Attributes:
+        run_id: Идентификатор прогона.
+        wallet_id: Идентификатор кошелька.
+        amount: Сумма начисления в минорных единицах.
+    """
+
+    __tablename__ = "accrual_entries"
+
+    run_id: Mapped[str] = mapped_column(String(64), primary_key=True)
+    wallet_id: Mapped[uuid.UUID] = mapped_column(
+        ForeignKey("wallets.id", ondelete="CASCADE"), primary_key=True, index=True
+    )
+    amount: Mapped[int] = mapped_column(BigInteger)
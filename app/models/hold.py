@@ -0,0 +1,48 @@
+"""
+Модель холда.
+
+Описывает таблицу holds — суммы, зарезервированные на кошельке
+до списания (capture), отмены (release) или истечения срока.
+"""
+
+import uuid
+from datetime import datetime
+
+from sqlalchemy import BigInteger, Enum, ForeignKey, Index, text
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.database.database import Base
+from app.schemas.hold import HoldStatus
+
+
+class Hold(Base):
+    """
+    Холд на сумму в кошельке.
+
+    Attributes:
+        id: Уникальный идентификатор холда (UUID).
+        wallet_id: Идентификатор кошелька.
+        amount: Зарезервированная сумма в минорных единицах.
+        status: Статус (ACTIVE / CAPTURED / RELEASED / EXPIRED).
+        expires_at: Момент, после которого активный холд истекает.
+    """
+
+    __tablename__ = "holds"
+    __table_args__ = (
+        Index(
+            "ix_holds_active_expires_at",
+            "expires_at",
+            postgresql_where=text("status = 'ACTIVE'"),
+        ),
+    )
+
+    id: Mapped[uuid.UUID] = mapped_column(primary_key=True, default=uuid.uuid4)
+    wallet_id: Mapped[uuid.UUID] = mapped_column(
+        ForeignKey("wallets.id", ondelete="CASCADE"), index=True
+    )
+    amount: Mapped[int] = mapped_column(BigInteger)
+    status: Mapped[HoldStatus] = mapped_column(
+        Enum(HoldStatus, native_enum=False, length=16),
+        default=HoldStatus.ACTIVE,
+    )
+    expires_at: Mapped[datetime]
@@ -0,0 +1,69 @@
+"""
+Модель операции над кошельком.
+
+Описывает таблицу operations — очередь асинхронных операций,
+принятых API и применяемых фоновыми воркерами.
+"""
+
+import uuid
+
+from sqlalchemy import (
+    BigInteger,
+    Enum,
+    ForeignKey,
+    Identity,
+    Index,
+    String,
+    text,
+)
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.database.database import Base
+from app.schemas.operation import OperationStatus
+from app.schemas.wallet import OperationType
+
+
+class Operation(Base):
+    """
+    Операция пополнения или снятия, поставленная в очередь.
+
+    Attributes:
+        id: Уникальный идентификатор операции (UUID).
+        seq: Монотонный порядковый номер, задаёт порядок применения
+            операций в рамках одного кошелька.
+        wallet_id: Идентификатор кошелька.
+        operation_type: Тип операции (DEPOSIT / WITHDRAW).
+        amount: Сумма операции в минорных единицах.
+        status: Статус обработки (PENDING / APPLIED / REJECTED).
+        detail: Причина отказа для отклонённых операций.
+    """
+
+    __tablename__ = "operations"
+    __table_args__ = (
+        Index(
+            "ix_operations_pending_seq",
+            "seq",
+            postgresql_where=text("status = 'PENDING'"),
+        ),
+        Index(
+            "ix_operations_pending_wallet_seq",
+            "wallet_id",
+            "seq",
+            postgresql_where=text("status = 'PENDING'"),
+        ),
+    )
+
+    id: Mapped[uuid.UUID] = mapped_column(primary_key=True, default=uuid.uuid4)
+    seq: Mapped[int] = mapped_column(BigInteger, Identity(), unique=True)
+    wallet_id: Mapped[uuid.UUID] = mapped_column(
+        ForeignKey("wallets.id", ondelete="CASCADE")
+    )
+    operation_type: Mapped[OperationType] = mapped_column(
+        Enum(OperationType, native_enum=False, length=16)
+    )
+    amount: Mapped[int] = mapped_column(BigInteger)
+    status: Mapped[OperationStatus] = mapped_column(
+        Enum(OperationStatus, native_enum=False, length=16),
+        default=OperationStatus.PENDING,
+    )
+    detail: Mapped[str | None] = mapped_column(String(255), default=None)
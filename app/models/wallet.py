@@ -5,12 +5,12 @@
 """
 
 import uuid
-from decimal import Decimal
 
-from sqlalchemy import Numeric
+from sqlalchemy import BigInteger, Index, text
 from sqlalchemy.orm import Mapped, mapped_column
 
-from app.database.database import Base
+from app.database.database import SHARD_HASH_SQL, Base
+from app.ids import uuid7
 
 
 class Wallet(Base):
@@ -18,13 +18,31 @@ class Wallet(Base):
     Кошелёк пользователя.
 
     Attributes:
-        id: Уникальный идентификатор кошелька (UUID).
-        balance: Текущий баланс кошелька с точностью до 2 знаков.
+        id: Уникальный идентификатор кошелька (UUIDv7 для новых
+            кошельков, UUIDv4 у созданных ранее).
+        balance: Текущий баланс кошелька в минорных единицах (копейках).
+        held: Сумма активных холдов в минорных единицах. Поддерживается
+            инкрементально при авторизации, списании, отмене и истечении
+            холдов, без суммирования таблицы holds.
+        version: Версия строки; увеличивается при каждом изменении баланса.
+            SQLAlchemy добавляет в UPDATE условие по версии, поэтому
+            конкурентное изменение приводит к StaleDataError.
     """
 
     __tablename__ = "wallets"
-
-    id: Mapped[uuid.UUID] = mapped_column(primary_key=True, default=uuid.uuid4)
-    balance: Mapped[Decimal] = mapped_column(
-        Numeric(precision=18, scale=2), default=Decimal("0.00")
+    __table_args__ = (
+        # Кошельки слота — диапазон хеша; индекс нужен переносу слотов.
+        Index("ix_wallets_shard_hash", text(SHARD_HASH_SQL)),
     )
+
+    id: Mapped[uuid.UUID] = mapped_column(primary_key=True, default=uuid7)
+    balance: Mapped[int] = mapped_column(BigInteger, default=0)
+    held: Mapped[int] = mapped_column(BigInteger, default=0, server_default=text("0"))
+    version: Mapped[int] = mapped_column(BigInteger, server_default=text("1"))
+
+    __mapper_args__ = {"version_id_col": version}
+
+    @property
+    def available(self) -> int:
+        """Баланс, доступный для снятия и новых холдов."""
+        return self.balance - self.held
@@ -0,0 +1,258 @@
+"""
+Репозиторий для работы с массовыми начислениями в базе данных.
+
+Инкапсулирует SQL-запросы к таблицам accrual_runs и accrual_entries
+и set-based UPDATE балансов по диапазону id кошельков.
+"""
+
+import uuid
+from datetime import datetime
+
+from sqlalchemy import (
+    BigInteger,
+    Numeric,
+    cast,
+    exists,
+    func,
+    literal,
+    select,
+    text,
+    update,
+)
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.accrual import AccrualEntry, AccrualRun
+from app.models.wallet import Wallet
+from app.schemas.accrual import AccrualKind, AccrualRule, AccrualStatus
+from app.schemas.wallet import OperationType
+from app.tracing import span
+
+
+class AccrualRepository:
+    """
+    Репозиторий для работы с прогонами начислений
+
+    Args:
+        session: Асинхронная сессия SQLAlchemy.
+    """
+
+    def __init__(self, session: AsyncSession):
+        self.session = session
+
+    async def get_run(self, run_id: str, lock: bool = False) -> AccrualRun | None:
+        """Получить прогон по идентификатору.
+
+        Args:
+            run_id: Идентификатор прогона.
+            lock: Блокировать ли строку прогона (SELECT FOR UPDATE), чтобы
+                два процесса не обрабатывали один прогон одновременно.
+
+        Returns:
+            Объект AccrualRun или None, если прогона на шарде нет.
+        """
+        stmt = select(AccrualRun).where(AccrualRun.id == run_id)
+        if lock:
+            stmt = stmt.with_for_update()
+        result = await self.session.execute(
+            stmt.execution_options(populate_existing=True)
+        )
+        return result.scalar_one_or_none()
+
+    async def create_run(
+        self,
+        run_id: str,
+        rule: AccrualRule,
+        slot_map: str,
+        cutoff: datetime | None,
+    ) -> AccrualRun:
+        """
+        Создать прогон, если его ещё нет на шарде.
+
+        Args:
+            run_id: Идентификатор прогона.
+            rule: Правило начисления.
+            slot_map: Отпечаток карты слотов.
+            cutoff: Граница времени создания кошельков; None — текущее
+                время сервера БД.
+
+        Returns:
+            Новый или уже существующий прогон.
+        """
+        stmt = (
+            insert(AccrualRun)
+            .values(
+                id=run_id,
+                rule=rule.model_dump(mode="json"),
+                slot_map=slot_map,
+                cutoff=cutoff if cutoff is not None else func.now(),
+            )
+            .on_conflict_do_nothing()
+        )
+        await self.session.execute(stmt)
+        return await self.get_run(run_id)
+
+    async def lock_chunk(self, after: uuid.UUID | None, size: int) -> list[uuid.UUID]:
+        """
+        Заблокировать следующий чанк кошельков в порядке id.
+
+        Args:
+            after: UUID последнего обработанного кошелька (None — с начала).
+            size: Размер чанка.
+
+        Returns:
+            UUID заблокированных кошельков по возрастанию.
+        """
+        stmt = select(Wallet.id).order_by(Wallet.id).limit(size).with_for_update()
+        if after is not None:
+            stmt = stmt.where(Wallet.id > after)
+        with span("db.lock"):
+            result = await self.session.execute(stmt)
+        return list(result.scalars())
+
+    async def apply_range(
+        self,
+        run: AccrualRun,
+        rule: AccrualRule,
+        after: uuid.UUID | None,
+        last: uuid.UUID,
+    ) -> tuple[int, int]:
+        """
+        Начислить по правилу кошелькам из диапазона id одним запросом.
+
+        Суммы рассчитываются в CTE, записываются в accrual_entries
+        (ON CONFLICT DO NOTHING — повторно кошелёк не начисляется),
+        и балансы меняются одним UPDATE ... FROM по вставленным записям.
+        Кошельки диапазона должны быть заблокированы (lock_chunk), чтобы
+        суммы считались от актуальных балансов.
+
+        Args:
+            run: Прогон начисления.
+            rule: Правило начисления.
+            after: Нижняя граница диапазона, не включая (None — без неё).
+            last: Верхняя граница диапазона, включая.
+
+        Returns:
+            Число кошельков, которым начислено, и общая сумма.
+        """
+        available = Wallet.balance - Wallet.held
+        if rule.kind == AccrualKind.PERCENT:
+            amount = cast(
+                func.floor(cast(Wallet.balance, Numeric) * rule.value / 100),
+                BigInteger,
+            )
+        else:
+            amount = literal(rule.value_minor, BigInteger)
+        if rule.min_minor is not None:
+            amount = func.greatest(amount, rule.min_minor)
+        if rule.max_minor is not None:
+            amount = func.least(amount, rule.max_minor)
+        if rule.operation_type == OperationType.WITHDRAW:
+            amount = func.least(amount, available - rule.floor_minor)
+
+        conditions = [
+            Wallet.id <= last,
+            Wallet.created_at <= run.cutoff,
+            available >= rule.floor_minor,
+            ~exists().where(
+                AccrualEntry.run_id == run.id, AccrualEntry.wallet_id == Wallet.id
+            ),
+        ]
+        if after is not None:
+            conditions.append(Wallet.id > after)
+        computed = (
+            select(Wallet.id, amount.label("amount")).where(*conditions).cte("computed")
+        )
+        entries = (
+            insert(AccrualEntry)
+            .from_select(
+                ["run_id", "wallet_id", "amount"],
+                select(literal(run.id), computed.c.id, computed.c.amount).where(
+                    computed.c.amount > 0
+                ),
+            )
+            .on_conflict_do_nothing()
+            .returning(AccrualEntry.wallet_id, AccrualEntry.amount)
+            .cte("entries")
+        )
+        if rule.operation_type == OperationType.DEPOSIT:
+            balance = Wallet.balance + entries.c.amount
+        else:
+            balance = Wallet.balance - entries.c.amount
+        wallets_updated = (
+            update(Wallet)
+            .where(Wallet.id == entries.c.wallet_id)
+            .values(balance=balance, version=Wallet.version + 1, updated_at=func.now())
+            .cte("wallets_updated")
+        )
+        stmt = (
+            select(
+                func.count(),
+                cast(func.coalesce(func.sum(entries.c.amount), 0), BigInteger),
+            )
+            .select_from(entries)
+            .add_cte(wallets_updated)
+        )
+        with span("db.update"):
+            result = await self.session.execute(stmt)
+        wallets, total = result.one()
+        return wallets, total
+
+    async def advance(
+        self,
+        run_id: str,
+        cursor: uuid.UUID | None,
+        wallets: int,
+        amount: int,
+        completed: bool,
+    ) -> None:
+        """
+        Сдвинуть курсор прогона и учесть результат чанка.
+
+        Args:
+            run_id: Идентификатор прогона.
+            cursor: UUID последнего обработанного кошелька.
+            wallets: Число кошельков, которым начислено в чанке.
+            amount: Сумма начислений чанка.
+            completed: Прогон на шарде завершён.
+        """
+        stmt = (
+            update(AccrualRun)
+            .where(AccrualRun.id == run_id)
+            .values(
+                cursor=cursor,
+                chunks=AccrualRun.chunks + 1,
+                wallets=AccrualRun.wallets + wallets,
+                amount=AccrualRun.amount + amount,
+                status=AccrualStatus.COMPLETED if completed else AccrualStatus.RUNNING,
+                updated_at=func.now(),
+            )
+        )
+        await self.session.execute(stmt)
+
+    async def restart(self, run_id: str, slot_map: str) -> None:
+        """Начать новый проход прогона с начала диапазона id.
+
+        Args:
+            run_id: Идентификатор прогона.
+            slot_map: Отпечаток текущей карты слотов.
+        """
+        stmt = (
+            update(AccrualRun)
+            .where(AccrualRun.id == run_id)
+            .values(
+                cursor=None,
+                slot_map=slot_map,
+                status=AccrualStatus.RUNNING,
+                updated_at=func.now(),
+            )
+        )
+        await self.session.execute(stmt)
+
+    async def set_lock_timeout(self, timeout_ms: int) -> None:
+        """Ограничить ожидание блокировок до конца транзакции.
+
+        Args:
+            timeout_ms: Таймаут в миллисекундах.
+        """
+        await self.session.execute(text(f"SET LOCAL lock_timeout = {int(timeout_ms)}"))
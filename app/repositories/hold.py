@@ -0,0 +1,150 @@
+"""
+Репозиторий для работы с холдами в базе данных.
+
+Инкапсулирует все SQL-запросы к таблице holds.
+"""
+
+import uuid
+from datetime import timedelta
+
+from sqlalchemy import BigInteger, cast, func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.hold import Hold
+from app.models.wallet import Wallet
+from app.schemas.hold import HoldStatus
+from app.tracing import span
+
+
+class HoldRepository:
+    """
+    Репозиторий для работы с холдами.
+
+    Args:
+        session: Асинхронная сессия SQLAlchemy.
+    """
+
+    def __init__(self, session: AsyncSession):
+        self.session = session
+
+    async def create(self, wallet_id: uuid.UUID, amount: int, ttl_seconds: int) -> Hold:
+        """Создать активный холд.
+
+        Срок истечения считается по часам БД (now() + ttl), по которым
+        его затем сравнивает sweeper.
+
+        Args:
+            wallet_id: Идентификатор кошелька.
+            amount: Сумма в минорных единицах.
+            ttl_seconds: Время жизни холда в секундах.
+
+        Returns:
+            Созданный объект Hold.
+        """
+        hold = Hold(
+            wallet_id=wallet_id,
+            amount=amount,
+            status=HoldStatus.ACTIVE,
+            expires_at=func.now() + timedelta(seconds=ttl_seconds),
+        )
+        self.session.add(hold)
+        await self.session.flush()
+        await self.session.refresh(hold, ["expires_at"])
+        return hold
+
+    async def get_by_id(self, hold_id: uuid.UUID) -> Hold | None:
+        """Получить холд по UUID.
+
+        Args:
+            hold_id: Идентификатор холда.
+
+        Returns:
+            Объект Hold или None, если не найден.
+        """
+        stmt = select(Hold).where(Hold.id == hold_id)
+        result = await self.session.execute(stmt)
+        return result.scalar_one_or_none()
+
+    async def get_by_id_with_lock(self, hold_id: uuid.UUID) -> tuple[Hold, bool] | None:
+        """
+        Получить холд с блокировкой строки (SELECT FOR UPDATE).
+
+        Холд блокируется раньше кошелька — в том же порядке, что и
+        в sweeper, чтобы исключить взаимоблокировки.
+
+        Args:
+            hold_id: Идентификатор холда.
+
+        Returns:
+            Пара (Hold, истёк ли срок по часам БД) или None.
+        """
+        stmt = (
+            select(Hold, Hold.expires_at <= func.now())
+            .where(Hold.id == hold_id)
+            .with_for_update(of=Hold)
+        )
+        with span("db.lock"):
+            result = await self.session.execute(stmt)
+        row = result.one_or_none()
+        return None if row is None else (row[0], row[1])
+
+    async def expire_batch(self, limit: int) -> int:
+        """
+        Перевести пачку истёкших холдов в EXPIRED одним запросом.
+
+        Холды выбираются по частичному индексу (status = 'ACTIVE') через
+        FOR UPDATE SKIP LOCKED, поэтому несколько sweeper-ов и
+        параллельные capture/release не ждут друг друга. Суммы
+        группируются по кошельку, и held каждого кошелька уменьшается
+        одним UPDATE; кошельки блокируются в порядке id.
+
+        Args:
+            limit: Максимальное число холдов в пачке.
+
+        Returns:
+            Число истёкших холдов.
+        """
+        expired = (
+            select(Hold.id, Hold.wallet_id, Hold.amount)
+            .where(Hold.status == HoldStatus.ACTIVE, Hold.expires_at <= func.now())
+            .order_by(Hold.expires_at)
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+            .cte("expired")
+        )
+        released = (
+            update(Hold)
+            .where(Hold.id == expired.c.id)
+            .values(status=HoldStatus.EXPIRED, updated_at=func.now())
+            .returning(expired.c.wallet_id, expired.c.amount)
+            .cte("released")
+        )
+        totals = (
+            select(
+                released.c.wallet_id,
+                cast(func.sum(released.c.amount), BigInteger).label("amount"),
+            )
+            .group_by(released.c.wallet_id)
+            .cte("totals")
+        )
+        locked = (
+            select(Wallet.id, totals.c.amount)
+            .join(totals, totals.c.wallet_id == Wallet.id)
+            .order_by(Wallet.id)
+            .with_for_update(of=Wallet)
+            .cte("locked")
+        )
+        wallets_updated = (
+            update(Wallet)
+            .where(Wallet.id == locked.c.id)
+            .values(
+                held=Wallet.held - locked.c.amount,
+                version=Wallet.version + 1,
+                updated_at=func.now(),
+            )
+            .cte("wallets_updated")
+        )
+        stmt = select(func.count()).select_from(released).add_cte(wallets_updated)
+        with span("db.update"):
+            result = await self.session.execute(stmt)
+        return result.scalar_one()
@@ -0,0 +1,146 @@
+"""
+Репозиторий для работы с очередью операций в базе данных.
+
+Инкапсулирует все SQL-запросы к таблице operations.
+"""
+
+import uuid
+
+from sqlalchemy import exists, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.operation import Operation
+from app.models.wallet import Wallet
+from app.schemas.operation import OperationStatus
+from app.schemas.wallet import OperationType
+
+
+class OperationRepository:
+    """
+    Репозиторий для работы с операциями.
+
+    Args:
+        session: Асинхронная сессия SQLAlchemy.
+    """
+
+    def __init__(self, session: AsyncSession):
+        self.session = session
+
+    async def create(
+        self,
+        wallet_id: uuid.UUID,
+        operation_type: OperationType,
+        amount: int,
+    ) -> Operation:
+        """Поставить операцию в очередь.
+
+        Args:
+            wallet_id: Идентификатор кошелька.
+            operation_type: Тип операции.
+            amount: Сумма операции в минорных единицах.
+
+        Returns:
+            Созданный объект Operation в статусе PENDING.
+        """
+        operation = Operation(
+            wallet_id=wallet_id,
+            operation_type=operation_type,
+            amount=amount,
+            status=OperationStatus.PENDING,
+        )
+        self.session.add(operation)
+        await self.session.flush()
+        return operation
+
+    async def get_by_id(self, operation_id: uuid.UUID) -> Operation | None:
+        """Получить операцию по UUID.
+
+        Args:
+            operation_id: Идентификатор операции.
+
+        Returns:
+            Объект Operation или None, если не найдена.
+        """
+        stmt = select(Operation).where(Operation.id == operation_id)
+        result = await self.session.execute(stmt)
+        return result.scalar_one_or_none()
+
+    async def lock_next_pending_wallet(self, scan_limit: int = 100) -> Wallet | None:
+        """
+        Захватить кошелёк с самыми старыми необработанными операциями.
+
+        Кандидаты — кошельки с операциями PENDING, по одному на кошелёк,
+        в порядке их самой старой операции, поэтому кошелёк с длинной
+        очередью не занимает всё окно поиска. Строка кошелька блокируется
+        через SELECT FOR UPDATE SKIP LOCKED: кошельки, занятые другим
+        воркером или синхронной операцией, пропускаются. Пока блокировка
+        удерживается, операции кошелька применяет только один воркер,
+        что сохраняет их порядок.
+
+        Args:
+            scan_limit: Сколько кошельков с самыми старыми операциями
+                просматривать при поиске свободного.
+
+        Returns:
+            Заблокированный объект Wallet или None, если очередь пуста.
+        """
+        first_seq = func.min(Operation.seq)
+        candidates = (
+            select(Operation.wallet_id, first_seq.label("first_seq"))
+            .where(Operation.status == OperationStatus.PENDING)
+            .group_by(Operation.wallet_id)
+            .order_by(first_seq)
+            .limit(scan_limit)
+            .subquery()
+        )
+        stmt = (
+            select(Wallet)
+            .join(candidates, candidates.c.wallet_id == Wallet.id)
+            .order_by(candidates.c.first_seq)
+            .limit(1)
+            .with_for_update(of=Wallet, skip_locked=True)
+        )
+        result = await self.session.execute(stmt)
+        return result.scalar_one_or_none()
+
+    async def has_pending(self, wallet_id: uuid.UUID) -> bool:
+        """Проверить, есть ли у кошелька необработанные операции.
+
+        Args:
+            wallet_id: Идентификатор кошелька.
+
+        Returns:
+            True, если в очереди есть операции кошелька в статусе PENDING.
+        """
+        stmt = select(
+            exists().where(
+                Operation.wallet_id == wallet_id,
+                Operation.status == OperationStatus.PENDING,
+            )
+        )
+        result = await self.session.execute(stmt)
+        return result.scalar_one()
+
+    async def get_pending_for_wallet(
+        self, wallet_id: uuid.UUID, limit: int | None = None
+    ) -> list[Operation]:
+        """Получить необработанные операции кошелька в порядке поступления.
+
+        Args:
+            wallet_id: Идентификатор кошелька.
+            limit: Максимальное число операций (None — все).
+
+        Returns:
+            Список объектов Operation, отсортированный по seq.
+        """
+        stmt = (
+            select(Operation)
+            .where(
+                Operation.wallet_id == wallet_id,
+                Operation.status == OperationStatus.PENDING,
+            )
+            .order_by(Operation.seq)
+            .limit(limit)
+        )
+        result = await self.session.execute(stmt)
+        return list(result.scalars().all())
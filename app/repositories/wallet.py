@@ -5,12 +5,14 @@
 """
 
 import uuid
-from decimal import Decimal
+from collections.abc import Sequence
 
-from sqlalchemy import select
+from sqlalchemy import Row, Uuid, any_, bindparam, select
+from sqlalchemy.dialects.postgresql import ARRAY
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.models.wallet import Wallet
+from app.tracing import span
 
 
 class WalletRepository:
@@ -34,9 +36,54 @@ class WalletRepository:
             Объект Wallet или None, если не найден.
         """
         stmt = select(Wallet).where(Wallet.id == wallet_id)
-        result = await self.session.execute(stmt)
+        with span("db.select"):
+            result = await self.session.execute(stmt)
         return result.scalar_one_or_none()
 
+    async def get_version(self, wallet_id: uuid.UUID) -> int | None:
+        """Получить только версию кошелька.
+
+        Используется для условных запросов (If-None-Match), когда тело
+        ответа может не понадобиться.
+
+        Args:
+            wallet_id: Идентификатор кошелька.
+
+        Returns:
+            Версия кошелька или None, если он не найден.
+        """
+        stmt = select(Wallet.version).where(Wallet.id == wallet_id)
+        with span("db.select"):
+            result = await self.session.execute(stmt)
+        return result.scalar_one_or_none()
+
+    async def get_many(
+        self, wallet_ids: Sequence[uuid.UUID]
+    ) -> Sequence[Row[tuple[uuid.UUID, int, int]]]:
+        """Получить балансы нескольких кошельков одним запросом.
+
+        Идентификаторы передаются одним параметром-массивом
+        (WHERE id = ANY(:ids)), поэтому текст запроса не зависит от их
+        числа и подготовленный запрос переиспользуется. Выбираются только
+        колонки id, balance и held. Запрос выполняется на соединении
+        сессии, в обход ORM: построчная обработка результата в ORM для
+        пачки из 1000 строк стоит нескольких миллисекунд.
+
+        Args:
+            wallet_ids: Идентификаторы кошельков.
+
+        Returns:
+            Строки (id, balance, held) найденных кошельков в произвольном порядке.
+        """
+        ids = bindparam("ids", list(wallet_ids), type_=ARRAY(Uuid()))
+        stmt = select(Wallet.id, Wallet.balance, Wallet.held).where(
+            Wallet.id == any_(ids)
+        )
+        connection = await self.session.connection()
+        with span("db.select"):
+            result = await connection.execute(stmt)
+        return result.all()
+
     async def get_by_id_with_lock(self, wallet_id: uuid.UUID) -> Wallet | None:
         """
         Получить кошелёк по UUID с блокировкой строки (SELECT FOR UPDATE).
@@ -51,33 +98,38 @@ class WalletRepository:
             Объект Wallet или None, если не найден.
         """
         stmt = select(Wallet).where(Wallet.id == wallet_id).with_for_update()
-        result = await self.session.execute(stmt)
+        with span("db.lock"):
+            result = await self.session.execute(stmt)
         return result.scalar_one_or_none()
 
-    async def create(self, balance: Decimal = Decimal("0.00")) -> Wallet:
+    async def create(self, wallet_id: uuid.UUID, balance: int = 0) -> Wallet:
         """Создать новый кошелёк.
 
+        Идентификатор задаёт сервис: по нему выбирается шард кошелька.
+
         Args:
-            balance: Начальный баланс (по умолчанию 0.00).
+            wallet_id: Идентификатор кошелька.
+            balance: Начальный баланс в минорных единицах (по умолчанию 0).
 
         Returns:
             Созданный объект Wallet.
         """
-        wallet = Wallet(balance=balance)
+        wallet = Wallet(id=wallet_id, balance=balance)
         self.session.add(wallet)
         await self.session.flush()
         return wallet
 
-    async def update_balance(self, wallet: Wallet, new_balance: Decimal) -> Wallet:
+    async def update_balance(self, wallet: Wallet, new_balance: int) -> Wallet:
         """Обновить баланс кошелька.
 
         Args:
             wallet: Объект кошелька для обновления.
-            new_balance: Новое значение баланса.
+            new_balance: Новое значение баланса в минорных единицах.
 
         Returns:
             Обновлённый объект Wallet.
         """
         wallet.balance = new_balance
-        await self.session.flush()
+        with span("db.update"):
+            await self.session.flush()
         return wallet
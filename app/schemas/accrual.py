@@ -0,0 +1,90 @@
+"""
+Pydantic-схемы для массовых начислений (комиссии и проценты).
+
+Содержит вид правила, статус прогона и само правило начисления.
+"""
+
+from decimal import Decimal
+from enum import Enum
+
+from pydantic import BaseModel, Field, model_validator
+
+from app.schemas.wallet import OperationType, to_minor_units
+
+
+class AccrualKind(str, Enum):
+    """Способ расчёта суммы начисления."""
+
+    PERCENT = "PERCENT"
+    FIXED = "FIXED"
+
+
+class AccrualStatus(str, Enum):
+    """Статус прогона начисления на шарде."""
+
+    RUNNING = "RUNNING"
+    COMPLETED = "COMPLETED"
+
+
+class AccrualRule(BaseModel):
+    """
+    Правило массового начисления.
+
+    Attributes:
+        operation_type: DEPOSIT — начисление (проценты),
+            WITHDRAW — списание (комиссия).
+        kind: PERCENT — процент от баланса (округляется вниз до копейки),
+            FIXED — фиксированная сумма.
+        value: Процент (до 4 знаков после запятой) или сумма
+            (до 2 знаков после запятой).
+        min_amount: Минимальная сумма начисления.
+        max_amount: Максимальная сумма начисления.
+        balance_floor: Кошельки с доступным балансом ниже порога
+            пропускаются; комиссия не опускает доступный баланс ниже него.
+    """
+
+    operation_type: OperationType
+    kind: AccrualKind
+    value: Decimal = Field(gt=0, max_digits=18, decimal_places=4)
+    min_amount: Decimal | None = Field(
+        default=None, ge=0, max_digits=18, decimal_places=2
+    )
+    max_amount: Decimal | None = Field(
+        default=None, gt=0, max_digits=18, decimal_places=2
+    )
+    balance_floor: Decimal = Field(
+        default=Decimal("0"), ge=0, max_digits=18, decimal_places=2
+    )
+
+    @model_validator(mode="after")
+    def _check_amounts(self) -> "AccrualRule":
+        """Фиксированная сумма — в копейках, минимум не больше максимума."""
+        if self.kind == AccrualKind.FIXED and self.value != round(self.value, 2):
+            raise ValueError("Fixed amount must have at most 2 decimal places")
+        if (
+            self.min_amount is not None
+            and self.max_amount is not None
+            and self.min_amount > self.max_amount
+        ):
+            raise ValueError("min_amount must not exceed max_amount")
+        return self
+
+    @property
+    def value_minor(self) -> int:
+        """Фиксированная сумма в минорных единицах."""
+        return to_minor_units(self.value)
+
+    @property
+    def min_minor(self) -> int | None:
+        """Минимальная сумма в минорных единицах."""
+        return None if self.min_amount is None else to_minor_units(self.min_amount)
+
+    @property
+    def max_minor(self) -> int | None:
+        """Максимальная сумма в минорных единицах."""
+        return None if self.max_amount is None else to_minor_units(self.max_amount)
+
+    @property
+    def floor_minor(self) -> int:
+        """Порог баланса в минорных единицах."""
+        return to_minor_units(self.balance_floor)
@@ -0,0 +1,76 @@
+"""
+Pydantic-схемы для холдов (резервирования средств).
+
+Содержит статусы холда, схему запроса авторизации и схему ответа.
+"""
+
+import uuid
+from datetime import datetime
+from decimal import Decimal
+from enum import Enum
+
+from pydantic import BaseModel, Field, field_validator
+
+from app.configs.config import settings
+from app.schemas.wallet import from_minor_units, to_minor_units
+
+
+class HoldStatus(str, Enum):
+    """Статус холда."""
+
+    ACTIVE = "ACTIVE"
+    CAPTURED = "CAPTURED"
+    RELEASED = "RELEASED"
+    EXPIRED = "EXPIRED"
+
+
+class HoldCreate(BaseModel):
+    """
+    Схема запроса на авторизацию (резервирование) суммы.
+
+    Attributes:
+        amount: Резервируемая сумма (строго больше нуля, не более 2 знаков
+            после запятой).
+        ttl_seconds: Время жизни холда в секундах.
+    """
+
+    amount: Decimal = Field(gt=0, max_digits=18, decimal_places=2)
+    ttl_seconds: int = Field(
+        default=settings.hold_default_ttl_seconds,
+        gt=0,
+        le=settings.hold_max_ttl_seconds,
+    )
+
+    @property
+    def amount_minor(self) -> int:
+        """Резервируемая сумма в минорных единицах."""
+        return to_minor_units(self.amount)
+
+
+class HoldResponse(BaseModel):
+    """
+    Схема ответа с данными холда.
+
+    Attributes:
+        id: UUID холда.
+        wallet_id: UUID кошелька.
+        amount: Зарезервированная сумма.
+        status: Статус холда.
+        expires_at: Момент истечения холда.
+    """
+
+    id: uuid.UUID
+    wallet_id: uuid.UUID
+    amount: Decimal
+    status: HoldStatus
+    expires_at: datetime
+
+    model_config = {"from_attributes": True}
+
+    @field_validator("amount", mode="before")
+    @classmethod
+    def _amount_from_minor_units(cls, value: int | Decimal) -> Decimal:
+        """Сумма модели хранится в минорных единицах."""
+        if isinstance(value, int):
+            return from_minor_units(value)
+        return value
@@ -0,0 +1,60 @@
+"""
+Pydantic-схемы для асинхронных операций над кошельками.
+
+Содержит режимы выполнения операций, статусы и схему ответа
+эндпоинта статуса операции.
+"""
+
+import uuid
+from decimal import Decimal
+from enum import Enum
+
+from pydantic import BaseModel, field_validator
+
+from app.schemas.wallet import OperationType, from_minor_units
+
+
+class OperationMode(str, Enum):
+    """Режим выполнения операции над кошельком."""
+
+    SYNC = "sync"
+    ASYNC = "async"
+
+
+class OperationStatus(str, Enum):
+    """Статус обработки асинхронной операции."""
+
+    PENDING = "PENDING"
+    APPLIED = "APPLIED"
+    REJECTED = "REJECTED"
+
+
+class OperationResponse(BaseModel):
+    """
+    Схема ответа с данными операции.
+
+    Attributes:
+        id: UUID операции.
+        wallet_id: UUID кошелька.
+        operation_type: Тип операции.
+        amount: Сумма операции.
+        status: Текущий статус обработки.
+        detail: Причина отказа (для REJECTED).
+    """
+
+    id: uuid.UUID
+    wallet_id: uuid.UUID
+    operation_type: OperationType
+    amount: Decimal
+    status: OperationStatus
+    detail: str | None = None
+
+    model_config = {"from_attributes": True}
+
+    @field_validator("amount", mode="before")
+    @classmethod
+    def _amount_from_minor_units(cls, value: int | Decimal) -> Decimal:
+        """Сумма модели хранится в минорных единицах."""
+        if isinstance(value, int):
+            return from_minor_units(value)
+        return value
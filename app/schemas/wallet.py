@@ -1,14 +1,63 @@
 """
 Pydantic-схемы для работы с кошельками.
 
-Содержит схемы запросов и ответов API.
+Содержит схемы запросов и ответов API. Баланс и суммы хранятся в БД
+в минорных единицах (копейках, BIGINT); перевод в Decimal и обратно
+выполняется только здесь, на границе API.
 """
 
 import uuid
 from decimal import Decimal
 from enum import Enum
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, field_validator
+
+MINOR_UNIT_EXPONENT = 2
+MAX_BATCH_WALLET_IDS = 1000
+
+_MINOR_UNITS_SCALE = 10**MINOR_UNIT_EXPONENT
+_MINOR_UNITS_FORMAT = f"%d.%0{MINOR_UNIT_EXPONENT}d"
+
+
+def to_minor_units(amount: Decimal) -> int:
+    """Перевести сумму в минорные единицы (1.50 -> 150).
+
+    Args:
+        amount: Сумма с точностью не более 2 знаков после запятой.
+
+    Returns:
+        Сумма в минорных единицах.
+    """
+    return int(amount.scaleb(MINOR_UNIT_EXPONENT))
+
+
+def from_minor_units(amount: int) -> Decimal:
+    """Перевести сумму из минорных единиц в Decimal (150 -> 1.50).
+
+    Args:
+        amount: Сумма в минорных единицах.
+
+    Returns:
+        Сумма с точностью 2 знака после запятой.
+    """
+    return Decimal(amount).scaleb(-MINOR_UNIT_EXPONENT)
+
+
+def format_minor_units(amount: int) -> str:
+    """Записать сумму из минорных единиц строкой ответа API (150 -> "1.50").
+
+    Совпадает со str(from_minor_units(amount)), но не создаёт Decimal;
+    используется при сериализации больших ответов.
+
+    Args:
+        amount: Сумма в минорных единицах.
+
+    Returns:
+        Сумма строкой с 2 знаками после запятой.
+    """
+    if amount < 0:
+        return "-" + _MINOR_UNITS_FORMAT % divmod(-amount, _MINOR_UNITS_SCALE)
+    return _MINOR_UNITS_FORMAT % divmod(amount, _MINOR_UNITS_SCALE)
 
 
 class OperationType(str, Enum):
@@ -24,11 +73,17 @@ class WalletOperation(BaseModel):
 
     Attributes:
         operation_type: Тип операции (DEPOSIT или WITHDRAW).
-        amount: Сумма операции (строго больше нуля).
+        amount: Сумма операции (строго больше нуля, не более 2 знаков
+            после запятой).
     """
 
     operation_type: OperationType
-    amount: Decimal = Field(gt=0)
+    amount: Decimal = Field(gt=0, max_digits=18, decimal_places=2)
+
+    @property
+    def amount_minor(self) -> int:
+        """Сумма операции в минорных единицах."""
+        return to_minor_units(self.amount)
 
 
 class WalletResponse(BaseModel):
@@ -38,9 +93,43 @@ class WalletResponse(BaseModel):
     Attributes:
         id: UUID кошелька.
         balance: Текущий баланс.
+        available: Баланс, доступный для снятия (за вычетом холдов).
     """
 
     id: uuid.UUID
     balance: Decimal
+    available: Decimal
 
     model_config = {"from_attributes": True}
+
+    @field_validator("balance", "available", mode="before")
+    @classmethod
+    def _balance_from_minor_units(cls, value: int | Decimal) -> Decimal:
+        """Балансы модели хранятся в минорных единицах."""
+        if isinstance(value, int):
+            return from_minor_units(value)
+        return value
+
+
+class WalletBatchRequest(BaseModel):
+    """
+    Схема запроса балансов нескольких кошельков.
+
+    Attributes:
+        ids: UUID кошельков (от 1 до MAX_BATCH_WALLET_IDS).
+    """
+
+    ids: list[uuid.UUID] = Field(min_length=1, max_length=MAX_BATCH_WALLET_IDS)
+
+
+class WalletBatchResponse(BaseModel):
+    """
+    Схема ответа с балансами нескольких кошельков.
+
+    Attributes:
+        wallets: Найденные кошельки в порядке запроса.
+        missing: UUID кошельков, которых нет в базе.
+    """
+
+    wallets: list[WalletResponse]
+    missing: list[uuid.UUID]
@@ -0,0 +1,174 @@
+"""
+Сервисный слой массовых начислений (комиссии и проценты).
+
+Прогон начисления обходит кошельки каждого шарда чанками по диапазонам
+id в коротких транзакциях. Каждая транзакция блокирует чанк, начисляет
+по правилу одним set-based запросом и сдвигает курсор прогона, поэтому
+прерванный прогон продолжается с места остановки, а повторный запуск
+с тем же id не начисляет дважды.
+"""
+
+import time
+import uuid
+from dataclasses import dataclass
+from datetime import datetime
+
+from app.database.database import Shard, ShardSessions
+from app.models.accrual import AccrualRun
+from app.repositories.accrual import AccrualRepository
+from app.schemas.accrual import AccrualRule, AccrualStatus
+from app.tracing import span
+
+
+class AccrualConflictError(Exception):
+    """Прогон с этим id уже запускался с другим правилом."""
+
+
+@dataclass
+class AccrualChunk:
+    """
+    Результат обработки чанка.
+
+    Attributes:
+        number: Номер чанка в прогоне на шарде.
+        scanned: Число просмотренных кошельков.
+        wallets: Число кошельков, которым начислено.
+        amount: Сумма начислений чанка в минорных единицах.
+        completed: Прогон на шарде завершён.
+        elapsed_ms: Длительность транзакции чанка, мс.
+    """
+
+    number: int
+    scanned: int
+    wallets: int
+    amount: int
+    completed: bool
+    elapsed_ms: float
+
+
+class AccrualService:
+    """Сервис массовых начислений.
+
+    Args:
+        sessions: Сессии шардов.
+    """
+
+    def __init__(self, sessions: ShardSessions):
+        self.sessions = sessions
+
+    async def start(
+        self,
+        run_id: str,
+        rule: AccrualRule,
+        shard: Shard,
+        slot_map: str,
+        cutoff: datetime | None = None,
+    ) -> AccrualRun:
+        """
+        Создать прогон на шарде или продолжить существующий.
+
+        Args:
+            run_id: Идентификатор прогона.
+            rule: Правило начисления.
+            shard: Шард.
+            slot_map: Отпечаток текущей карты слотов.
+            cutoff: Граница времени создания кошельков (None — сейчас).
+
+        Returns:
+            Прогон на шарде.
+
+        Raises:
+            AccrualConflictError: Прогон уже существует с другим правилом.
+        """
+        session = await self.sessions.for_shard(shard)
+        run = await AccrualRepository(session).create_run(
+            run_id, rule, slot_map, cutoff
+        )
+        await session.commit()
+        if AccrualRule.model_validate(run.rule) != rule:
+            raise AccrualConflictError(
+                f"Run {run_id} already exists with a different rule"
+            )
+        return run
+
+    async def restart(self, run_id: str, shard: Shard, slot_map: str) -> None:
+        """Начать прогон на шарде заново (новый проход по всем кошелькам).
+
+        Уже начисленные кошельки пропускаются по accrual_entries.
+
+        Args:
+            run_id: Идентификатор прогона.
+            shard: Шард.
+            slot_map: Отпечаток текущей карты слотов.
+        """
+        session = await self.sessions.for_shard(shard)
+        await AccrualRepository(session).restart(run_id, slot_map)
+        await session.commit()
+
+    async def get_run(self, run_id: str, shard: Shard) -> AccrualRun | None:
+        """Получить прогон на шарде."""
+        session = await self.sessions.for_shard(shard)
+        return await AccrualRepository(session).get_run(run_id)
+
+    async def apply_chunk(
+        self,
+        run_id: str,
+        rule: AccrualRule,
+        shard: Shard,
+        chunk_size: int,
+        lock_timeout_ms: int,
+    ) -> AccrualChunk:
+        """
+        Обработать следующий чанк прогона на шарде в одной транзакции.
+
+        Блокировки ждут не дольше lock_timeout_ms: если кошелёк чанка
+        занят рабочей операцией, транзакция откатывается с ошибкой
+        блокировки, и чанк можно повторить позже.
+
+        Args:
+            run_id: Идентификатор прогона.
+            rule: Правило начисления.
+            shard: Шард.
+            chunk_size: Число кошельков в чанке.
+            lock_timeout_ms: Таймаут ожидания блокировок, мс.
+
+        Returns:
+            Результат чанка; для завершённого прогона — пустой чанк
+            с completed=True.
+        """
+        started = time.perf_counter()
+        session = await self.sessions.for_shard(shard)
+        repo = AccrualRepository(session)
+        await repo.set_lock_timeout(lock_timeout_ms)
+        run = await repo.get_run(run_id, lock=True)
+        if run is None or run.status == AccrualStatus.COMPLETED:
+            number = run.chunks if run is not None else 0
+            await session.rollback()
+            return AccrualChunk(
+                number=number,
+                scanned=0,
+                wallets=0,
+                amount=0,
+                completed=True,
+                elapsed_ms=(time.perf_counter() - started) * 1000,
+            )
+
+        number = run.chunks + 1
+        ids = await repo.lock_chunk(run.cursor, chunk_size)
+        wallets = amount = 0
+        cursor: uuid.UUID | None = run.cursor
+        if ids:
+            wallets, amount = await repo.apply_range(run, rule, run.cursor, ids[-1])
+            cursor = ids[-1]
+        completed = len(ids) < chunk_size
+        await repo.advance(run_id, cursor, wallets, amount, completed)
+        with span("db.commit"):
+            await session.commit()
+        return AccrualChunk(
+            number=number,
+            scanned=len(ids),
+            wallets=wallets,
+            amount=amount,
+            completed=completed,
+            elapsed_ms=(time.perf_counter() - started) * 1000,
+        )
@@ -0,0 +1,243 @@
+"""
+Сервисный слой для холдов (авторизация и списание средств).
+
+Содержит авторизацию суммы, её списание (capture), отмену (release)
+и пакетное истечение холдов по TTL.
+"""
+
+import logging
+import uuid
+
+from fastapi import HTTPException, status
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database.database import Shard, ShardSessions
+from app.models.hold import Hold
+from app.models.wallet import Wallet
+from app.repositories.hold import HoldRepository
+from app.repositories.wallet import WalletRepository
+from app.schemas.hold import HoldStatus
+from app.tracing import span
+
+logger = logging.getLogger("wallet_api")
+
+
+class HoldService:
+    """Сервис для управления холдами.
+
+    Сумма активных холдов кошелька хранится в колонке wallets.held и
+    меняется вместе с каждым холдом, поэтому доступный баланс
+    (balance - held) не требует суммирования холдов при чтении.
+
+    Холд хранится на шарде своего кошелька. По UUID холда шард
+    не определить, поэтому get/capture/release ищут его на всех шардах
+    одновременно.
+
+    Args:
+        sessions: Сессии шардов текущего запроса.
+    """
+
+    def __init__(self, sessions: ShardSessions):
+        self.sessions = sessions
+
+    async def authorize(
+        self, wallet_id: uuid.UUID, amount: int, ttl_seconds: int
+    ) -> Hold:
+        """
+        Зарезервировать сумму на кошельке.
+
+        Args:
+            wallet_id: UUID кошелька.
+            amount: Сумма в минорных единицах.
+            ttl_seconds: Время жизни холда в секундах.
+
+        Returns:
+            Созданный объект Hold.
+
+        Raises:
+            HTTPException: 404, если кошелёк не найден.
+            HTTPException: 400, если доступных средств недостаточно.
+        """
+        session, wallet = await self.sessions.locate(
+            wallet_id,
+            lambda session: WalletRepository(session).get_by_id_with_lock(wallet_id),
+        )
+        if wallet is None:
+            logger.warning("Кошелёк не найден для холда: %s", wallet_id)
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Wallet not found",
+            )
+        if wallet.available < amount:
+            logger.warning(
+                "Недостаточно средств для холда: кошелёк=%s, доступно=%s, сумма=%s",
+                wallet_id,
+                wallet.available,
+                amount,
+            )
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Insufficient funds",
+            )
+
+        wallet.held += amount
+        hold = await HoldRepository(session).create(wallet_id, amount, ttl_seconds)
+        with span("db.commit"):
+            await session.commit()
+        logger.info("Холд создан: %s, кошелёк=%s, сумма=%s", hold.id, wallet_id, amount)
+        return hold
+
+    async def get_hold(self, hold_id: uuid.UUID) -> Hold:
+        """Получить холд по идентификатору.
+
+        Args:
+            hold_id: UUID холда.
+
+        Returns:
+            Объект Hold.
+
+        Raises:
+            HTTPException: 404, если холд не найден.
+        """
+        found = await self.sessions.find(
+            lambda session: HoldRepository(session).get_by_id(hold_id)
+        )
+        if found is not None:
+            return found[1]
+        logger.warning("Холд не найден: %s", hold_id)
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Hold not found",
+        )
+
+    async def capture(self, hold_id: uuid.UUID) -> Hold:
+        """
+        Списать зарезервированную сумму с кошелька.
+
+        Если срок холда истёк, но sweeper ещё не успел его обработать,
+        холд переводится в EXPIRED, резерв снимается, а клиент
+        получает 409.
+
+        Args:
+            hold_id: UUID холда.
+
+        Returns:
+            Объект Hold в статусе CAPTURED.
+
+        Raises:
+            HTTPException: 404, если холд или кошелёк не найден.
+            HTTPException: 409, если холд не активен или истёк.
+        """
+        session, hold, expired = await self._lock_active(hold_id)
+        wallet = await self._lock_wallet(session, hold)
+        wallet.held -= hold.amount
+        if expired:
+            hold.status = HoldStatus.EXPIRED
+            with span("db.commit"):
+                await session.commit()
+            logger.warning("Холд истёк до списания: %s", hold_id)
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="Hold expired",
+            )
+
+        wallet.balance -= hold.amount
+        hold.status = HoldStatus.CAPTURED
+        with span("db.commit"):
+            await session.commit()
+        logger.info(
+            "Холд списан: %s, кошелёк=%s, сумма=%s, новый_баланс=%s",
+            hold_id,
+            wallet.id,
+            hold.amount,
+            wallet.balance,
+        )
+        return hold
+
+    async def release(self, hold_id: uuid.UUID) -> Hold:
+        """
+        Отменить холд и вернуть сумму в доступный баланс.
+
+        Args:
+            hold_id: UUID холда.
+
+        Returns:
+            Объект Hold в статусе RELEASED.
+
+        Raises:
+            HTTPException: 404, если холд или кошелёк не найден.
+            HTTPException: 409, если холд не активен.
+        """
+        session, hold, _ = await self._lock_active(hold_id)
+        wallet = await self._lock_wallet(session, hold)
+        wallet.held -= hold.amount
+        hold.status = HoldStatus.RELEASED
+        with span("db.commit"):
+            await session.commit()
+        logger.info(
+            "Холд отменён: %s, кошелёк=%s, сумма=%s", hold_id, wallet.id, hold.amount
+        )
+        return hold
+
+    async def expire_batch(self, batch_size: int, shard: Shard) -> int:
+        """
+        Перевести в EXPIRED пачку холдов с истёкшим сроком на шарде.
+
+        Args:
+            batch_size: Максимальное число холдов в пачке.
+            shard: Шард, на котором снимаются холды.
+
+        Returns:
+            Число истёкших холдов (0, если истёкших нет).
+        """
+        session = await self.sessions.for_shard(shard)
+        expired = await HoldRepository(session).expire_batch(batch_size)
+        await session.commit()
+        if expired:
+            logger.info("Истёкшие холды сняты: %s", expired)
+        return expired
+
+    async def _lock_wallet(self, session: AsyncSession, hold: Hold) -> Wallet:
+        """Заблокировать кошелёк холда (после блокировки самого холда).
+
+        Raises:
+            HTTPException: 404, если кошелёк не найден на шарде холда.
+        """
+        wallet_id, hold_id = hold.wallet_id, hold.id
+        wallet = await WalletRepository(session).get_by_id_with_lock(wallet_id)
+        if wallet is None:
+            await session.rollback()
+            logger.warning("Кошелёк холда не найден: %s, холд=%s", wallet_id, hold_id)
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Wallet not found",
+            )
+        return wallet
+
+    async def _lock_active(self, hold_id: uuid.UUID) -> tuple[AsyncSession, Hold, bool]:
+        """Найти и заблокировать холд, убедиться, что он активен.
+
+        Returns:
+            Сессия шарда холда, Hold и признак истечения его срока.
+
+        Raises:
+            HTTPException: 404, если холд не найден.
+            HTTPException: 409, если холд не активен.
+        """
+        found = await self.sessions.find(
+            lambda session: HoldRepository(session).get_by_id_with_lock(hold_id)
+        )
+        if found is None:
+            logger.warning("Холд не найден: %s", hold_id)
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Hold not found",
+            )
+        session, (hold, expired) = found
+        if hold.status != HoldStatus.ACTIVE:
+            logger.warning("Холд не активен: %s, статус=%s", hold_id, hold.status)
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="Hold is not active",
+            )
+        return session, hold, expired
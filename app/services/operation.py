@@ -0,0 +1,189 @@
+"""
+Сервисный слой для асинхронных операций над кошельками.
+
+Содержит постановку операций в очередь, получение статуса
+и пакетное применение операций фоновыми воркерами.
+"""
+
+import logging
+import uuid
+
+from fastapi import HTTPException, status
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database.database import Shard, ShardSessions, SlotMovingError
+from app.models.operation import Operation
+from app.models.wallet import Wallet
+from app.repositories.operation import OperationRepository
+from app.repositories.wallet import WalletRepository
+from app.schemas.operation import OperationStatus
+from app.schemas.wallet import OperationType
+
+logger = logging.getLogger("wallet_api")
+
+
+class OperationService:
+    """Сервис для управления очередью операций.
+
+    Операция хранится на шарде своего кошелька; воркеры обрабатывают
+    очередь каждого шарда отдельно.
+
+    Args:
+        sessions: Сессии шардов текущего запроса.
+    """
+
+    def __init__(self, sessions: ShardSessions):
+        self.sessions = sessions
+
+    async def enqueue(
+        self,
+        wallet_id: uuid.UUID,
+        operation_type: OperationType,
+        amount: int,
+    ) -> Operation:
+        """
+        Принять операцию к асинхронному выполнению.
+
+        Операция сохраняется в БД и фиксируется до ответа клиенту,
+        поэтому не теряется при перезапуске приложения.
+
+        Args:
+            wallet_id: UUID кошелька.
+            operation_type: Тип операции (DEPOSIT / WITHDRAW).
+            amount: Сумма операции в минорных единицах.
+
+        Returns:
+            Созданный объект Operation в статусе PENDING.
+
+        Raises:
+            HTTPException: 404, если кошелёк не найден.
+            SlotMovingError: Кошелёк перенесён на другой шард во время
+                постановки в очередь.
+        """
+        session, wallet = await self.sessions.locate(
+            wallet_id, lambda session: WalletRepository(session).get_by_id(wallet_id)
+        )
+        if wallet is None:
+            logger.warning("Кошелёк не найден для операции: %s", wallet_id)
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Wallet not found",
+            )
+
+        try:
+            operation = await OperationRepository(session).create(
+                wallet_id, operation_type, amount
+            )
+            await session.commit()
+        except IntegrityError:
+            await session.rollback()
+            await self.sessions.router.refresh()
+            raise SlotMovingError(f"Wallet {wallet_id} was moved") from None
+        logger.info(
+            "%s принята в очередь: операция=%s, кошелёк=%s, сумма=%s",
+            operation_type.value,
+            operation.id,
+            wallet_id,
+            amount,
+        )
+        return operation
+
+    async def get_operation(self, operation_id: uuid.UUID) -> Operation:
+        """Получить операцию по идентификатору.
+
+        Args:
+            operation_id: UUID операции.
+
+        Returns:
+            Объект Operation.
+
+        Raises:
+            HTTPException: 404, если операция не найдена.
+        """
+        found = await self.sessions.find(
+            lambda session: OperationRepository(session).get_by_id(operation_id)
+        )
+        if found is not None:
+            return found[1]
+        logger.warning("Операция не найдена: %s", operation_id)
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Operation not found",
+        )
+
+    async def apply_next_batch(self, batch_size: int, shard: Shard) -> int:
+        """
+        Применить очередную пачку операций одного кошелька на шарде.
+
+        Кошелёк блокируется (SELECT FOR UPDATE SKIP LOCKED), его операции
+        применяются по порядку seq, после чего баланс и статусы операций
+        фиксируются одной транзакцией (см. apply_pending).
+
+        Args:
+            batch_size: Максимальное число операций в пачке.
+            shard: Шард, очередь которого обрабатывается.
+
+        Returns:
+            Число обработанных операций (0, если очередь пуста).
+        """
+        session = await self.sessions.for_shard(shard)
+        repo = OperationRepository(session)
+        wallet = await repo.lock_next_pending_wallet()
+        if wallet is None:
+            await session.rollback()
+            return 0
+
+        count = await self.apply_pending(session, wallet, batch_size)
+        await session.commit()
+        logger.info(
+            "Пачка операций применена: кошелёк=%s, операций=%s, новый_баланс=%s",
+            wallet.id,
+            count,
+            wallet.balance,
+        )
+        return count
+
+    async def apply_pending(
+        self, session: AsyncSession, wallet: Wallet, limit: int | None = None
+    ) -> int:
+        """
+        Применить необработанные операции заблокированного кошелька.
+
+        Операции применяются по порядку seq в текущей транзакции, фиксирует
+        её вызывающий код. Снятие, для которого не хватает доступных
+        средств (баланс за вычетом холдов), отклоняется и не влияет на
+        остальные операции.
+
+        Args:
+            session: Сессия шарда кошелька.
+            wallet: Кошелёк, заблокированный SELECT FOR UPDATE.
+            limit: Максимальное число операций (None — все).
+
+        Returns:
+            Число обработанных операций.
+        """
+        repo = OperationRepository(session)
+        operations = await repo.get_pending_for_wallet(wallet.id, limit)
+        balance = wallet.balance
+        for operation in operations:
+            if operation.operation_type == OperationType.DEPOSIT:
+                balance += operation.amount
+            elif balance - wallet.held < operation.amount:
+                operation.status = OperationStatus.REJECTED
+                operation.detail = "Insufficient funds"
+                logger.warning(
+                    "Недостаточно средств: операция=%s, кошелёк=%s, баланс=%s, "
+                    "сумма=%s",
+                    operation.id,
+                    wallet.id,
+                    balance,
+                    operation.amount,
+                )
+                continue
+            else:
+                balance -= operation.amount
+            operation.status = OperationStatus.APPLIED
+
+        await WalletRepository(session).update_balance(wallet, balance)
+        return len(operations)
@@ -2,21 +2,33 @@
 Сервисный слой для бизнес-логики работы с кошельками.
 
 Содержит валидацию, обработку операций и управление транзакциями.
+Каждая операция выполняется в сессии шарда, которому принадлежит кошелёк.
 """
 
+import asyncio
 import logging
 import uuid
-from decimal import Decimal
+from collections.abc import Collection, Sequence
 
 from fastapi import HTTPException, status
-from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import Row
+from sqlalchemy.orm.exc import StaleDataError
 
+from app.configs.config import settings
+from app.database.database import Shard, ShardSessions, SlotMovingError
+from app.ids import uuid7
+from app.models.operation import Operation
 from app.models.wallet import Wallet
+from app.repositories.operation import OperationRepository
 from app.repositories.wallet import WalletRepository
-from app.schemas.wallet import OperationType
+from app.schemas.wallet import OperationType, format_minor_units
+from app.services.operation import OperationService
+from app.tracing import span
 
 logger = logging.getLogger("wallet_api")
 
+PLACEMENT_ATTEMPTS = 5
+
 
 class WalletService:
     """Сервис для управления кошельками.
@@ -24,12 +36,34 @@ class WalletService:
     Реализует бизнес-логику операций пополнения и снятия средств.
 
     Args:
-        session: Асинхронная сессия SQLAlchemy.
+        sessions: Сессии шардов текущего запроса.
     """
 
-    def __init__(self, session: AsyncSession):
-        self.session = session
-        self.repo = WalletRepository(session)
+    def __init__(self, sessions: ShardSessions):
+        self.sessions = sessions
+        self.router = sessions.router
+
+    async def _locate(
+        self, wallet_id: uuid.UUID, lock: bool = False
+    ) -> tuple[WalletRepository, Wallet | None]:
+        """Найти кошелёк на его шарде.
+
+        Args:
+            wallet_id: UUID кошелька.
+            lock: Блокировать ли строку кошелька (SELECT FOR UPDATE).
+
+        Returns:
+            Репозиторий шарда кошелька и объект Wallet (None — не найден).
+        """
+
+        async def fetch(session):
+            repo = WalletRepository(session)
+            if lock:
+                return await repo.get_by_id_with_lock(wallet_id)
+            return await repo.get_by_id(wallet_id)
+
+        session, wallet = await self.sessions.locate(wallet_id, fetch)
+        return WalletRepository(session), wallet
 
     async def get_wallet(self, wallet_id: uuid.UUID) -> Wallet:
         """Получить кошелёк по идентификатору.
@@ -43,7 +77,7 @@ class WalletService:
         Raises:
             HTTPException: 404, если кошелёк не найден.
         """
-        wallet = await self.repo.get_by_id(wallet_id)
+        _, wallet = await self._locate(wallet_id)
         if wallet is None:
             logger.warning("Кошелёк не найден: %s", wallet_id)
             raise HTTPException(
@@ -53,47 +87,181 @@ class WalletService:
         logger.debug("Кошелёк получен: %s, баланс: %s", wallet_id, wallet.balance)
         return wallet
 
+    async def get_wallet_version(self, wallet_id: uuid.UUID) -> int:
+        """Получить версию кошелька без загрузки остальных полей.
+
+        Args:
+            wallet_id: UUID кошелька.
+
+        Returns:
+            Текущая версия кошелька.
+
+        Raises:
+            HTTPException: 404, если кошелёк не найден.
+        """
+        _, version = await self.sessions.locate(
+            wallet_id, lambda session: WalletRepository(session).get_version(wallet_id)
+        )
+        if version is None:
+            logger.warning("Кошелёк не найден: %s", wallet_id)
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Wallet not found",
+            )
+        return version
+
+    async def get_wallets(self, wallet_ids: Sequence[uuid.UUID]) -> dict[str, list]:
+        """Получить балансы нескольких кошельков.
+
+        Повторяющиеся идентификаторы учитываются один раз. Несуществующие
+        кошельки не приводят к ошибке, а возвращаются в списке missing.
+        Шарды опрашиваются параллельно, по одному запросу на шард.
+
+        Результат собирается из кортежей (id, balance, held) без создания
+        моделей pydantic: суммы сразу записываются строками, как их
+        сериализует WalletResponse, а проверять значения из БД не нужно.
+
+        Args:
+            wallet_ids: UUID кошельков.
+
+        Returns:
+            Тело ответа в форме WalletBatchResponse: найденные кошельки
+            в порядке запроса и список ненайденных UUID.
+        """
+        unique_ids = list(dict.fromkeys(wallet_ids))
+        found: dict[uuid.UUID, tuple[int, int]] = {}
+        pending = unique_ids
+        for _ in range(2):
+            groups = await self.router.group_by_shard(pending)
+            results = await asyncio.gather(
+                *(
+                    self._get_many(self.router.shards[index], ids)
+                    for index, ids in groups.items()
+                )
+            )
+            pending = []
+            for rows, moved in results:
+                found.update(
+                    (wallet_id, (balance, held)) for wallet_id, balance, held in rows
+                )
+                pending.extend(moved)
+            if not pending:
+                break
+            await self.router.refresh()
+
+        wallets = []
+        missing = []
+        for wallet_id in unique_ids:
+            amounts = found.get(wallet_id)
+            if amounts is None:
+                missing.append(wallet_id)
+                continue
+            balance, held = amounts
+            wallets.append(
+                {
+                    "id": wallet_id,
+                    "balance": format_minor_units(balance),
+                    "available": format_minor_units(balance - held),
+                }
+            )
+        logger.debug(
+            "Получены кошельки: запрошено=%s, найдено=%s",
+            len(unique_ids),
+            len(wallets),
+        )
+        return {"wallets": wallets, "missing": missing}
+
     async def perform_operation(
         self,
         wallet_id: uuid.UUID,
         operation_type: OperationType,
-        amount: Decimal,
-    ) -> Wallet:
+        amount: int,
+        expected_versions: Collection[int] | None = None,
+    ) -> Wallet | Operation:
         """
         Выполнить операцию пополнения или снятия средств.
 
-        Использует блокировку строки (SELECT FOR UPDATE) для
-        корректной работы при параллельных запросах.
+        По умолчанию использует блокировку строки (SELECT FOR UPDATE) для
+        корректной работы при параллельных запросах. Если переданы
+        expected_versions (заголовок If-Match), блокировка не берётся:
+        кошелёк читается без неё, а UPDATE выполняется с условием по
+        версии (оптимистичная блокировка). При несовпадении версии клиент
+        получает 412 и может повторить запрос.
+
+        Если у кошелька есть операции в очереди, они применяются первыми
+        в той же транзакции, чтобы синхронная операция не обогнала их.
+        If-Match сравнивается с версией до применения очереди: это та
+        версия, которую клиент видит в GET. Применяется не больше
+        operation_sync_drain_limit операций; если очередь длиннее,
+        операция ставится в её конец и возвращается как Operation.
 
         Args:
             wallet_id: UUID кошелька.
             operation_type: Тип операции (DEPOSIT / WITHDRAW).
-            amount: Сумма операции.
+            amount: Сумма операции в минорных единицах.
+            expected_versions: Допустимые текущие версии кошелька.
 
         Returns:
-            Обновлённый объект Wallet.
+            Обновлённый объект Wallet или Operation в статусе PENDING,
+            если очередь кошелька длиннее лимита.
 
         Raises:
             HTTPException: 404, если кошелёк не найден.
-            HTTPException: 400, если недостаточно средств для снятия.
+            HTTPException: 400, если доступных средств (баланс за вычетом
+                холдов) недостаточно для снятия.
+            HTTPException: 412, если версия кошелька не совпала.
         """
-        wallet = await self.repo.get_by_id_with_lock(wallet_id)
+        repo, wallet = await self._locate(wallet_id, lock=expected_versions is None)
         if wallet is None:
             logger.warning("Кошелёк не найден для операции: %s", wallet_id)
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Wallet not found",
             )
+        operations = OperationRepository(repo.session)
+        pending = await operations.has_pending(wallet_id)
+        if pending and expected_versions is not None:
+            await repo.session.refresh(wallet, with_for_update=True)
+        if expected_versions is not None and wallet.version not in expected_versions:
+            logger.warning(
+                "Версия кошелька не совпала: кошелёк=%s, версия=%s, ожидалась=%s",
+                wallet_id,
+                wallet.version,
+                sorted(expected_versions),
+            )
+            raise HTTPException(
+                status_code=status.HTTP_412_PRECONDITION_FAILED,
+                detail="Wallet version mismatch",
+            )
+        if pending:
+            # Синхронная операция не обгоняет принятые в очередь: они
+            # применяются первыми под той же блокировкой кошелька.
+            limit = settings.operation_sync_drain_limit
+            applied = await OperationService(self.sessions).apply_pending(
+                repo.session, wallet, limit
+            )
+            if applied == limit and await operations.has_pending(wallet_id):
+                operation = await operations.create(wallet_id, operation_type, amount)
+                with span("db.commit"):
+                    await repo.session.commit()
+                logger.info(
+                    "Очередь кошелька длиннее %s, операция поставлена в очередь: "
+                    "%s, кошелёк=%s",
+                    limit,
+                    operation.id,
+                    wallet_id,
+                )
+                return operation
 
         if operation_type == OperationType.DEPOSIT:
             new_balance = wallet.balance + amount
         else:
             new_balance = wallet.balance - amount
-            if new_balance < 0:
+            if wallet.available < amount:
                 logger.warning(
-                    "Недостаточно средств: кошелёк=%s, баланс=%s, сумма=%s",
+                    "Недостаточно средств: кошелёк=%s, доступно=%s, сумма=%s",
                     wallet_id,
-                    wallet.balance,
+                    wallet.available,
                     amount,
                 )
                 raise HTTPException(
@@ -101,8 +269,17 @@ class WalletService:
                     detail="Insufficient funds",
                 )
 
-        wallet = await self.repo.update_balance(wallet, new_balance)
-        await self.session.commit()
+        try:
+            wallet = await repo.update_balance(wallet, new_balance)
+        except StaleDataError:
+            await repo.session.rollback()
+            logger.warning("Кошелёк изменён параллельно: %s", wallet_id)
+            raise HTTPException(
+                status_code=status.HTTP_412_PRECONDITION_FAILED,
+                detail="Wallet version mismatch",
+            ) from None
+        with span("db.commit"):
+            await repo.session.commit()
         logger.info(
             "%s: кошелёк=%s, сумма=%s, новый_баланс=%s",
             operation_type.value,
@@ -112,17 +289,59 @@ class WalletService:
         )
         return wallet
 
-    async def create_wallet(self, balance: Decimal = Decimal("0.00")) -> Wallet:
+    async def create_wallet(self, balance: int = 0) -> Wallet:
         """
         Создать новый кошелёк.
 
+        UUID нового кошелька — UUIDv7, упорядоченный по времени создания.
+        Шард нового кошелька определяется слотом его UUID. Владение
+        слотом проверяется с блокировкой FOR SHARE в той же транзакции,
+        что и вставка, поэтому кошелёк не попадёт на шард, с которого
+        слот в этот момент переносится; в этом случае берётся новый UUID.
+
         Args:
-            balance: Начальный баланс (по умолчанию 0.00).
+            balance: Начальный баланс в минорных единицах (по умолчанию 0).
 
         Returns:
             Созданный объект Wallet.
+
+        Raises:
+            SlotMovingError: Не удалось разместить кошелёк за несколько попыток.
         """
-        wallet = await self.repo.create(balance)
-        await self.session.commit()
-        logger.info("Кошелёк создан: %s", wallet.id)
-        return wallet
+        for _ in range(PLACEMENT_ATTEMPTS):
+            wallet_id = uuid7()
+            try:
+                session = await self.sessions.for_wallet(wallet_id)
+            except SlotMovingError:
+                continue
+            if not await self.router.owns(
+                session, [self.router.slot_for(wallet_id)], lock=True
+            ):
+                await session.rollback()
+                await self.router.refresh()
+                continue
+            wallet = await WalletRepository(session).create(wallet_id, balance)
+            with span("db.commit"):
+                await session.commit()
+            logger.info("Кошелёк создан: %s", wallet.id)
+            return wallet
+        raise SlotMovingError("No shard accepted the new wallet")
+
+    async def _get_many(
+        self, shard: Shard, wallet_ids: list[uuid.UUID]
+    ) -> tuple[Sequence[Row], list[uuid.UUID]]:
+        """Получить кошельки одного шарда.
+
+        Returns:
+            Найденные строки и ненайденные UUID, чьи слоты шард уже
+            не держит (их нужно искать заново по обновлённой карте).
+        """
+        session = await self.sessions.for_shard(shard)
+        rows = await WalletRepository(session).get_many(wallet_ids)
+        if len(rows) == len(wallet_ids):
+            return rows, []
+        found = {row.id for row in rows}
+        missing = [wallet_id for wallet_id in wallet_ids if wallet_id not in found]
+        if await self.router.owns(session, [self.router.slot_for(w) for w in missing]):
+            return rows, []
+        return rows, missing
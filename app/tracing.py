@@ -0,0 +1,495 @@
+"""
+Трассировка запросов.
+
+Лёгкие span-ы для фаз обработки запроса (rate limiter, получение
+соединения, блокировка строки, UPDATE, commit, сериализация ответа).
+Middleware формирует заголовок Server-Timing, выгружает span-ы в файл
+в формате OTLP/JSON (фоновым потоком, пачками) и пишет в лог дерево span-ов и SQL-запросы
+медленных запросов.
+
+Если трассировка выключена (TRACING_ENABLED=false), middleware
+и обработчики событий SQLAlchemy не регистрируются, а span() сводится
+к чтению ContextVar и возврату общего no-op объекта.
+"""
+
+import functools
+import json
+import logging
+import os
+import queue
+import secrets
+import threading
+import time
+from collections.abc import Awaitable, Callable
+from contextvars import ContextVar, Token
+from dataclasses import dataclass, field
+from typing import Any, ParamSpec, TypeVar
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.configs.config import settings
+
+logger = logging.getLogger("wallet_api")
+
+P = ParamSpec("P")
+R = TypeVar("R")
+
+
+@dataclass
+class Span:
+    """
+    Завершённый или активный участок трассы.
+
+    Attributes:
+        name: Имя фазы (например, db.lock).
+        span_id: Идентификатор span-а (16 hex-символов).
+        parent_id: Идентификатор родительского span-а.
+        start_ns: Время начала, нс (time.time_ns).
+        end_ns: Время окончания, нс; 0, пока span активен.
+        attributes: Дополнительные атрибуты (например, db.statement).
+    """
+
+    name: str
+    span_id: str
+    parent_id: str | None
+    start_ns: int
+    end_ns: int = 0
+    attributes: dict[str, Any] = field(default_factory=dict)
+
+    @property
+    def duration_ms(self) -> float:
+        """Длительность span-а в миллисекундах."""
+        return (self.end_ns - self.start_ns) / 1_000_000
+
+
+@dataclass
+class Trace:
+    """
+    Трасса одного HTTP-запроса.
+
+    Attributes:
+        trace_id: Идентификатор трассы (32 hex-символа).
+        root: Корневой span запроса.
+        spans: Все span-ы трассы, включая корневой.
+    """
+
+    trace_id: str
+    root: Span
+    spans: list[Span] = field(default_factory=list)
+
+    def add_span(
+        self,
+        name: str,
+        start_ns: int,
+        end_ns: int,
+        parent: Span | None = None,
+        **attributes: Any,
+    ) -> Span:
+        """Добавить в трассу уже завершённый span."""
+        parent = parent or _current_span.get() or self.root
+        item = Span(
+            name, secrets.token_hex(8), parent.span_id, start_ns, end_ns, attributes
+        )
+        self.spans.append(item)
+        return item
+
+
+_current_trace: ContextVar[Trace | None] = ContextVar("trace", default=None)
+_current_span: ContextVar[Span | None] = ContextVar("span", default=None)
+
+
+class _NoopSpan:
+    """Span, который ничего не делает; возвращается вне трассы."""
+
+    def __enter__(self) -> "_NoopSpan":
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        return None
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        """Атрибуты вне трассы игнорируются."""
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+class _ActiveSpan:
+    """Контекстный менеджер span-а внутри активной трассы."""
+
+    def __init__(self, trace: Trace, name: str, attributes: dict[str, Any]):
+        self.trace = trace
+        self.name = name
+        self.attributes = attributes
+        self.span: Span | None = None
+        self.token: Token | None = None
+
+    def __enter__(self) -> "_ActiveSpan":
+        parent = _current_span.get() or self.trace.root
+        self.span = Span(
+            self.name,
+            secrets.token_hex(8),
+            parent.span_id,
+            time.time_ns(),
+            attributes=self.attributes,
+        )
+        self.trace.spans.append(self.span)
+        self.token = _current_span.set(self.span)
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.span.end_ns = time.time_ns()
+        _current_span.reset(self.token)
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        """Установить атрибут span-а."""
+        self.span.attributes[key] = value
+
+
+def span(name: str, **attributes: Any) -> _ActiveSpan | _NoopSpan:
+    """Создать span для фазы обработки запроса.
+
+    Вне трассы (трассировка выключена или код выполняется не в запросе)
+    возвращает общий no-op объект.
+
+    Args:
+        name: Имя фазы.
+        **attributes: Атрибуты span-а.
+
+    Returns:
+        Контекстный менеджер span-а.
+    """
+    trace = _current_trace.get()
+    if trace is None:
+        return _NOOP_SPAN
+    return _ActiveSpan(trace, name, attributes)
+
+
+def traced_handler(
+    func: Callable[P, Awaitable[R]],
+) -> Callable[P, Awaitable[R]]:
+    """Декоратор эндпоинта: выполнение обработчика пишется в span handler.
+
+    Время от конца handler до отправки ответа middleware записывает
+    как span serialize.
+    """
+
+    @functools.wraps(func)
+    async def wrapper(*args: P.args, **kwargs: P.kwargs) -> R:
+        with span("handler"):
+            return await func(*args, **kwargs)
+
+    return wrapper
+
+
+def add_span(name: str, start_ns: int, end_ns: int, **attributes: Any) -> None:
+    """Добавить уже завершённый span в текущую трассу.
+
+    Вне трассы ничего не делает.
+
+    Args:
+        name: Имя фазы.
+        start_ns: Время начала, нс (time.time_ns).
+        end_ns: Время окончания, нс.
+        **attributes: Атрибуты span-а.
+    """
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.add_span(name, start_ns, end_ns, **attributes)
+
+
+def tracing_active() -> bool:
+    """Проверить, идёт ли трассировка текущего запроса."""
+    return _current_trace.get() is not None
+
+
+def start_trace(name: str, **attributes: Any) -> tuple[Trace, Token]:
+    """Начать трассу в текущем контексте.
+
+    Returns:
+        Трасса и токен для finish_trace.
+    """
+    root = Span(name, secrets.token_hex(8), None, time.time_ns(), attributes=attributes)
+    trace = Trace(secrets.token_hex(16), root, [root])
+    return trace, _current_trace.set(trace)
+
+
+def finish_trace(trace: Trace, token: Token) -> None:
+    """Завершить трассу и убрать её из текущего контекста."""
+    trace.root.end_ns = trace.root.end_ns or time.time_ns()
+    _current_trace.reset(token)
+
+
+def server_timing(trace: Trace) -> str:
+    """Сформировать значение заголовка Server-Timing.
+
+    Длительности span-ов с одинаковым именем суммируются, SQL-запросы
+    сводятся в одну метрику db.sql.
+    """
+    totals: dict[str, float] = {}
+    for item in trace.spans:
+        if item is trace.root or not item.end_ns:
+            continue
+        totals[item.name] = totals.get(item.name, 0.0) + item.duration_ms
+    end_ns = trace.root.end_ns or time.time_ns()
+    totals["total"] = (end_ns - trace.root.start_ns) / 1_000_000
+    return ", ".join(f"{name};dur={dur:.2f}" for name, dur in totals.items())
+
+
+def _otlp_value(value: Any) -> dict[str, Any]:
+    """Представить значение атрибута в формате OTLP/JSON."""
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def to_otlp(trace: Trace) -> dict[str, Any]:
+    """Преобразовать трассу в OTLP/JSON (ExportTraceServiceRequest)."""
+    spans = []
+    for item in trace.spans:
+        otlp_span = {
+            "traceId": trace.trace_id,
+            "spanId": item.span_id,
+            "name": item.name,
+            "kind": 2 if item is trace.root else 1,
+            "startTimeUnixNano": str(item.start_ns),
+            "endTimeUnixNano": str(item.end_ns),
+            "attributes": [
+                {"key": key, "value": _otlp_value(value)}
+                for key, value in item.attributes.items()
+            ],
+        }
+        if item.parent_id:
+            otlp_span["parentSpanId"] = item.parent_id
+        spans.append(otlp_span)
+    return {
+        "resourceSpans": [
+            {
+                "resource": {
+                    "attributes": [
+                        {"key": "service.name", "value": {"stringValue": "wallet-api"}}
+                    ]
+                },
+                "scopeSpans": [{"scope": {"name": "app.tracing"}, "spans": spans}],
+            }
+        ]
+    }
+
+
+def format_tree(trace: Trace) -> str:
+    """Отрисовать дерево span-ов трассы с SQL-запросами для лога."""
+    children: dict[str | None, list[Span]] = {}
+    for item in trace.spans:
+        children.setdefault(item.parent_id, []).append(item)
+
+    lines = []
+
+    def walk(item: Span, depth: int) -> None:
+        offset = (item.start_ns - trace.root.start_ns) / 1_000_000
+        lines.append(
+            f"{'  ' * depth}{item.name} +{offset:.2f}ms {item.duration_ms:.2f}ms"
+        )
+        statement = item.attributes.get("db.statement")
+        if statement:
+            lines.append(f"{'  ' * (depth + 1)}{' '.join(statement.split())}")
+        for child in sorted(children.get(item.span_id, []), key=lambda s: s.start_ns):
+            walk(child, depth + 1)
+
+    walk(trace.root, 0)
+    return "\n".join(lines)
+
+
+class FileSpanExporter:
+    """
+    Экспортёр трасс в файл: одна строка OTLP/JSON на запрос.
+
+    export() только кладёт трассу в очередь в памяти. Фоновый поток
+    забирает из очереди всё накопившееся (до batch_size трасс),
+    сериализует и дописывает в файл одной записью, поэтому дисковый ввод-вывод не выполняется в event loop.
+    Если очередь переполнена, трасса отбрасывается.
+
+    Файл можно загрузить в OpenTelemetry Collector (filelog/otlpjsonfile).
+
+    Args:
+        path: Путь к файлу трасс.
+        batch_size: Максимальное число трасс в одной записи.
+        max_queue: Максимальное число трасс в очереди.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        batch_size: int = 256,
+        max_queue: int = 10_000,
+    ):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.batch_size = batch_size
+        self.dropped = 0
+        self._queue: queue.Queue[Trace | None] = queue.Queue(maxsize=max_queue)
+        self._thread = threading.Thread(
+            target=self._run, name="trace-exporter", daemon=True
+        )
+        self._thread.start()
+
+    def export(self, trace: Trace) -> None:
+        """Поставить трассу в очередь на запись."""
+        try:
+            self._queue.put_nowait(trace)
+        except queue.Full:
+            self.dropped += 1
+
+    def flush(self) -> None:
+        """Дождаться записи всех трасс, поставленных в очередь."""
+        self._queue.join()
+
+    def close(self) -> None:
+        """Записать оставшиеся трассы и остановить поток."""
+        self._queue.put(None)
+        self._thread.join()
+
+    def _run(self) -> None:
+        """Цикл потока записи."""
+        while True:
+            item = self._queue.get()
+            batch = [item]
+            while item is not None and len(batch) < self.batch_size:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                batch.append(item)
+            traces = [trace for trace in batch if trace is not None]
+            try:
+                self._write(traces)
+            except OSError:
+                logger.exception("Не удалось выгрузить трассы: %s", len(traces))
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+            if len(traces) < len(batch):
+                return
+
+    def _write(self, traces: list[Trace]) -> None:
+        """Дописать пачку трасс в файл одной записью."""
+        if not traces:
+            return
+        lines = "".join(
+            json.dumps(to_otlp(trace), ensure_ascii=False) + "\n" for trace in traces
+        )
+        with open(self.path, mode="a") as f:
+            f.write(lines)
+
+
+class TracingMiddleware:
+    """
+    ASGI middleware трассировки HTTP-запросов.
+
+    Создаёт трассу на каждый запрос, добавляет span serialize (от конца
+    обработчика до начала отправки ответа) и заголовок Server-Timing,
+    выгружает трассу экспортёром и логирует медленные запросы.
+
+    Args:
+        app: Оборачиваемое ASGI-приложение.
+        exporter: Экспортёр трасс (None — без выгрузки).
+        slow_request_ms: Порог медленного запроса, мс.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        exporter: FileSpanExporter | None = None,
+        slow_request_ms: float = settings.tracing_slow_request_ms,
+    ):
+        self.app = app
+        self.exporter = exporter
+        self.slow_request_ms = slow_request_ms
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        trace, token = start_trace(
+            f"{scope['method']} {scope['path']}",
+            **{"http.method": scope["method"], "http.target": scope["path"]},
+        )
+
+        async def send_wrapper(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                now = time.time_ns()
+                handler = next(
+                    (s for s in reversed(trace.spans) if s.name == "handler"), None
+                )
+                if handler is not None and handler.end_ns:
+                    trace.add_span("serialize", handler.end_ns, now, trace.root)
+                trace.root.attributes["http.status_code"] = message["status"]
+                headers = MutableHeaders(scope=message)
+                headers.append("Server-Timing", server_timing(trace))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = scope.get("route")
+            if route is not None:
+                trace.root.name = f"{scope['method']} {route.path}"
+            finish_trace(trace, token)
+            self._report(trace)
+
+    def _report(self, trace: Trace) -> None:
+        """Выгрузить трассу и залогировать её, если запрос медленный."""
+        if self.exporter is not None:
+            self.exporter.export(trace)
+        if trace.root.duration_ms >= self.slow_request_ms:
+            logger.warning(
+                "Медленный запрос %s: %.2f мс, trace_id=%s\n%s",
+                trace.root.name,
+                trace.root.duration_ms,
+                trace.trace_id,
+                format_tree(trace),
+            )
+
+
+def instrument_engine(engine: Engine) -> None:
+    """Записывать SQL-запросы движка как span-ы db.sql текущей трассы.
+
+    Args:
+        engine: Синхронный движок (AsyncEngine.sync_engine).
+    """
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, many):
+        if _current_trace.get() is not None:
+            conn.info.setdefault("tracing_starts", []).append(time.time_ns())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, many):
+        trace = _current_trace.get()
+        starts = conn.info.get("tracing_starts")
+        if trace is not None and starts:
+            trace.add_span(
+                "db.sql", starts.pop(), time.time_ns(), **{"db.statement": statement}
+            )
+
+    @event.listens_for(engine, "handle_error")
+    def _handle_error(exception_context):
+        connection = exception_context.connection
+        if connection is not None:
+            connection.info.pop("tracing_starts", None)
+
+
+def default_exporter() -> FileSpanExporter | None:
+    """Экспортёр по настройкам приложения."""
+    if not settings.tracing_export:
+        return None
+    return FileSpanExporter(settings.tracing_export_path)
@@ -0,0 +1,217 @@
+"""
+Массовое начисление комиссий и процентов по всем кошелькам.
+
+Запускается отдельным процессом, параллельно с приложением. Кошельки
+каждого шарда обходятся чанками в порядке id, а каждый чанк
+обрабатывается одной короткой транзакцией через AccrualService. Между
+чанками выдерживается пауза. Если кошелёк чанка занят рабочей
+операцией дольше таймаута блокировки, чанк откатывается и
+повторяется позже, чтобы не задерживать рабочий трафик.
+
+Прогон идентифицируется --run-id. Прерванный прогон продолжается
+повторным запуском с тем же id и правилом. Завершённый прогон при
+повторном запуске ничего не начисляет. Если во время прогона слоты
+переносились между шардами, проход повторяется, а уже начисленные
+кошельки пропускаются.
+
+Запуск (DSN шардов берутся из DB_SHARDS):
+
+    python -m app.workers.accruals --run-id fee-2026-10 \\
+        --type WITHDRAW --fixed 50 --floor 100
+    python -m app.workers.accruals --run-id interest-2026-10 \\
+        --type DEPOSIT --percent 0.5 --max 1000
+"""
+
+import argparse
+import asyncio
+import hashlib
+import logging
+import logging.config
+from decimal import Decimal
+
+from pydantic import ValidationError
+from sqlalchemy.exc import DBAPIError
+
+from app.configs.config import settings
+from app.database.database import (
+    LOCK_CONFLICT_SQLSTATES,
+    Shard,
+    ShardRouter,
+    ShardSessions,
+    shard_router,
+)
+from app.logger.config import dict_config
+from app.schemas.accrual import AccrualKind, AccrualRule
+from app.schemas.wallet import OperationType, from_minor_units
+from app.services.accrual import AccrualConflictError, AccrualService
+
+logger = logging.getLogger("wallet_api")
+
+
+class AccrualRunner:
+    """
+    Выполнение прогона начисления по всем шардам.
+
+    Args:
+        router: Маршрутизатор шардов.
+        chunk_size: Число кошельков в одной транзакции.
+        pause: Пауза между чанками в секундах.
+        lock_timeout_ms: Сколько чанк ждёт блокировку кошелька, мс.
+    """
+
+    def __init__(
+        self,
+        router: ShardRouter = shard_router,
+        chunk_size: int = settings.accrual_chunk_size,
+        pause: float = settings.accrual_pause,
+        lock_timeout_ms: int = settings.accrual_lock_timeout_ms,
+    ):
+        self.router = router
+        self.chunk_size = chunk_size
+        self.pause = pause
+        self.lock_timeout_ms = lock_timeout_ms
+
+    async def run(self, run_id: str, rule: AccrualRule) -> tuple[int, int]:
+        """
+        Выполнить или продолжить прогон.
+
+        Args:
+            run_id: Идентификатор прогона.
+            rule: Правило начисления.
+
+        Returns:
+            Число кошельков, которым начислено, и общая сумма
+            в минорных единицах за весь прогон.
+
+        Raises:
+            AccrualConflictError: Прогон уже существует с другим правилом.
+        """
+        await self.router.refresh()
+        slot_map = await self._slot_map()
+        cutoff = None
+        restart = False
+        for shard in self.router.shards:
+            async with ShardSessions(self.router) as sessions:
+                run = await AccrualService(sessions).start(
+                    run_id, rule, shard, slot_map, cutoff
+                )
+            cutoff = run.cutoff
+            restart = restart or run.slot_map != slot_map
+
+        while True:
+            if restart:
+                logger.warning(
+                    "Начисление %s: карта слотов изменилась, проход повторяется",
+                    run_id,
+                )
+                for shard in self.router.shards:
+                    async with ShardSessions(self.router) as sessions:
+                        await AccrualService(sessions).restart(run_id, shard, slot_map)
+            for shard in self.router.shards:
+                await self._run_shard(run_id, rule, shard)
+            await self.router.refresh()
+            current = await self._slot_map()
+            restart = current != slot_map
+            slot_map = current
+            if not restart:
+                break
+
+        wallets = amount = 0
+        for shard in self.router.shards:
+            async with ShardSessions(self.router) as sessions:
+                run = await AccrualService(sessions).get_run(run_id, shard)
+            wallets += run.wallets
+            amount += run.amount
+        logger.info(
+            "Начисление %s завершено: кошельков %s, сумма %s",
+            run_id,
+            wallets,
+            from_minor_units(amount),
+        )
+        return wallets, amount
+
+    async def _run_shard(self, run_id: str, rule: AccrualRule, shard: Shard) -> None:
+        """Обработать чанки прогона на шарде до конца диапазона id."""
+        while True:
+            try:
+                async with ShardSessions(self.router) as sessions:
+                    chunk = await AccrualService(sessions).apply_chunk(
+                        run_id, rule, shard, self.chunk_size, self.lock_timeout_ms
+                    )
+            except DBAPIError as exc:
+                if getattr(exc.orig, "sqlstate", None) not in LOCK_CONFLICT_SQLSTATES:
+                    raise
+                logger.warning(
+                    "Начисление %s, шард %s: кошельки заняты, чанк отложен",
+                    run_id,
+                    shard.index,
+                )
+                await asyncio.sleep(max(self.pause, self.lock_timeout_ms / 1000))
+                continue
+            if chunk.scanned:
+                logger.info(
+                    "Начисление %s, шард %s: чанк %s, кошельков %s из %s, "
+                    "сумма %s, %.0f мс",
+                    run_id,
+                    shard.index,
+                    chunk.number,
+                    chunk.wallets,
+                    chunk.scanned,
+                    from_minor_units(chunk.amount),
+                    chunk.elapsed_ms,
+                )
+            if chunk.completed:
+                return
+            await asyncio.sleep(self.pause)
+
+    async def _slot_map(self) -> str:
+        """Отпечаток карты слотов."""
+        owners = await self.router.owners()
+        return hashlib.md5(repr(owners).encode()).hexdigest()
+
+
+async def main() -> None:
+    """Выполнить прогон начисления по аргументам командной строки."""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--run-id", required=True, help="идентификатор прогона")
+    parser.add_argument(
+        "--type",
+        type=OperationType,
+        required=True,
+        help="DEPOSIT — начисление, WITHDRAW — комиссия",
+    )
+    group = parser.add_mutually_exclusive_group(required=True)
+    group.add_argument("--percent", type=Decimal, help="процент от баланса")
+    group.add_argument("--fixed", type=Decimal, help="фиксированная сумма")
+    parser.add_argument("--min", type=Decimal, help="минимальная сумма")
+    parser.add_argument("--max", type=Decimal, help="максимальная сумма")
+    parser.add_argument(
+        "--floor", type=Decimal, default=Decimal("0"), help="порог баланса"
+    )
+    parser.add_argument("--chunk-size", type=int, default=settings.accrual_chunk_size)
+    parser.add_argument("--pause", type=float, default=settings.accrual_pause)
+    args = parser.parse_args()
+
+    try:
+        rule = AccrualRule(
+            operation_type=args.type,
+            kind=AccrualKind.PERCENT if args.percent is not None else AccrualKind.FIXED,
+            value=args.percent if args.percent is not None else args.fixed,
+            min_amount=args.min,
+            max_amount=args.max,
+            balance_floor=args.floor,
+        )
+    except ValidationError as exc:
+        parser.error(str(exc))
+    logging.config.dictConfig(dict_config)
+    runner = AccrualRunner(chunk_size=args.chunk_size, pause=args.pause)
+    try:
+        await runner.run(args.run_id, rule)
+    except AccrualConflictError as exc:
+        parser.error(str(exc))
+    finally:
+        await runner.router.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,89 @@
+"""
+Фоновый sweeper истёкших холдов.
+
+Периодически переводит холды с истёкшим TTL в EXPIRED и возвращает
+их суммы в доступный баланс кошельков через HoldService.
+"""
+
+import asyncio
+import logging
+
+from app.configs.config import settings
+from app.database.database import Shard, ShardRouter, ShardSessions, shard_router
+from app.services.hold import HoldService
+
+logger = logging.getLogger("wallet_api")
+
+
+class HoldSweeper:
+    """asyncio-задача, снимающая истёкшие холды пачками.
+
+    Пачка обрабатывается одним запросом с SKIP LOCKED, поэтому
+    несколько экземпляров приложения могут работать параллельно.
+    Шарды обходятся по очереди; пока пачки шарда заполняются целиком,
+    sweeper продолжает без паузы, а обойдя все шарды, ждёт interval.
+
+    Args:
+        router: Маршрутизатор шардов.
+        batch_size: Максимальное число холдов в одной пачке.
+        interval: Пауза в секундах, когда истёкших холдов не осталось.
+    """
+
+    def __init__(
+        self,
+        router: ShardRouter = shard_router,
+        batch_size: int = settings.hold_sweeper_batch_size,
+        interval: float = settings.hold_sweeper_interval,
+    ):
+        self.router = router
+        self.batch_size = batch_size
+        self.interval = interval
+        self._task: asyncio.Task | None = None
+
+    async def run_once(self, shard: Shard) -> int:
+        """Снять одну пачку истёкших холдов на шарде.
+
+        Returns:
+            Число истёкших холдов.
+        """
+        async with ShardSessions(self.router) as sessions:
+            return await HoldService(sessions).expire_batch(self.batch_size, shard)
+
+    async def drain(self) -> int:
+        """Снимать пачки, пока истёкшие холды на всех шардах не закончатся.
+
+        Returns:
+            Общее число истёкших холдов.
+        """
+        total = 0
+        for shard in self.router.shards:
+            while True:
+                expired = await self.run_once(shard)
+                total += expired
+                if expired < self.batch_size:
+                    break
+        return total
+
+    async def _run(self) -> None:
+        """Основной цикл sweeper."""
+        logger.info("Sweeper холдов запущен")
+        while True:
+            try:
+                await self.drain()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Ошибка sweeper холдов")
+            await asyncio.sleep(self.interval)
+
+    def start(self) -> None:
+        """Запустить sweeper."""
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Остановить sweeper и дождаться его завершения."""
+        if self._task is None:
+            return
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
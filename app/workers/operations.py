@@ -0,0 +1,98 @@
+"""
+Пул фоновых воркеров для применения асинхронных операций.
+
+Воркеры выбирают из очереди кошельки с необработанными операциями
+и применяют их пачками через OperationService. Очередь каждого шарда
+обслуживают свои воркеры.
+"""
+
+import asyncio
+import logging
+
+from app.configs.config import settings
+from app.database.database import Shard, ShardRouter, ShardSessions, shard_router
+from app.services.operation import OperationService
+
+logger = logging.getLogger("wallet_api")
+
+
+class OperationWorkerPool:
+    """Пул asyncio-задач, применяющих операции из очереди.
+
+    Каждый воркер в цикле захватывает один кошелёк своего шарда и
+    применяет его операции пачкой; если очередь пуста, воркер ждёт
+    poll_interval.
+
+    Args:
+        router: Маршрутизатор шардов.
+        workers: Число воркеров на шард.
+        batch_size: Максимальное число операций в одной пачке.
+        poll_interval: Пауза в секундах при пустой очереди.
+    """
+
+    def __init__(
+        self,
+        router: ShardRouter = shard_router,
+        workers: int = settings.operation_workers,
+        batch_size: int = settings.operation_batch_size,
+        poll_interval: float = settings.operation_poll_interval,
+    ):
+        self.router = router
+        self.workers = workers
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self._tasks: list[asyncio.Task] = []
+
+    async def run_once(self, shard: Shard) -> int:
+        """Применить одну пачку операций на шарде.
+
+        Returns:
+            Число обработанных операций.
+        """
+        async with ShardSessions(self.router) as sessions:
+            return await OperationService(sessions).apply_next_batch(
+                self.batch_size, shard
+            )
+
+    async def drain(self) -> int:
+        """Применять пачки, пока очереди всех шардов не опустеют.
+
+        Returns:
+            Общее число обработанных операций.
+        """
+        total = 0
+        for shard in self.router.shards:
+            while processed := await self.run_once(shard):
+                total += processed
+        return total
+
+    async def _run(self, shard: Shard, number: int) -> None:
+        """Основной цикл воркера."""
+        logger.info("Воркер операций %s шарда %s запущен", number, shard.index)
+        while True:
+            try:
+                processed = await self.run_once(shard)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception(
+                    "Ошибка воркера операций %s шарда %s", number, shard.index
+                )
+                processed = 0
+            if not processed:
+                await asyncio.sleep(self.poll_interval)
+
+    def start(self) -> None:
+        """Запустить воркеры."""
+        self._tasks = [
+            asyncio.create_task(self._run(shard, number))
+            for shard in self.router.shards
+            for number in range(self.workers)
+        ]
+
+    async def stop(self) -> None:
+        """Остановить воркеры и дождаться их завершения."""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
@@ -0,0 +1,130 @@
+"""
+Бенчмарк запроса балансов пачкой (POST /wallets/batch).
+
+Заполняет базу bench_batch на сервере из настроек приложения ROWS
+кошельками и замеряет для пачки из BATCH случайных id:
+- SELECT id, balance, held ... WHERE id = ANY(:ids) через репозиторий;
+- WalletService.get_wallets (запрос и сборка тела ответа);
+- полный HTTP-запрос через приложение (разбор тела, сервис, JSON).
+
+Печатаются медиана и 90-й перцентиль в миллисекундах.
+
+Запуск (нужна запущенная БД из настроек приложения):
+
+    pdm run python -m benchmarks.batch_lookup
+"""
+
+import asyncio
+import random
+import statistics
+import time
+from collections.abc import AsyncGenerator, Awaitable, Callable
+
+from httpx import ASGITransport, AsyncClient
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from app.configs.config import settings
+from app.database.database import ShardRouter, ShardSessions, get_sessions
+from app.limiter import limiter
+from app.load_shedding import load_shedder
+from app.main import app
+from app.models.wallet import Wallet
+from app.repositories.wallet import WalletRepository
+from app.services.wallet import WalletService
+
+DATABASE = "bench_batch"
+ROWS = 100_000
+BATCH = 1_000
+WARMUP = 50
+REQUESTS = 500
+
+
+async def create_database() -> str:
+    """Создать базу бенчмарка, если её нет, и вернуть её DSN."""
+    admin = create_async_engine(settings.database_url, isolation_level="AUTOCOMMIT")
+    async with admin.connect() as conn:
+        exists = await conn.scalar(
+            text("SELECT 1 FROM pg_database WHERE datname = :name"), {"name": DATABASE}
+        )
+        if not exists:
+            await conn.execute(text(f'CREATE DATABASE "{DATABASE}"'))
+    await admin.dispose()
+    return settings.model_copy(update={"db_name": DATABASE}).database_url
+
+
+async def measure(call: Callable[[], Awaitable[object]]) -> tuple[float, float]:
+    """Выполнить call WARMUP + REQUESTS раз; медиана и p90 в мс."""
+    samples = []
+    for number in range(WARMUP + REQUESTS):
+        started = time.perf_counter()
+        await call()
+        if number >= WARMUP:
+            samples.append((time.perf_counter() - started) * 1000)
+    samples.sort()
+    return statistics.median(samples), samples[int(len(samples) * 0.9)]
+
+
+async def main() -> None:
+    """Заполнить базу и замерить запрос пачки на всех уровнях."""
+    router = ShardRouter([await create_database()])
+    try:
+        shard = router.shards[0]
+        async with shard.engine.begin() as conn:
+            await conn.run_sync(Wallet.metadata.create_all)
+            if await conn.scalar(text("SELECT count(*) FROM wallets")) != ROWS:
+                await conn.execute(text("TRUNCATE wallets, shard_slots CASCADE"))
+                await conn.execute(
+                    text(
+                        "INSERT INTO wallets (id, balance) "
+                        "SELECT gen_random_uuid(), (random() * 1e8)::bigint "
+                        "FROM generate_series(1, :rows)"
+                    ),
+                    {"rows": ROWS},
+                )
+        async with shard.engine.connect() as conn:
+            await conn.execution_options(isolation_level="AUTOCOMMIT")
+            await conn.execute(text("VACUUM ANALYZE wallets"))
+            ids = list((await conn.execute(text("SELECT id FROM wallets"))).scalars())
+        batch = random.sample(ids, BATCH)
+        await router.refresh()
+
+        async def query() -> None:
+            async with ShardSessions(router) as sessions:
+                session = await sessions.for_shard(shard)
+                await WalletRepository(session).get_many(batch)
+
+        async def service() -> None:
+            async with ShardSessions(router) as sessions:
+                await WalletService(sessions).get_wallets(batch)
+
+        async def override_get_sessions() -> AsyncGenerator[ShardSessions, None]:
+            async with ShardSessions(router) as sessions:
+                yield sessions
+
+        app.dependency_overrides[get_sessions] = override_get_sessions
+        limiter.enabled = False
+        load_shedder.enabled = False
+        body = {"ids": [str(wallet_id) for wallet_id in batch]}
+        transport = ASGITransport(app=app)
+        async with AsyncClient(transport=transport, base_url="http://bench") as client:
+
+            async def request() -> None:
+                response = await client.post("/api/v1/wallets/batch", json=body)
+                response.raise_for_status()
+
+            print(f"Пачка из {BATCH} id, {ROWS} кошельков, {REQUESTS} запросов:")
+            for name, call in [
+                ("SELECT", query),
+                ("WalletService", service),
+                ("HTTP", request),
+            ]:
+                median, p90 = await measure(call)
+                print(f"  {name:14} медиана {median:6.2f} мс, p90 {p90:6.2f} мс")
+    finally:
+        app.dependency_overrides.pop(get_sessions, None)
+        await router.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
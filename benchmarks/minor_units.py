@@ -0,0 +1,101 @@
+"""
+Бенчмарк хранения сумм в NUMERIC(18, 2) и BIGINT (минорные единицы).
+
+Сравнивает:
+- CPU на арифметике операции (Decimal против int);
+- CPU клиента на кодировании/декодировании параметров asyncpg
+  при выполнении UPDATE ... RETURNING, как в пути /operation;
+- размер таблицы и колонки баланса в PostgreSQL.
+
+Запуск (нужна запущенная БД из настроек приложения):
+
+    pdm run python -m benchmarks.minor_units
+"""
+
+import asyncio
+import time
+import timeit
+from decimal import Decimal
+
+import asyncpg
+
+from app.configs.config import settings
+
+ROWS = 100_000
+UPDATES = 5_000
+ARITHMETIC_LOOPS = 1_000_000
+
+
+def bench_arithmetic() -> None:
+    """Арифметика снятия: вычитание и проверка на отрицательный баланс."""
+    decimal_time = timeit.timeit(
+        "new = balance - amount; new < 0",
+        globals={"balance": Decimal("5000.00"), "amount": Decimal("12.34")},
+        number=ARITHMETIC_LOOPS,
+    )
+    int_time = timeit.timeit(
+        "new = balance - amount; new < 0",
+        globals={"balance": 500000, "amount": 1234},
+        number=ARITHMETIC_LOOPS,
+    )
+    print(f"Арифметика, {ARITHMETIC_LOOPS} операций:")
+    print(f"  Decimal: {decimal_time * 1000:8.1f} мс")
+    print(f"  int:     {int_time * 1000:8.1f} мс  (x{decimal_time / int_time:.1f})")
+
+
+async def bench_updates(conn: asyncpg.Connection, table: str, amount) -> tuple:
+    """Выполнить UPDATES пополнений и замерить wall-time и CPU клиента."""
+    ids = await conn.fetch(f"SELECT id FROM {table} LIMIT {UPDATES}")
+    stmt = await conn.prepare(
+        f"UPDATE {table} SET balance = balance + $2 WHERE id = $1 RETURNING balance"
+    )
+    wall, cpu = time.perf_counter(), time.process_time()
+    for row in ids:
+        balance = await stmt.fetchval(row["id"], amount)
+        assert balance - amount >= 0
+    return time.perf_counter() - wall, time.process_time() - cpu
+
+
+async def main() -> None:
+    """Создать временные таблицы, заполнить их и сравнить показатели."""
+    bench_arithmetic()
+
+    dsn = settings.database_url.replace("postgresql+asyncpg", "postgresql")
+    conn = await asyncpg.connect(dsn)
+    try:
+        for table, column_type, value in [
+            ("bench_numeric", "NUMERIC(18, 2)", "(random() * 1e6)::numeric(18, 2)"),
+            ("bench_bigint", "BIGINT", "(random() * 1e8)::bigint"),
+        ]:
+            await conn.execute(
+                f"CREATE TEMP TABLE {table} (id uuid PRIMARY KEY, "
+                f"balance {column_type} NOT NULL)"
+            )
+            await conn.execute(
+                f"INSERT INTO {table} SELECT gen_random_uuid(), {value} "
+                f"FROM generate_series(1, {ROWS})"
+            )
+            await conn.execute(f"VACUUM ANALYZE {table}")
+
+        print(f"\nUPDATE ... RETURNING, {UPDATES} запросов:")
+        numeric = await bench_updates(conn, "bench_numeric", Decimal("12.34"))
+        bigint = await bench_updates(conn, "bench_bigint", 1234)
+        print(f"  NUMERIC: wall {numeric[0]:6.2f} с, CPU клиента {numeric[1]:6.2f} с")
+        print(f"  BIGINT:  wall {bigint[0]:6.2f} с, CPU клиента {bigint[1]:6.2f} с")
+
+        print(f"\nРазмер хранения, {ROWS} строк:")
+        for table in ("bench_numeric", "bench_bigint"):
+            table_size, column_size = await conn.fetchrow(
+                f"SELECT pg_relation_size('{table}'), avg(pg_column_size(balance)) "
+                f"FROM {table}"
+            )
+            print(
+                f"  {table}: таблица {table_size / 1024:8.0f} КБ, "
+                f"колонка в среднем {column_size:.1f} байт"
+            )
+    finally:
+        await conn.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,185 @@
+"""
+Нагрузочный бенчмарк записи при разном числе шардов.
+
+Шарды задаются --urls: DSN четырёх отдельных серверов PostgreSQL, у
+каждого свои WAL, процессы и лимит соединений. Без --urls шарды — базы
+bench_shard0..3 на сервере из настроек приложения; тогда все шарды
+делят один сервер, и рост упирается в него.
+
+Для 1, 2 и 4 шардов создаются кошельки, и конкурентные пополнения
+через WalletService (как обработчик /operation) выполняются из
+отдельного клиентского процесса на каждый шард: один процесс Python
+упирается в своё ядро раньше, чем шарды. На каждый шард приходится
+POOL_SIZE соединений на все процессы вместе, как ограничено число
+соединений одного сервера БД. Печатается пропускная способность записи.
+
+Масштабирование видно, только если ядер хватает на клиенты и на шарды:
+на машине с одним CPU все процессы делят его, и числа не растут.
+
+Запуск (локальные серверы можно поднять через initdb и
+pg_ctl -o "-p 5433" start и т. д.):
+
+    pdm run python -m benchmarks.sharding --urls \\
+        postgresql+asyncpg://postgres@localhost:5433/postgres \\
+        postgresql+asyncpg://postgres@localhost:5434/postgres \\
+        postgresql+asyncpg://postgres@localhost:5435/postgres \\
+        postgresql+asyncpg://postgres@localhost:5436/postgres
+    pdm run python -m benchmarks.sharding
+"""
+
+import argparse
+import asyncio
+import multiprocessing
+import os
+import random
+import time
+import uuid
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from app.configs.config import settings
+from app.database.database import ShardRouter, ShardSessions
+from app.models.wallet import Wallet
+from app.schemas.wallet import OperationType
+from app.services.wallet import WalletService
+
+SHARD_COUNTS = (1, 2, 4)
+WALLETS = 1_000
+OPERATIONS = 5_000
+CONCURRENCY = 64
+POOL_SIZE = 4
+
+
+def shared_url(index: int) -> str:
+    """DSN базы-шарда на сервере из настроек приложения."""
+    return settings.model_copy(update={"db_name": f"bench_shard{index}"}).database_url
+
+
+async def create_shared_databases() -> list[str]:
+    """Создать базы шардов на сервере из настроек, если их нет."""
+    admin = create_async_engine(settings.database_url, isolation_level="AUTOCOMMIT")
+    async with admin.connect() as conn:
+        for index in range(max(SHARD_COUNTS)):
+            exists = await conn.scalar(
+                text("SELECT 1 FROM pg_database WHERE datname = :name"),
+                {"name": f"bench_shard{index}"},
+            )
+            if not exists:
+                await conn.execute(text(f'CREATE DATABASE "bench_shard{index}"'))
+    await admin.dispose()
+    return [shared_url(index) for index in range(max(SHARD_COUNTS))]
+
+
+async def prepare(urls: list[str]) -> list[uuid.UUID]:
+    """Очистить шарды и создать кошельки бенчмарка."""
+    router = ShardRouter(urls)
+    try:
+        for shard in router.shards:
+            async with shard.engine.begin() as conn:
+                await conn.run_sync(Wallet.metadata.create_all)
+                await conn.execute(text("TRUNCATE wallets, shard_slots CASCADE"))
+        ids = []
+        for _ in range(WALLETS):
+            async with ShardSessions(router) as sessions:
+                ids.append((await WalletService(sessions).create_wallet()).id)
+        return ids
+    finally:
+        await router.dispose()
+
+
+async def deposit(
+    urls: list[str],
+    ids: list[uuid.UUID],
+    operations: int,
+    concurrency: int,
+    pool_size: int,
+    barrier,
+) -> tuple[float, float]:
+    """Выполнить operations пополнений; время начала и конца по часам."""
+    router = ShardRouter(urls, pool_size=pool_size, max_overflow=0)
+    try:
+        await router.refresh()
+        queue = [random.choice(ids) for _ in range(operations)]
+
+        async def worker() -> None:
+            while queue:
+                wallet_id = queue.pop()
+                async with ShardSessions(router) as sessions:
+                    await WalletService(sessions).perform_operation(
+                        wallet_id, OperationType.DEPOSIT, 100
+                    )
+
+        await asyncio.to_thread(barrier.wait)
+        started = time.time()
+        await asyncio.gather(*[worker() for _ in range(concurrency)])
+        return started, time.time()
+    finally:
+        await router.dispose()
+
+
+def client(urls, ids, operations, concurrency, pool_size, barrier, results) -> None:
+    """Клиентский процесс: пополнения в своём цикле событий."""
+    results.put(
+        asyncio.run(deposit(urls, ids, operations, concurrency, pool_size, barrier))
+    )
+
+
+def bench(urls: list[str]) -> float:
+    """Замерить пополнения в секунду на шардах urls."""
+    ids = asyncio.run(prepare(urls))
+    processes = len(urls)
+    context = multiprocessing.get_context("spawn")
+    barrier = context.Barrier(processes)
+    results = context.Queue()
+    clients = [
+        context.Process(
+            target=client,
+            args=(
+                urls,
+                ids,
+                OPERATIONS // processes,
+                CONCURRENCY // processes,
+                max(1, POOL_SIZE // processes),
+                barrier,
+                results,
+            ),
+        )
+        for _ in range(processes)
+    ]
+    for process in clients:
+        process.start()
+    spans = [results.get() for _ in clients]
+    for process in clients:
+        process.join()
+    started = min(start for start, _ in spans)
+    finished = max(finish for _, finish in spans)
+    return OPERATIONS // processes * processes / (finished - started)
+
+
+def main() -> None:
+    """Разобрать аргументы и прогнать бенчмарк."""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument(
+        "--urls",
+        nargs=max(SHARD_COUNTS),
+        metavar="DSN",
+        help="DSN отдельных серверов-шардов",
+    )
+    args = parser.parse_args()
+    urls = args.urls or asyncio.run(create_shared_databases())
+    print(
+        f"Пополнения: {OPERATIONS} операций по {WALLETS} кошелькам, "
+        f"{CONCURRENCY} конкурентных клиентов, {POOL_SIZE} соединений на шард, "
+        f"CPU: {os.cpu_count()}, шарды — "
+        + ("отдельные серверы:" if args.urls else "базы одного сервера:")
+    )
+    baseline = None
+    for count in SHARD_COUNTS:
+        rate = bench(urls[:count])
+        baseline = baseline or rate
+        print(f"  шардов {count}: {rate:8.0f} оп/с  (x{rate / baseline:.2f})")
+
+
+if __name__ == "__main__":
+    main()
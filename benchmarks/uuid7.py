@@ -0,0 +1,70 @@
+"""
+Бенчмарк первичного ключа на UUIDv4 и UUIDv7.
+
+Вставляет ROWS строк пачками по BATCH в две таблицы с первичным ключом
+uuid (id генерируются в Python, как в приложении) и сравнивает:
+- скорость вставки;
+- размер индекса первичного ключа: случайные v4 расщепляют страницы
+  по всему индексу и оставляют их заполненными примерно на 70%,
+  а v7 дописываются в правый край, и страницы заполняются до
+  fillfactor (90%).
+
+Выигрыш в скорости растёт, когда индекс перестаёт помещаться в
+shared_buffers: вставка v4 читает с диска случайную страницу индекса,
+а v7 — всегда одну и ту же, уже закэшированную.
+
+Таблицы bench_uuid4 и bench_uuid7 удаляются после замера.
+
+Запуск (нужна запущенная БД из настроек приложения):
+
+    pdm run python -m benchmarks.uuid7
+"""
+
+import asyncio
+import time
+import uuid
+
+import asyncpg
+
+from app.configs.config import settings
+from app.ids import uuid7
+
+ROWS = 1_000_000
+BATCH = 1_000
+
+
+async def bench_insert(conn: asyncpg.Connection, table: str, generate) -> float:
+    """Вставить ROWS строк пачками и вернуть число строк в секунду."""
+    await conn.execute(f"DROP TABLE IF EXISTS {table}")
+    await conn.execute(
+        f"CREATE TABLE {table} (id uuid PRIMARY KEY, balance bigint NOT NULL)"
+    )
+    stmt = await conn.prepare(f"INSERT INTO {table} SELECT unnest($1::uuid[]), 0")
+    started = time.perf_counter()
+    for _ in range(ROWS // BATCH):
+        await stmt.fetch([generate() for _ in range(BATCH)])
+    return ROWS / (time.perf_counter() - started)
+
+
+async def main() -> None:
+    """Сравнить вставку и индекс для UUIDv4 и UUIDv7."""
+    dsn = settings.database_url.replace("postgresql+asyncpg", "postgresql")
+    conn = await asyncpg.connect(dsn)
+    try:
+        print(f"Вставка {ROWS} строк пачками по {BATCH}:")
+        for table, generate in [("bench_uuid4", uuid.uuid4), ("bench_uuid7", uuid7)]:
+            rate = await bench_insert(conn, table, generate)
+            await conn.execute(f"VACUUM ANALYZE {table}")
+            index_size = await conn.fetchval(f"SELECT pg_relation_size('{table}_pkey')")
+            print(
+                f"  {table}: {rate:8.0f} строк/с, "
+                f"индекс первичного ключа {index_size / 2**20:5.1f} МБ"
+            )
+    finally:
+        for table in ("bench_uuid4", "bench_uuid7"):
+            await conn.execute(f"DROP TABLE IF EXISTS {table}")
+        await conn.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -2,50 +2,59 @@
 Фикстуры для тестов Wallet API.
 
 Настраивает тестовую БД, HTTP-клиент и вспомогательные фикстуры
-для создания кошельков.
+для создания кошельков, обработки очереди операций и холдов.
 """
 
-from collections.abc import AsyncGenerator
+from collections.abc import AsyncGenerator, Awaitable, Callable
 from decimal import Decimal
 
 import pytest
 from httpx import ASGITransport, AsyncClient
 from sqlalchemy import text
-from sqlalchemy.ext.asyncio import (
-    AsyncSession,
-    async_sessionmaker,
-    create_async_engine,
-)
 
 from app.configs.config import settings
-from app.database.database import Base, get_session
+from app.database.database import Base, ShardRouter, ShardSessions, get_sessions
 from app.limiter import limiter
+from app.load_shedding import load_shedder
 from app.main import app
+from app.models.accrual import AccrualRun  # noqa: F401
+from app.models.hold import Hold  # noqa: F401
+from app.models.operation import Operation  # noqa: F401
 from app.models.wallet import Wallet  # noqa: F401
+from app.workers.holds import HoldSweeper
+from app.workers.operations import OperationWorkerPool
 
 limiter.enabled = False
+load_shedder.enabled = False
+
+
+@pytest.fixture
+async def router() -> AsyncGenerator[ShardRouter, None]:
+    """Маршрутизатор шардов тестовой БД."""
+    shard_router = ShardRouter(settings.shard_urls, echo=False)
+    yield shard_router
+    await shard_router.dispose()
 
 
 @pytest.fixture(autouse=True)
-async def setup_db():
+async def setup_db(router: ShardRouter):
     """Подготовить таблицы и очистить данные через TRUNCATE между тестами."""
-    engine = create_async_engine(settings.database_url, echo=False)
-    session_factory = async_sessionmaker(engine, expire_on_commit=False)
 
-    async def override_get_session() -> AsyncGenerator[AsyncSession, None]:
-        async with session_factory() as session:
-            yield session
+    async def override_get_sessions() -> AsyncGenerator[ShardSessions, None]:
+        async with ShardSessions(router) as sessions:
+            yield sessions
 
-    app.dependency_overrides[get_session] = override_get_session
+    app.dependency_overrides[get_sessions] = override_get_sessions
 
-    async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
+    for shard in router.shards:
+        async with shard.engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
 
     yield
 
-    async with engine.begin() as conn:
-        await conn.execute(text("TRUNCATE wallets CASCADE"))
-    await engine.dispose()
+    for shard in router.shards:
+        async with shard.engine.begin() as conn:
+            await conn.execute(text("TRUNCATE wallets, accrual_runs CASCADE"))
 
 
 @pytest.fixture
@@ -73,3 +82,31 @@ async def funded_wallet_id(client: AsyncClient) -> str:
         json={"operation_type": "DEPOSIT", "amount": str(Decimal("5000.00"))},
     )
     return wid
+
+
+@pytest.fixture
+def create_funded(client: AsyncClient) -> Callable[..., Awaitable[str]]:
+    """Фабрика кошельков: создать кошелёк с заданным балансом и вернуть UUID."""
+
+    async def create(amount: str = "100.00") -> str:
+        wallet_id = (await client.post("/api/v1/wallets")).json()["id"]
+        if Decimal(amount):
+            await client.post(
+                f"/api/v1/wallets/{wallet_id}/operation",
+                json={"operation_type": "DEPOSIT", "amount": amount},
+            )
+        return wallet_id
+
+    return create
+
+
+@pytest.fixture
+async def operation_workers(router: ShardRouter) -> OperationWorkerPool:
+    """Пул воркеров асинхронных операций, подключённый к тестовой БД."""
+    return OperationWorkerPool(router=router, workers=2)
+
+
+@pytest.fixture
+async def hold_sweeper(router: ShardRouter) -> HoldSweeper:
+    """Sweeper истёкших холдов с маленькой пачкой, подключённый к тестовой БД."""
+    return HoldSweeper(router=router, batch_size=2)
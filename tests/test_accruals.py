@@ -0,0 +1,175 @@
+"""
+Тесты массовых начислений.
+
+Покрывает расчёт процентов и комиссий с минимумом, максимумом и порогом
+баланса, идемпотентность по id прогона, возобновление прерванного
+прогона, границу по времени создания кошельков и уступку блокировок
+рабочему трафику.
+"""
+
+import asyncio
+import uuid
+from collections.abc import Awaitable, Callable
+from decimal import Decimal
+
+import pytest
+from httpx import AsyncClient
+from sqlalchemy import select
+
+from app.database.database import ShardRouter, ShardSessions
+from app.models.wallet import Wallet
+from app.schemas.accrual import AccrualKind, AccrualRule
+from app.schemas.wallet import OperationType
+from app.services.accrual import AccrualConflictError, AccrualService
+from app.workers.accruals import AccrualRunner
+
+pytestmark = pytest.mark.asyncio
+
+INTEREST = AccrualRule(
+    operation_type=OperationType.DEPOSIT,
+    kind=AccrualKind.PERCENT,
+    value=Decimal("1.5"),
+    min_amount=Decimal("0.50"),
+    max_amount=Decimal("10.00"),
+    balance_floor=Decimal("20.00"),
+)
+FEE = AccrualRule(
+    operation_type=OperationType.WITHDRAW,
+    kind=AccrualKind.FIXED,
+    value=Decimal("30.00"),
+    balance_floor=Decimal("20.00"),
+)
+
+
+async def balance(client: AsyncClient, wallet_id: str) -> Decimal:
+    """Текущий баланс кошелька."""
+    response = await client.get(f"/api/v1/wallets/{wallet_id}")
+    return Decimal(response.json()["balance"])
+
+
+async def test_interest_percent(
+    client: AsyncClient,
+    router: ShardRouter,
+    create_funded: Callable[..., Awaitable[str]],
+):
+    """Процент начисляется с минимумом, максимумом и порогом баланса."""
+    small = await create_funded("20.00")
+    medium = await create_funded("100.00")
+    large = await create_funded("1000.00")
+    poor = await create_funded("19.99")
+
+    wallets, amount = await AccrualRunner(router, pause=0).run("interest", INTEREST)
+
+    assert (wallets, amount) == (3, 50 + 150 + 1000)
+    assert await balance(client, small) == Decimal("20.50")
+    assert await balance(client, medium) == Decimal("101.50")
+    assert await balance(client, large) == Decimal("1010.00")
+    assert await balance(client, poor) == Decimal("19.99")
+
+
+async def test_fee_respects_floor(
+    client: AsyncClient,
+    router: ShardRouter,
+    create_funded: Callable[..., Awaitable[str]],
+):
+    """Комиссия не опускает доступный баланс ниже порога и учитывает холды."""
+    rich = await create_funded("100.00")
+    low = await create_funded("40.00")
+    empty = await create_funded("0")
+    held = await create_funded("100.00")
+    await client.post(f"/api/v1/wallets/{held}/holds", json={"amount": "70.00"})
+
+    wallets, amount = await AccrualRunner(router, pause=0).run("fee", FEE)
+
+    assert (wallets, amount) == (3, 3000 + 2000 + 1000)
+    assert await balance(client, rich) == Decimal("70.00")
+    assert await balance(client, low) == Decimal("20.00")
+    assert await balance(client, empty) == Decimal("0.00")
+    assert await balance(client, held) == Decimal("90.00")
+
+
+async def test_rerun_is_idempotent(
+    client: AsyncClient,
+    router: ShardRouter,
+    create_funded: Callable[..., Awaitable[str]],
+):
+    """Повторный запуск с тем же id ничего не начисляет."""
+    wallet_id = await create_funded("100.00")
+    etag = (await client.get(f"/api/v1/wallets/{wallet_id}")).headers["etag"]
+    runner = AccrualRunner(router, pause=0)
+
+    assert await runner.run("fee", FEE) == (1, 3000)
+    assert await runner.run("fee", FEE) == (1, 3000)
+    response = await client.get(f"/api/v1/wallets/{wallet_id}")
+    assert Decimal(response.json()["balance"]) == Decimal("70.00")
+    assert response.headers["etag"] != etag
+
+    with pytest.raises(AccrualConflictError):
+        await runner.run("fee", INTEREST)
+
+
+async def test_resume_interrupted_run(
+    client: AsyncClient,
+    router: ShardRouter,
+    create_funded: Callable[..., Awaitable[str]],
+):
+    """Прерванный прогон продолжается с курсора, каждому кошельку — один раз."""
+    ids = [await create_funded("100.00") for _ in range(5)]
+    runner = AccrualRunner(router, chunk_size=2, pause=0)
+    shard = router.shards[0]
+
+    # Первый процесс успел обработать один чанк и упал.
+    async with ShardSessions(router) as sessions:
+        service = AccrualService(sessions)
+        await service.start("fee", FEE, shard, await runner._slot_map())
+        chunk = await service.apply_chunk("fee", FEE, shard, 2, 100)
+    assert (chunk.number, chunk.scanned, chunk.wallets) == (1, 2, 2)
+
+    assert await runner.run("fee", FEE) == (5, 15000)
+    assert [await balance(client, w) for w in ids] == [Decimal("70.00")] * 5
+    async with ShardSessions(router) as sessions:
+        run = await AccrualService(sessions).get_run("fee", shard)
+    assert run.chunks == 3
+
+
+async def test_wallets_created_after_start_skipped(
+    client: AsyncClient,
+    router: ShardRouter,
+    create_funded: Callable[..., Awaitable[str]],
+):
+    """Кошельки, созданные после начала прогона, не затрагиваются."""
+    before = await create_funded("100.00")
+    runner = AccrualRunner(router, pause=0)
+    async with ShardSessions(router) as sessions:
+        await AccrualService(sessions).start(
+            "fee", FEE, router.shards[0], await runner._slot_map()
+        )
+    await asyncio.sleep(0.01)
+    after = await create_funded("100.00")
+
+    assert await runner.run("fee", FEE) == (1, 3000)
+    assert await balance(client, before) == Decimal("70.00")
+    assert await balance(client, after) == Decimal("100.00")
+
+
+async def test_yields_to_locked_wallets(
+    client: AsyncClient,
+    router: ShardRouter,
+    create_funded: Callable[..., Awaitable[str]],
+):
+    """Занятый рабочей транзакцией кошелёк откладывает чанк, а не блокирует её."""
+    wallet_id = await create_funded("100.00")
+    shard = router.shards[0]
+    runner = AccrualRunner(router, pause=0.01, lock_timeout_ms=20)
+
+    async with shard.session_factory() as session:
+        await session.execute(
+            select(Wallet).where(Wallet.id == uuid.UUID(wallet_id)).with_for_update()
+        )
+        task = asyncio.create_task(runner.run("fee", FEE))
+        await asyncio.sleep(0.2)
+        assert not task.done()
+        await session.commit()
+
+    assert await task == (1, 3000)
+    assert await balance(client, wallet_id) == Decimal("70.00")
@@ -0,0 +1,103 @@
+"""
+Тесты условных запросов по версии кошелька.
+
+Покрывает ETag, ответ 304 на If-None-Match и оптимистичную
+блокировку операций через If-Match.
+"""
+
+import asyncio
+from decimal import Decimal
+
+import pytest
+from httpx import AsyncClient
+
+pytestmark = pytest.mark.asyncio
+
+
+async def deposit(client: AsyncClient, wallet_id: str, headers: dict | None = None):
+    """Пополнить кошелёк на 100.00."""
+    return await client.post(
+        f"/api/v1/wallets/{wallet_id}/operation",
+        json={"operation_type": "DEPOSIT", "amount": "100.00"},
+        headers=headers,
+    )
+
+
+async def test_etag_bumped_by_operation(client: AsyncClient, wallet_id: str):
+    """ETag меняется после каждого изменения баланса."""
+    response = await client.get(f"/api/v1/wallets/{wallet_id}")
+    assert response.headers["etag"] == '"1"'
+
+    response = await deposit(client, wallet_id)
+    assert response.headers["etag"] == '"2"'
+
+    response = await client.get(f"/api/v1/wallets/{wallet_id}")
+    assert response.headers["etag"] == '"2"'
+
+
+async def test_if_none_match_not_modified(client: AsyncClient, wallet_id: str):
+    """Совпавший If-None-Match возвращает 304 без тела."""
+    etag = (await client.get(f"/api/v1/wallets/{wallet_id}")).headers["etag"]
+
+    response = await client.get(
+        f"/api/v1/wallets/{wallet_id}", headers={"If-None-Match": f"W/{etag}"}
+    )
+    assert response.status_code == 304
+    assert response.content == b""
+    assert response.headers["etag"] == etag
+
+
+async def test_if_none_match_modified(client: AsyncClient, wallet_id: str):
+    """Устаревший If-None-Match возвращает 200 с актуальным телом."""
+    etag = (await client.get(f"/api/v1/wallets/{wallet_id}")).headers["etag"]
+    await deposit(client, wallet_id)
+
+    response = await client.get(
+        f"/api/v1/wallets/{wallet_id}", headers={"If-None-Match": etag}
+    )
+    assert response.status_code == 200
+    assert Decimal(response.json()["balance"]) == Decimal("100.00")
+
+
+async def test_if_none_match_not_found(client: AsyncClient):
+    """Условный запрос несуществующего кошелька возвращает 404."""
+    fake_id = "00000000-0000-0000-0000-000000000000"
+    response = await client.get(
+        f"/api/v1/wallets/{fake_id}", headers={"If-None-Match": '"1"'}
+    )
+    assert response.status_code == 404
+
+
+async def test_if_match_operation(client: AsyncClient, wallet_id: str):
+    """Операция с актуальным If-Match выполняется, с устаревшим — 412."""
+    response = await deposit(client, wallet_id, headers={"If-Match": '"1"'})
+    assert response.status_code == 200
+    assert response.headers["etag"] == '"2"'
+
+    response = await deposit(client, wallet_id, headers={"If-Match": '"1"'})
+    assert response.status_code == 412
+
+    response = await client.get(f"/api/v1/wallets/{wallet_id}")
+    assert Decimal(response.json()["balance"]) == Decimal("100.00")
+
+
+async def test_if_match_concurrent(client: AsyncClient, wallet_id: str):
+    """Из параллельных операций с одной версией проходит ровно одна."""
+    results = await asyncio.gather(
+        *[deposit(client, wallet_id, headers={"If-Match": '"1"'}) for _ in range(5)]
+    )
+    assert sorted(r.status_code for r in results) == [200] + [412] * 4
+
+    response = await client.get(f"/api/v1/wallets/{wallet_id}")
+    assert Decimal(response.json()["balance"]) == Decimal("100.00")
+
+
+async def test_if_match_async_mode_rejected(client: AsyncClient, wallet_id: str):
+    """If-Match не поддерживается в асинхронном режиме."""
+    response = await client.post(
+        f"/api/v1/wallets/{wallet_id}/operation",
+        params={"mode": "async"},
+        json={"operation_type": "DEPOSIT", "amount": "100.00"},
+        headers={"If-Match": '"1"'},
+    )
+    assert response.status_code == 400
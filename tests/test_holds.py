@@ -0,0 +1,194 @@
+"""
+Тесты холдов (авторизация и списание средств).
+
+Покрывает резервирование суммы, capture, release, истечение холдов
+через sweeper и влияние холдов на доступный баланс.
+"""
+
+import asyncio
+from decimal import Decimal
+
+import pytest
+from httpx import AsyncClient
+
+from app.repositories.wallet import WalletRepository
+from app.workers.holds import HoldSweeper
+
+pytestmark = pytest.mark.asyncio
+
+
+async def authorize(
+    client: AsyncClient, wallet_id: str, amount: str, ttl_seconds: int = 900
+):
+    """Создать холд на кошельке."""
+    return await client.post(
+        f"/api/v1/wallets/{wallet_id}/holds",
+        json={"amount": amount, "ttl_seconds": ttl_seconds},
+    )
+
+
+async def get_wallet(client: AsyncClient, wallet_id: str) -> dict:
+    """Получить кошелёк."""
+    return (await client.get(f"/api/v1/wallets/{wallet_id}")).json()
+
+
+async def test_authorize_reduces_available(client: AsyncClient, funded_wallet_id: str):
+    """Холд уменьшает доступный баланс, но не баланс."""
+    response = await authorize(client, funded_wallet_id, "1200.50")
+    assert response.status_code == 201
+    data = response.json()
+    assert data["status"] == "ACTIVE"
+    assert Decimal(data["amount"]) == Decimal("1200.50")
+    assert response.headers["location"].endswith(f"/api/v1/holds/{data['id']}")
+
+    wallet = await get_wallet(client, funded_wallet_id)
+    assert Decimal(wallet["balance"]) == Decimal("5000.00")
+    assert Decimal(wallet["available"]) == Decimal("3799.50")
+
+    response = await client.get(f"/api/v1/holds/{data['id']}")
+    assert response.status_code == 200
+    assert response.json()["wallet_id"] == funded_wallet_id
+
+
+async def test_authorize_insufficient_funds(client: AsyncClient, funded_wallet_id: str):
+    """Холд больше доступного баланса отклоняется."""
+    assert (await authorize(client, funded_wallet_id, "4000.00")).status_code == 201
+    response = await authorize(client, funded_wallet_id, "1000.01")
+    assert response.status_code == 400
+
+
+async def test_authorize_wallet_not_found(client: AsyncClient):
+    """Холд на несуществующем кошельке возвращает 404."""
+    fake_id = "00000000-0000-0000-0000-000000000000"
+    response = await authorize(client, fake_id, "1.00")
+    assert response.status_code == 404
+
+
+async def test_authorize_invalid_ttl(client: AsyncClient, funded_wallet_id: str):
+    """Нулевой TTL отклоняется валидацией."""
+    response = await authorize(client, funded_wallet_id, "1.00", ttl_seconds=0)
+    assert response.status_code == 422
+
+
+async def test_capture(client: AsyncClient, funded_wallet_id: str):
+    """Capture списывает сумму с баланса и снимает резерв."""
+    hold_id = (await authorize(client, funded_wallet_id, "700.00")).json()["id"]
+
+    response = await client.post(f"/api/v1/holds/{hold_id}/capture")
+    assert response.status_code == 200
+    assert response.json()["status"] == "CAPTURED"
+
+    wallet = await get_wallet(client, funded_wallet_id)
+    assert Decimal(wallet["balance"]) == Decimal("4300.00")
+    assert Decimal(wallet["available"]) == Decimal("4300.00")
+
+    response = await client.post(f"/api/v1/holds/{hold_id}/capture")
+    assert response.status_code == 409
+
+
+async def test_release(client: AsyncClient, funded_wallet_id: str):
+    """Release возвращает сумму в доступный баланс."""
+    hold_id = (await authorize(client, funded_wallet_id, "700.00")).json()["id"]
+
+    response = await client.post(f"/api/v1/holds/{hold_id}/release")
+    assert response.status_code == 200
+    assert response.json()["status"] == "RELEASED"
+
+    wallet = await get_wallet(client, funded_wallet_id)
+    assert Decimal(wallet["balance"]) == Decimal("5000.00")
+    assert Decimal(wallet["available"]) == Decimal("5000.00")
+
+    response = await client.post(f"/api/v1/holds/{hold_id}/capture")
+    assert response.status_code == 409
+
+
+async def test_hold_not_found(client: AsyncClient):
+    """Несуществующий холд возвращает 404."""
+    fake_id = "00000000-0000-0000-0000-000000000000"
+    assert (await client.get(f"/api/v1/holds/{fake_id}")).status_code == 404
+    response = await client.post(f"/api/v1/holds/{fake_id}/capture")
+    assert response.status_code == 404
+
+
+async def test_capture_wallet_missing(
+    client: AsyncClient, funded_wallet_id: str, monkeypatch: pytest.MonkeyPatch
+):
+    """Если кошелька холда нет на шарде, capture и release возвращают 404."""
+    hold_id = (await authorize(client, funded_wallet_id, "100.00")).json()["id"]
+
+    async def missing(self, wallet_id):
+        return None
+
+    monkeypatch.setattr(WalletRepository, "get_by_id_with_lock", missing)
+    for action in ("capture", "release"):
+        response = await client.post(f"/api/v1/holds/{hold_id}/{action}")
+        assert response.status_code == 404
+    monkeypatch.undo()
+
+    response = await client.get(f"/api/v1/holds/{hold_id}")
+    assert response.json()["status"] == "ACTIVE"
+
+
+async def test_withdraw_respects_holds(client: AsyncClient, funded_wallet_id: str):
+    """Снятие не может затронуть зарезервированную сумму."""
+    await authorize(client, funded_wallet_id, "4500.00")
+    response = await client.post(
+        f"/api/v1/wallets/{funded_wallet_id}/operation",
+        json={"operation_type": "WITHDRAW", "amount": "500.01"},
+    )
+    assert response.status_code == 400
+
+    response = await client.post(
+        f"/api/v1/wallets/{funded_wallet_id}/operation",
+        json={"operation_type": "WITHDRAW", "amount": "500.00"},
+    )
+    assert response.status_code == 200
+    assert Decimal(response.json()["available"]) == Decimal("0.00")
+
+
+async def test_concurrent_authorize(client: AsyncClient, funded_wallet_id: str):
+    """Параллельные холды не резервируют больше баланса."""
+    results = await asyncio.gather(
+        *[authorize(client, funded_wallet_id, "1000.00") for _ in range(8)]
+    )
+    assert sorted(r.status_code for r in results) == [201] * 5 + [400] * 3
+
+    wallet = await get_wallet(client, funded_wallet_id)
+    assert Decimal(wallet["available"]) == Decimal("0.00")
+
+
+async def test_capture_expired(client: AsyncClient, funded_wallet_id: str):
+    """Capture истёкшего холда возвращает 409 и снимает резерв."""
+    hold_id = (
+        await authorize(client, funded_wallet_id, "100.00", ttl_seconds=1)
+    ).json()["id"]
+    await asyncio.sleep(1.1)
+
+    response = await client.post(f"/api/v1/holds/{hold_id}/capture")
+    assert response.status_code == 409
+
+    response = await client.get(f"/api/v1/holds/{hold_id}")
+    assert response.json()["status"] == "EXPIRED"
+    wallet = await get_wallet(client, funded_wallet_id)
+    assert Decimal(wallet["balance"]) == Decimal("5000.00")
+    assert Decimal(wallet["available"]) == Decimal("5000.00")
+
+
+async def test_sweeper_expires_holds(
+    client: AsyncClient, funded_wallet_id: str, hold_sweeper: HoldSweeper
+):
+    """Sweeper пачками снимает истёкшие холды и не трогает активные."""
+    for _ in range(5):
+        await authorize(client, funded_wallet_id, "10.00", ttl_seconds=1)
+    active_id = (await authorize(client, funded_wallet_id, "20.00")).json()["id"]
+    await asyncio.sleep(1.1)
+
+    assert await hold_sweeper.drain() == 5
+    assert await hold_sweeper.drain() == 0
+
+    wallet = await get_wallet(client, funded_wallet_id)
+    assert Decimal(wallet["balance"]) == Decimal("5000.00")
+    assert Decimal(wallet["available"]) == Decimal("4980.00")
+
+    response = await client.get(f"/api/v1/holds/{active_id}")
+    assert response.json()["status"] == "ACTIVE"
@@ -0,0 +1,74 @@
+"""
+Тесты идентификаторов кошельков.
+
+Покрывает формат и монотонность UUIDv7, выдачу UUIDv7 новым кошелькам
+и работу с кошельками, созданными ранее с UUIDv4.
+"""
+
+import time
+import uuid
+from decimal import Decimal
+
+import pytest
+from httpx import AsyncClient
+
+from app.database.database import ShardRouter
+from app.ids import uuid7
+from app.models.wallet import Wallet
+
+pytestmark = pytest.mark.asyncio
+
+
+async def test_uuid7_format():
+    """UUIDv7 имеет версию 7, вариант RFC и текущую метку времени."""
+    before = time.time_ns() // 1_000_000
+    value = uuid7()
+    after = time.time_ns() // 1_000_000
+    assert value.version == 7
+    assert value.variant == uuid.RFC_4122
+    assert before <= value.int >> 80 <= after + 1
+
+
+async def test_uuid7_monotonic():
+    """UUIDv7 строго возрастают, в том числе внутри одной миллисекунды."""
+    values = [uuid7() for _ in range(20_000)]
+    assert values == sorted(values)
+    assert len(set(values)) == len(values)
+    assert [str(v) for v in values] == sorted(str(v) for v in values)
+
+
+async def test_uuid7_clock_backwards(monkeypatch: pytest.MonkeyPatch):
+    """Отступившие назад часы и переполнение счётчика не нарушают порядок."""
+    now = time.time_ns() + 10**12
+    monkeypatch.setattr(time, "time_ns", lambda: now)
+    first = uuid7()
+    monkeypatch.setattr(time, "time_ns", lambda: now - 10**9)
+    values = [uuid7() for _ in range(5_000)]
+    assert [first] + values == sorted([first] + values)
+    assert values[-1].int >> 80 > first.int >> 80
+
+
+async def test_new_wallets_get_uuid7(client: AsyncClient):
+    """Новые кошельки получают UUIDv7 в порядке создания."""
+    ids = [
+        uuid.UUID((await client.post("/api/v1/wallets")).json()["id"]) for _ in range(5)
+    ]
+    assert all(wallet_id.version == 7 for wallet_id in ids)
+    assert ids == sorted(ids)
+
+
+async def test_uuid4_wallet_still_valid(client: AsyncClient, router: ShardRouter):
+    """Кошелёк с UUIDv4, созданный до перехода на UUIDv7, работает как прежде."""
+    wallet_id = uuid.uuid4()
+    shard = await router.shard_for(wallet_id)
+    async with shard.session_factory() as session:
+        session.add(Wallet(id=wallet_id, balance=10000))
+        await session.commit()
+
+    response = await client.post(
+        f"/api/v1/wallets/{wallet_id}/operation",
+        json={"operation_type": "WITHDRAW", "amount": "25.00"},
+    )
+    assert response.status_code == 200
+    response = await client.get(f"/api/v1/wallets/{wallet_id}")
+    assert Decimal(response.json()["balance"]) == Decimal("75.00")
@@ -0,0 +1,276 @@
+"""
+Тесты адаптивного ограничения нагрузки.
+
+Покрывает AIMD-лимит, раздельные бюджеты чтения и записи,
+отклонение и прерывание по дедлайну клиента до фиксации транзакции
+и ответ 503 с Retry-After.
+"""
+
+import asyncio
+import time
+from decimal import Decimal
+
+import pytest
+from httpx import ASGITransport, AsyncClient
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+
+from app.load_shedding import (
+    AdaptiveLimit,
+    LoadShedder,
+    LoadSheddingMiddleware,
+    disarm_deadline,
+    load_shedder,
+)
+from app.repositories.wallet import WalletRepository
+
+pytestmark = pytest.mark.asyncio
+
+
+def make_client(shedder: LoadShedder, release: asyncio.Event) -> AsyncClient:
+    """Клиент к тестовому приложению, обработчики которого ждут release."""
+
+    async def endpoint(request: Request) -> JSONResponse:
+        await release.wait()
+        return JSONResponse({"ok": True})
+
+    test_app = Starlette(
+        routes=[
+            Route("/api/items", endpoint, methods=["GET", "POST"]),
+            Route("/docs", endpoint),
+        ]
+    )
+    transport = ASGITransport(app=LoadSheddingMiddleware(test_app, shedder=shedder))
+    return AsyncClient(transport=transport, base_url="http://test")
+
+
+async def test_aimd_decrease_and_increase():
+    """Медленный ответ уменьшает лимит, быстрые под нагрузкой — увеличивают."""
+    limit = AdaptiveLimit(
+        "test", max_limit=10, min_limit=2, target_latency_ms=50, backoff=0.5
+    )
+    assert limit.try_acquire()
+    limit.release(200)
+    assert limit.limit == 5
+
+    for _ in range(5):
+        assert limit.try_acquire()
+    assert not limit.try_acquire()
+    for _ in range(5):
+        limit.release(1)
+    assert 5 < limit.limit < 6
+
+
+async def test_aimd_probes_above_initial():
+    """Быстрые ответы под нагрузкой поднимают лимит выше начального до потолка."""
+    limit = AdaptiveLimit("test", max_limit=4, target_latency_ms=50, initial_limit=2)
+    assert limit.limit == 2
+
+    for _ in range(50):
+        while limit.try_acquire():
+            pass
+        for _ in range(limit.in_flight):
+            limit.release(1)
+    assert limit.limit == 4
+
+
+async def test_aimd_min_limit():
+    """Лимит не опускается ниже минимального."""
+    limit = AdaptiveLimit(
+        "test", max_limit=4, min_limit=2, target_latency_ms=50, backoff=0.5
+    )
+    for _ in range(10):
+        limit.try_acquire()
+        limit._last_decrease = 0.0
+        limit.release(0, overloaded=True)
+    assert limit.limit == 2
+
+
+async def test_excess_load_rejected():
+    """Запросы сверх лимита сразу получают 503 с Retry-After."""
+    shedder = LoadShedder(read_limit=2, write_limit=2, retry_after=3)
+    release = asyncio.Event()
+    async with make_client(shedder, release) as client:
+        pending = [asyncio.create_task(client.get("/api/items")) for _ in range(2)]
+        await asyncio.sleep(0.05)
+
+        response = await client.get("/api/items")
+        assert response.status_code == 503
+        assert response.headers["retry-after"] == "3"
+
+        release.set()
+        assert [r.status_code for r in await asyncio.gather(*pending)] == [200, 200]
+        assert shedder.read.in_flight == 0
+
+
+async def test_write_storm_does_not_starve_reads():
+    """Исчерпанный бюджет записи не мешает чтению."""
+    shedder = LoadShedder(read_limit=2, write_limit=2)
+    release = asyncio.Event()
+    async with make_client(shedder, release) as client:
+        pending = [asyncio.create_task(client.post("/api/items")) for _ in range(2)]
+        await asyncio.sleep(0.05)
+        assert (await client.post("/api/items")).status_code == 503
+
+        read = asyncio.create_task(client.get("/api/items"))
+        await asyncio.sleep(0.05)
+        assert shedder.read.in_flight == 1
+
+        release.set()
+        assert (await read).status_code == 200
+        await asyncio.gather(*pending)
+
+
+async def test_deadline_rejected():
+    """Запрос с дедлайном короче ожидаемой задержки отклоняется."""
+    shedder = LoadShedder()
+    shedder.read.latency_ms = 20
+    shedder.read._last_sample = time.monotonic()
+    release = asyncio.Event()
+    release.set()
+    async with make_client(shedder, release) as client:
+        response = await client.get("/api/items", headers={"X-Request-Timeout": "10"})
+        assert response.status_code == 503
+        assert "retry-after" in response.headers
+
+        response = await client.get("/api/items", headers={"X-Request-Timeout": "500"})
+        assert response.status_code == 200
+
+
+async def test_deadline_estimate_recovers():
+    """Без новых замеров оценка задержки убывает, и короткий дедлайн проходит."""
+    limit = AdaptiveLimit("test", max_limit=4, latency_half_life=0.1)
+    assert limit.try_acquire()
+    limit.release(300)
+    assert limit.expected_latency_ms() > 200
+
+    shedder = LoadShedder()
+    shedder.read = limit
+    release = asyncio.Event()
+    release.set()
+    async with make_client(shedder, release) as client:
+        response = await client.get("/api/items", headers={"X-Request-Timeout": "200"})
+        assert response.status_code == 503
+
+        await asyncio.sleep(0.2)
+        assert limit.expected_latency_ms() < 100
+        response = await client.get("/api/items", headers={"X-Request-Timeout": "200"})
+        assert response.status_code == 200
+
+
+async def test_deadline_expired_cancels_request():
+    """Принятый запрос прерывается с 504, когда истекает дедлайн клиента."""
+    shedder = LoadShedder()
+    cancelled = asyncio.Event()
+
+    async def endpoint(request: Request) -> JSONResponse:
+        try:
+            await asyncio.Event().wait()
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+        return JSONResponse({"ok": True})
+
+    test_app = Starlette(routes=[Route("/api/items", endpoint)])
+    transport = ASGITransport(app=LoadSheddingMiddleware(test_app, shedder=shedder))
+    async with AsyncClient(transport=transport, base_url="http://test") as client:
+        response = await client.get("/api/items", headers={"X-Request-Timeout": "50"})
+    assert response.status_code == 504
+    assert cancelled.is_set()
+    assert shedder.read.in_flight == 0
+
+
+async def test_deadline_not_applied_after_commit_starts():
+    """Дедлайн снимается перед фиксацией: начатая фиксация доводится до ответа."""
+    shedder = LoadShedder()
+    committed = asyncio.Event()
+
+    async def endpoint(request: Request) -> JSONResponse:
+        if request.query_params.get("late"):
+            # Дедлайн истекает до фиксации: запрос прерывается до COMMIT.
+            time.sleep(0.08)
+        await disarm_deadline()
+        await asyncio.sleep(0.08)
+        committed.set()
+        return JSONResponse({"ok": True})
+
+    test_app = Starlette(routes=[Route("/api/items", endpoint)])
+    transport = ASGITransport(app=LoadSheddingMiddleware(test_app, shedder=shedder))
+    headers = {"X-Request-Timeout": "50"}
+    async with AsyncClient(transport=transport, base_url="http://test") as client:
+        response = await client.get("/api/items", headers=headers)
+        assert response.status_code == 200
+        assert committed.is_set()
+
+        committed.clear()
+        shedder.read.latency_ms = 0
+        response = await client.get("/api/items?late=1", headers=headers)
+        assert response.status_code == 504
+        assert not committed.is_set()
+
+
+async def test_expired_deadline_rolls_back(
+    client: AsyncClient, funded_wallet_id: str, monkeypatch: pytest.MonkeyPatch
+):
+    """504 по дедлайну означает, что операция не применена."""
+    update_balance = WalletRepository.update_balance
+
+    async def slow_update_balance(self, wallet, new_balance):
+        updated = await update_balance(self, wallet, new_balance)
+        time.sleep(0.08)
+        return updated
+
+    monkeypatch.setattr(WalletRepository, "update_balance", slow_update_balance)
+    load_shedder.enabled = True
+    try:
+        response = await client.post(
+            f"/api/v1/wallets/{funded_wallet_id}/operation",
+            json={"operation_type": "DEPOSIT", "amount": "10.00"},
+            headers={"X-Request-Timeout": "50"},
+        )
+    finally:
+        load_shedder.enabled = False
+    assert response.status_code == 504
+
+    response = await client.get(f"/api/v1/wallets/{funded_wallet_id}")
+    assert Decimal(response.json()["balance"]) == Decimal("5000.00")
+
+
+@pytest.mark.parametrize("value", ["nan", "inf", "-inf", "0", "-5", "soon"])
+async def test_invalid_deadline_rejected(value: str):
+    """Нечисловой, бесконечный или неположительный дедлайн отклоняется с 400."""
+    shedder = LoadShedder()
+    release = asyncio.Event()
+    release.set()
+    async with make_client(shedder, release) as client:
+        response = await client.get("/api/items", headers={"X-Request-Timeout": value})
+    assert response.status_code == 400
+    assert shedder.read.in_flight == 0
+
+
+async def test_non_api_paths_not_limited():
+    """Пути вне /api/ не ограничиваются."""
+    shedder = LoadShedder(read_limit=1)
+    shedder.read.in_flight = 1
+    release = asyncio.Event()
+    release.set()
+    async with make_client(shedder, release) as client:
+        assert (await client.get("/docs")).status_code == 200
+        assert (await client.get("/api/items")).status_code == 503
+
+
+async def test_registered_in_app(client: AsyncClient, wallet_id: str):
+    """Middleware подключён к приложению и проверяет дедлайн клиента."""
+    load_shedder.enabled = True
+    try:
+        response = await client.get(f"/api/v1/wallets/{wallet_id}")
+        assert response.status_code == 200
+        response = await client.get(
+            f"/api/v1/wallets/{wallet_id}", headers={"X-Request-Timeout": "0"}
+        )
+        assert response.status_code == 400
+        assert load_shedder.read.in_flight == 0
+    finally:
+        load_shedder.enabled = False
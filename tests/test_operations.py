@@ -0,0 +1,251 @@
+"""
+Тесты асинхронного режима операций.
+
+Покрывает постановку операций в очередь, получение статуса,
+пакетное применение воркерами, сохранение порядка операций,
+справедливый выбор кошельков из очереди и синхронные операции
+по кошельку с очередью.
+"""
+
+import asyncio
+import uuid
+from decimal import Decimal
+
+import pytest
+from httpx import AsyncClient
+from sqlalchemy import select
+
+from app.configs.config import settings
+from app.database.database import ShardRouter
+from app.limiter import limiter
+from app.models.wallet import Wallet
+from app.repositories.operation import OperationRepository
+from app.schemas.wallet import OperationType
+from app.workers.operations import OperationWorkerPool
+
+pytestmark = pytest.mark.asyncio
+
+
+async def enqueue(
+    client: AsyncClient, wallet_id: str, operation_type: str, amount: str
+):
+    """Отправить операцию в режиме async."""
+    return await client.post(
+        f"/api/v1/wallets/{wallet_id}/operation",
+        params={"mode": "async"},
+        json={"operation_type": operation_type, "amount": amount},
+    )
+
+
+async def test_async_operation_accepted(client: AsyncClient, wallet_id: str):
+    """Операция в режиме async возвращает 202 и не меняет баланс сразу."""
+    response = await enqueue(client, wallet_id, "DEPOSIT", "100.00")
+    assert response.status_code == 202
+    data = response.json()
+    assert data["status"] == "PENDING"
+    assert data["wallet_id"] == wallet_id
+    assert response.headers["location"].endswith(f"/api/v1/operations/{data['id']}")
+
+    response = await client.get(f"/api/v1/wallets/{wallet_id}")
+    assert Decimal(response.json()["balance"]) == Decimal("0.00")
+
+
+async def test_async_operation_applied(
+    client: AsyncClient, wallet_id: str, operation_workers: OperationWorkerPool
+):
+    """После обработки воркером операция APPLIED, баланс обновлён."""
+    response = await enqueue(client, wallet_id, "DEPOSIT", "250.00")
+    operation_id = response.json()["id"]
+
+    assert await operation_workers.drain() == 1
+
+    response = await client.get(f"/api/v1/operations/{operation_id}")
+    assert response.status_code == 200
+    assert response.json()["status"] == "APPLIED"
+
+    response = await client.get(f"/api/v1/wallets/{wallet_id}")
+    assert Decimal(response.json()["balance"]) == Decimal("250.00")
+
+
+async def test_async_withdraw_insufficient_funds(
+    client: AsyncClient, wallet_id: str, operation_workers: OperationWorkerPool
+):
+    """Снятие без средств отклоняется при применении, очередь продолжается."""
+    withdraw = await enqueue(client, wallet_id, "WITHDRAW", "100.00")
+    deposit = await enqueue(client, wallet_id, "DEPOSIT", "300.00")
+
+    await operation_workers.drain()
+
+    response = await client.get(f"/api/v1/operations/{withdraw.json()['id']}")
+    assert response.json()["status"] == "REJECTED"
+    assert response.json()["detail"] == "Insufficient funds"
+
+    response = await client.get(f"/api/v1/operations/{deposit.json()['id']}")
+    assert response.json()["status"] == "APPLIED"
+
+    response = await client.get(f"/api/v1/wallets/{wallet_id}")
+    assert Decimal(response.json()["balance"]) == Decimal("300.00")
+
+
+async def test_async_operations_preserve_order(
+    client: AsyncClient, wallet_id: str, operation_workers: OperationWorkerPool
+):
+    """
+    Операции одного кошелька применяются в порядке поступления.
+
+    Пополнение на 100 и снятие 100 в этом порядке проходят оба;
+    следующее снятие отклоняется, даже если воркеров несколько.
+    """
+    await enqueue(client, wallet_id, "DEPOSIT", "100.00")
+    await enqueue(client, wallet_id, "WITHDRAW", "100.00")
+    last = await enqueue(client, wallet_id, "WITHDRAW", "100.00")
+
+    operation_workers.batch_size = 1
+    await asyncio.gather(operation_workers.drain(), operation_workers.drain())
+
+    response = await client.get(f"/api/v1/operations/{last.json()['id']}")
+    assert response.json()["status"] == "REJECTED"
+
+    response = await client.get(f"/api/v1/wallets/{wallet_id}")
+    assert Decimal(response.json()["balance"]) == Decimal("0.00")
+
+
+async def test_busy_wallet_does_not_starve_others(
+    client: AsyncClient,
+    wallet_id: str,
+    router: ShardRouter,
+    operation_workers: OperationWorkerPool,
+):
+    """Длинная очередь занятого кошелька не мешает воркерам брать другие."""
+    busy = uuid.UUID((await client.post("/api/v1/wallets")).json()["id"])
+    shard = await router.shard_for(busy)
+    async with shard.session_factory() as session:
+        repo = OperationRepository(session)
+        for _ in range(150):
+            await repo.create(busy, OperationType.DEPOSIT, 100)
+        await session.commit()
+    last = await enqueue(client, wallet_id, "DEPOSIT", "1.00")
+
+    # Кошелёк с длинной очередью занят другим воркером.
+    async with shard.session_factory() as session:
+        await session.execute(select(Wallet).where(Wallet.id == busy).with_for_update())
+        assert (
+            await operation_workers.run_once(
+                await router.shard_for(uuid.UUID(wallet_id))
+            )
+            == 1
+        )
+        await session.commit()
+
+    response = await client.get(f"/api/v1/operations/{last.json()['id']}")
+    assert response.json()["status"] == "APPLIED"
+
+
+async def test_sync_operation_waits_for_queue(client: AsyncClient, wallet_id: str):
+    """Синхронная операция применяется после уже принятых в очередь."""
+    queued = await enqueue(client, wallet_id, "DEPOSIT", "100.00")
+
+    response = await client.post(
+        f"/api/v1/wallets/{wallet_id}/operation",
+        json={"operation_type": "WITHDRAW", "amount": "100.00"},
+    )
+    assert response.status_code == 200
+    assert Decimal(response.json()["balance"]) == Decimal("0.00")
+
+    response = await client.get(f"/api/v1/operations/{queued.json()['id']}")
+    assert response.json()["status"] == "APPLIED"
+
+
+async def test_conditional_operation_with_queue(client: AsyncClient, wallet_id: str):
+    """If-Match сверяется с версией до очереди: ETag из GET остаётся годным."""
+    etag = (await client.get(f"/api/v1/wallets/{wallet_id}")).headers["etag"]
+    queued = await enqueue(client, wallet_id, "DEPOSIT", "100.00")
+    assert (await client.get(f"/api/v1/wallets/{wallet_id}")).headers["etag"] == etag
+
+    response = await client.post(
+        f"/api/v1/wallets/{wallet_id}/operation",
+        headers={"If-Match": etag},
+        json={"operation_type": "WITHDRAW", "amount": "100.00"},
+    )
+    assert response.status_code == 200
+    assert Decimal(response.json()["balance"]) == Decimal("0.00")
+    response = await client.get(f"/api/v1/operations/{queued.json()['id']}")
+    assert response.json()["status"] == "APPLIED"
+
+    await enqueue(client, wallet_id, "DEPOSIT", "100.00")
+    response = await client.post(
+        f"/api/v1/wallets/{wallet_id}/operation",
+        headers={"If-Match": etag},
+        json={"operation_type": "DEPOSIT", "amount": "1.00"},
+    )
+    assert response.status_code == 412
+
+
+async def test_sync_operation_queued_behind_long_queue(
+    client: AsyncClient,
+    wallet_id: str,
+    operation_workers: OperationWorkerPool,
+    monkeypatch: pytest.MonkeyPatch,
+):
+    """За длинной очередью синхронная операция встаёт в её конец: 202."""
+    monkeypatch.setattr(settings, "operation_sync_drain_limit", 2)
+    queued = [await enqueue(client, wallet_id, "DEPOSIT", "10.00") for _ in range(3)]
+
+    response = await client.post(
+        f"/api/v1/wallets/{wallet_id}/operation",
+        json={"operation_type": "WITHDRAW", "amount": "30.00"},
+    )
+    assert response.status_code == 202
+    assert response.headers["retry-after"] == "1"
+    assert response.headers["location"].endswith(response.json()["id"])
+    statuses = [
+        (await client.get(f"/api/v1/operations/{q.json()['id']}")).json()["status"]
+        for q in queued
+    ]
+    assert statuses == ["APPLIED", "APPLIED", "PENDING"]
+    response = await client.get(f"/api/v1/wallets/{wallet_id}")
+    assert Decimal(response.json()["balance"]) == Decimal("20.00")
+
+    assert await operation_workers.drain() == 2
+    response = await client.get(f"/api/v1/wallets/{wallet_id}")
+    assert Decimal(response.json()["balance"]) == Decimal("0.00")
+
+
+async def test_async_operations_have_own_rate_limit(
+    client: AsyncClient, wallet_id: str
+):
+    """Очередь не упирается в лимит синхронных операций (10/мин)."""
+    limiter.reset()
+    limiter.enabled = True
+    try:
+        for _ in range(15):
+            response = await enqueue(client, wallet_id, "DEPOSIT", "1.00")
+            assert response.status_code == 202
+        for _ in range(10):
+            response = await client.post(
+                f"/api/v1/wallets/{wallet_id}/operation",
+                json={"operation_type": "DEPOSIT", "amount": "1.00"},
+            )
+            assert response.status_code == 200
+        response = await client.post(
+            f"/api/v1/wallets/{wallet_id}/operation",
+            json={"operation_type": "DEPOSIT", "amount": "1.00"},
+        )
+        assert response.status_code == 429
+    finally:
+        limiter.enabled = False
+        limiter.reset()
+
+
+async def test_async_operation_not_found_wallet(client: AsyncClient):
+    """Постановка операции для несуществующего кошелька возвращает 404."""
+    fake_id = "00000000-0000-0000-0000-000000000000"
+    response = await enqueue(client, fake_id, "DEPOSIT", "100.00")
+    assert response.status_code == 404
+
+
+async def test_get_operation_not_found(client: AsyncClient):
+    """Запрос несуществующей операции возвращает 404."""
+    fake_id = "00000000-0000-0000-0000-000000000000"
+    response = await client.get(f"/api/v1/operations/{fake_id}")
+    assert response.status_code == 404
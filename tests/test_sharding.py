@@ -0,0 +1,429 @@
+"""
+Тесты шардирования кошельков.
+
+Поднимает несколько локальных баз PostgreSQL как шарды и покрывает
+размещение кошельков, первую раздачу слотов для новой и заполненной
+базы, операции и холды на шардах, пакетное чтение
+через несколько шардов и онлайн-перенос слотов, включая списание холда
+во время переноса, возобновление прерванного переноса и устаревшую
+карту слотов в другом процессе.
+"""
+
+import asyncio
+import uuid
+from collections.abc import AsyncGenerator, Awaitable, Callable
+from decimal import Decimal
+
+import pytest
+from httpx import AsyncClient
+from sqlalchemy import select, text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from app.configs.config import settings
+from app.database.database import (
+    ShardRouter,
+    ShardSessions,
+    SlotStatus,
+    get_sessions,
+    shard_slots,
+)
+from app.database.rebalance import SlotMover
+from app.main import app
+from app.models.wallet import Wallet
+from app.schemas.accrual import AccrualKind, AccrualRule
+from app.schemas.wallet import OperationType
+from app.services.hold import HoldService
+from app.services.wallet import WalletService
+from app.workers.accruals import AccrualRunner
+from app.workers.operations import OperationWorkerPool
+
+pytestmark = pytest.mark.asyncio
+
+SHARD_COUNT = 3
+SLOTS = 16
+
+
+def shard_url(index: int) -> str:
+    """DSN тестового шарда."""
+    return settings.model_copy(
+        update={"db_name": f"{settings.db_name}_shard{index}"}
+    ).database_url
+
+
+@pytest.fixture
+async def sharded() -> AsyncGenerator[ShardRouter, None]:
+    """Три пустые базы-шарда и маршрутизатор, подключённый к приложению."""
+    admin = create_async_engine(settings.database_url, isolation_level="AUTOCOMMIT")
+    async with admin.connect() as conn:
+        for index in range(SHARD_COUNT):
+            name = f"{settings.db_name}_shard{index}"
+            exists = await conn.scalar(
+                text("SELECT 1 FROM pg_database WHERE datname = :name"),
+                {"name": name},
+            )
+            if not exists:
+                await conn.execute(text(f'CREATE DATABASE "{name}"'))
+    await admin.dispose()
+
+    router = ShardRouter([shard_url(i) for i in range(SHARD_COUNT)], slots=SLOTS)
+    for shard in router.shards:
+        async with shard.engine.begin() as conn:
+            await conn.run_sync(Wallet.metadata.create_all)
+            await conn.execute(
+                text("TRUNCATE wallets, shard_slots, accrual_runs CASCADE")
+            )
+
+    async def override_get_sessions() -> AsyncGenerator[ShardSessions, None]:
+        async with ShardSessions(router) as sessions:
+            yield sessions
+
+    app.dependency_overrides[get_sessions] = override_get_sessions
+    yield router
+    await router.dispose()
+
+
+async def wallet_shards(router: ShardRouter, wallet_id: str) -> list[int]:
+    """Индексы шардов, на которых лежит строка кошелька."""
+    found = []
+    for shard in router.shards:
+        async with shard.session_factory() as session:
+            if await session.get(Wallet, uuid.UUID(wallet_id)) is not None:
+                found.append(shard.index)
+    return found
+
+
+async def test_wallets_placed_by_slot(client: AsyncClient, sharded: ShardRouter):
+    """Кошелёк создаётся на шарде-владельце своего слота."""
+    per_shard = [0] * SHARD_COUNT
+    for _ in range(30):
+        wallet_id = (await client.post("/api/v1/wallets")).json()["id"]
+        expected = (await sharded.shard_for(uuid.UUID(wallet_id))).index
+        assert await wallet_shards(sharded, wallet_id) == [expected]
+        per_shard[expected] += 1
+    assert all(per_shard)
+
+
+async def test_shards_added_to_populated_database(
+    client: AsyncClient, sharded: ShardRouter
+):
+    """Шарды, добавленные к базе с кошельками, не прячут существующие кошельки."""
+    ids = [uuid.uuid4() for _ in range(30)]
+    async with sharded.shards[0].session_factory() as session:
+        await session.execute(
+            text(
+                "INSERT INTO wallets (id, balance) "
+                "SELECT unnest(CAST(:ids AS uuid[])), 100"
+            ),
+            {"ids": ids},
+        )
+        await session.commit()
+
+    await sharded.refresh()
+    assert await sharded.owners() == [0] * SLOTS
+    for wallet_id in ids:
+        response = await client.get(f"/api/v1/wallets/{wallet_id}")
+        assert response.status_code == 200
+
+    await SlotMover(sharded, pause=0).move_many(await SlotMover(sharded).plan_even())
+    assert len(set(await sharded.owners())) == SHARD_COUNT
+    for wallet_id in ids:
+        response = await client.get(f"/api/v1/wallets/{wallet_id}")
+        assert Decimal(response.json()["balance"]) == Decimal("1.00")
+
+
+async def test_operations_across_shards(
+    client: AsyncClient,
+    sharded: ShardRouter,
+    create_funded: Callable[..., Awaitable[str]],
+):
+    """Операции, холды, очередь и пакетное чтение работают на всех шардах."""
+    ids = [await create_funded() for _ in range(12)]
+    assert len({(await sharded.shard_for(uuid.UUID(i))).index for i in ids}) > 1
+
+    hold = await client.post(
+        f"/api/v1/wallets/{ids[0]}/holds", json={"amount": "40.00"}
+    )
+    capture = await client.post(f"/api/v1/holds/{hold.json()['id']}/capture")
+    assert capture.status_code == 200
+
+    await client.post(
+        f"/api/v1/wallets/{ids[1]}/operation",
+        params={"mode": "async"},
+        json={"operation_type": "WITHDRAW", "amount": "30.00"},
+    )
+    assert await OperationWorkerPool(router=sharded).drain() == 1
+
+    missing = str(uuid.uuid4())
+    response = await client.post("/api/v1/wallets/batch", json={"ids": ids + [missing]})
+    data = response.json()
+    balances = {w["id"]: Decimal(w["balance"]) for w in data["wallets"]}
+    assert balances[ids[0]] == Decimal("60.00")
+    assert balances[ids[1]] == Decimal("70.00")
+    assert all(balances[i] == Decimal("100.00") for i in ids[2:])
+    assert data["missing"] == [missing]
+
+
+async def test_lookup_by_id_on_any_shard(
+    client: AsyncClient,
+    sharded: ShardRouter,
+    create_funded: Callable[..., Awaitable[str]],
+):
+    """Холд и операция находятся по id, на каком бы шарде они ни лежали."""
+    ids = [await create_funded() for _ in range(12)]
+    shards = {(await sharded.shard_for(uuid.UUID(i))).index for i in ids}
+    assert len(shards) > 1
+
+    for wallet_id in ids:
+        hold = await client.post(
+            f"/api/v1/wallets/{wallet_id}/holds", json={"amount": "1.00"}
+        )
+        response = await client.get(f"/api/v1/holds/{hold.json()['id']}")
+        assert response.json()["wallet_id"] == wallet_id
+        response = await client.post(f"/api/v1/holds/{hold.json()['id']}/release")
+        assert response.json()["status"] == "RELEASED"
+
+        operation = await client.post(
+            f"/api/v1/wallets/{wallet_id}/operation",
+            params={"mode": "async"},
+            json={"operation_type": "DEPOSIT", "amount": "1.00"},
+        )
+        response = await client.get(f"/api/v1/operations/{operation.json()['id']}")
+        assert response.json()["wallet_id"] == wallet_id
+
+    missing = uuid.uuid4()
+    assert (await client.get(f"/api/v1/holds/{missing}")).status_code == 404
+    assert (await client.get(f"/api/v1/operations/{missing}")).status_code == 404
+
+
+async def test_move_slot(
+    client: AsyncClient,
+    sharded: ShardRouter,
+    create_funded: Callable[..., Awaitable[str]],
+):
+    """Перенос слота переносит кошелёк с холдами и очередью операций."""
+    wallet_id = await create_funded()
+    hold_id = (
+        await client.post(
+            f"/api/v1/wallets/{wallet_id}/holds", json={"amount": "10.00"}
+        )
+    ).json()["id"]
+    await client.post(
+        f"/api/v1/wallets/{wallet_id}/operation",
+        params={"mode": "async"},
+        json={"operation_type": "DEPOSIT", "amount": "5.00"},
+    )
+    stale = ShardRouter([shard_url(i) for i in range(SHARD_COUNT)], slots=SLOTS)
+    await stale.refresh()
+
+    slot = sharded.slot_for(uuid.UUID(wallet_id))
+    source = (await sharded.shard_for(uuid.UUID(wallet_id))).index
+    target = (source + 1) % SHARD_COUNT
+    assert await SlotMover(sharded, pause=0).move(slot, target) >= 1
+    assert await wallet_shards(sharded, wallet_id) == [target]
+
+    async with ShardSessions(stale) as sessions:
+        wallet = await WalletService(sessions).get_wallet(uuid.UUID(wallet_id))
+    assert wallet.balance == 10000
+    assert (await stale.shard_for(uuid.UUID(wallet_id))).index == target
+    await stale.dispose()
+
+    assert await OperationWorkerPool(router=sharded).drain() == 1
+    response = await client.post(f"/api/v1/holds/{hold_id}/capture")
+    assert response.status_code == 200
+    response = await client.get(f"/api/v1/wallets/{wallet_id}")
+    assert Decimal(response.json()["balance"]) == Decimal("95.00")
+
+
+async def test_move_slot_under_load(
+    client: AsyncClient,
+    sharded: ShardRouter,
+    create_funded: Callable[..., Awaitable[str]],
+):
+    """Операции, идущие во время переноса, не теряются."""
+    wallet_id = await create_funded()
+    slot = sharded.slot_for(uuid.UUID(wallet_id))
+    target = ((await sharded.shard_for(uuid.UUID(wallet_id))).index + 1) % SHARD_COUNT
+    mover = SlotMover(
+        ShardRouter([shard_url(i) for i in range(SHARD_COUNT)], slots=SLOTS), pause=0
+    )
+
+    async def deposit():
+        return await client.post(
+            f"/api/v1/wallets/{wallet_id}/operation",
+            json={"operation_type": "DEPOSIT", "amount": "1.00"},
+        )
+
+    results = await asyncio.gather(
+        *[deposit() for _ in range(10)],
+        mover.move(slot, target),
+        *[deposit() for _ in range(10)],
+    )
+    await mover.router.dispose()
+    applied = sum(r.status_code == 200 for r in results[:10] + results[11:])
+    assert all(r.status_code in (200, 503) for r in results[:10] + results[11:])
+
+    assert await wallet_shards(sharded, wallet_id) == [target]
+    response = await client.get(f"/api/v1/wallets/{wallet_id}")
+    assert Decimal(response.json()["balance"]) == Decimal("100.00") + applied
+
+
+async def test_capture_during_move(
+    client: AsyncClient,
+    sharded: ShardRouter,
+    monkeypatch: pytest.MonkeyPatch,
+    create_funded: Callable[..., Awaitable[str]],
+):
+    """Списание холда, начатое до переноса, не взаимоблокируется с ним."""
+    wallet_id = await create_funded()
+    hold_id = (
+        await client.post(
+            f"/api/v1/wallets/{wallet_id}/holds", json={"amount": "40.00"}
+        )
+    ).json()["id"]
+    slot = sharded.slot_for(uuid.UUID(wallet_id))
+    target = ((await sharded.shard_for(uuid.UUID(wallet_id))).index + 1) % SHARD_COUNT
+    mover = SlotMover(
+        ShardRouter([shard_url(i) for i in range(SHARD_COUNT)], slots=SLOTS), pause=0
+    )
+
+    # capture заблокировал холд и ждёт, пока перенос начнётся.
+    hold_locked = asyncio.Event()
+    lock_wallet = HoldService._lock_wallet
+
+    async def lock_wallet_after_move_started(self, session, hold):
+        hold_locked.set()
+        await asyncio.sleep(0.2)
+        return await lock_wallet(self, session, hold)
+
+    monkeypatch.setattr(HoldService, "_lock_wallet", lock_wallet_after_move_started)
+    capture = asyncio.create_task(client.post(f"/api/v1/holds/{hold_id}/capture"))
+    await hold_locked.wait()
+    moved, response = await asyncio.gather(mover.move(slot, target), capture)
+    await mover.router.dispose()
+
+    assert moved >= 1
+    assert response.status_code == 200
+    assert await wallet_shards(sharded, wallet_id) == [target]
+    response = await client.get(f"/api/v1/holds/{hold_id}")
+    assert response.json()["status"] == "CAPTURED"
+    response = await client.get(f"/api/v1/wallets/{wallet_id}")
+    assert Decimal(response.json()["balance"]) == Decimal("60.00")
+
+
+async def test_create_with_stale_map(client: AsyncClient, sharded: ShardRouter):
+    """Процесс с устаревшей картой не создаёт кошельки на старом шарде."""
+    await sharded.refresh()
+    mover = SlotMover(
+        ShardRouter([shard_url(i) for i in range(SHARD_COUNT)], slots=SLOTS), pause=0
+    )
+    for slot in range(0, SLOTS, 3):
+        await mover.move(slot, (slot + 1) % SHARD_COUNT)
+    await mover.router.dispose()
+
+    for _ in range(40):
+        wallet_id = (await client.post("/api/v1/wallets")).json()["id"]
+        expected = (await sharded.shard_for(uuid.UUID(wallet_id))).index
+        assert await wallet_shards(sharded, wallet_id) == [expected]
+
+
+async def test_resume_interrupted_move(
+    client: AsyncClient,
+    sharded: ShardRouter,
+    create_funded: Callable[..., Awaitable[str]],
+):
+    """Прерванный перенос завершается повторным запуском без потерь и дублей."""
+    wallet_id = await create_funded()
+    slot = sharded.slot_for(uuid.UUID(wallet_id))
+    source = (await sharded.shard_for(uuid.UUID(wallet_id))).index
+    target = (source + 1) % SHARD_COUNT
+    mover = SlotMover(sharded, pause=0)
+
+    # Сбой после копирования на целевой шард, до удаления с исходного.
+    async with (
+        sharded.shards[target].session_factory() as dst,
+        sharded.shards[source].session_factory() as src,
+    ):
+        await mover._prepare(dst, slot)
+        await mover._copy(src, dst, slot)
+        await dst.commit()
+    response = await client.get(f"/api/v1/wallets/{wallet_id}")
+    assert Decimal(response.json()["balance"]) == Decimal("100.00")
+
+    await mover.move(slot, target)
+    assert await wallet_shards(sharded, wallet_id) == [target]
+
+    # Сбой после удаления с исходного шарда, до передачи владения.
+    async with sharded.shards[target].session_factory() as session:
+        await session.execute(
+            shard_slots.update()
+            .where(shard_slots.c.slot == slot)
+            .values(status=SlotStatus.INCOMING)
+        )
+        await session.commit()
+    await sharded.refresh()
+    response = await client.get(f"/api/v1/wallets/{wallet_id}")
+    assert response.status_code == 503
+    assert "retry-after" in response.headers
+
+    await mover.move(slot, target)
+    response = await client.get(f"/api/v1/wallets/{wallet_id}")
+    assert Decimal(response.json()["balance"]) == Decimal("100.00")
+
+
+async def test_accrual_during_move(
+    client: AsyncClient,
+    sharded: ShardRouter,
+    create_funded: Callable[..., Awaitable[str]],
+):
+    """Начисление при переносе слота затрагивает каждый кошелёк ровно один раз."""
+    ids = [await create_funded() for _ in range(6)]
+    moving = ids[-1]
+    while await wallet_shards(sharded, moving) != [1]:
+        moving = await create_funded()
+        ids.append(moving)
+    runner = AccrualRunner(sharded, chunk_size=2, pause=0)
+    run_shard = runner._run_shard
+
+    async def run_shard_then_move(run_id, rule, shard):
+        await run_shard(run_id, rule, shard)
+        if shard.index == 0 and await wallet_shards(sharded, moving) == [1]:
+            # Кошелёк ещё не начислен и переезжает на пройденный шард.
+            await SlotMover(sharded, pause=0).move(
+                sharded.slot_for(uuid.UUID(moving)), 0
+            )
+
+    runner._run_shard = run_shard_then_move
+    rule = AccrualRule(
+        operation_type=OperationType.DEPOSIT,
+        kind=AccrualKind.FIXED,
+        value=Decimal("1.00"),
+    )
+    assert await runner.run("bonus", rule) == (len(ids), 100 * len(ids))
+
+    assert await wallet_shards(sharded, moving) == [0]
+    response = await client.post("/api/v1/wallets/batch", json={"ids": ids})
+    balances = [Decimal(w["balance"]) for w in response.json()["wallets"]]
+    assert balances == [Decimal("101.00")] * len(ids)
+
+
+async def test_plan_even(sharded: ShardRouter):
+    """План выравнивания возвращает слоты на недогруженные шарды."""
+    mover = SlotMover(sharded, pause=0)
+    assert await mover.plan_even() == []
+
+    for slot in (1, 2, 4, 5):
+        await mover.move(slot, 0)
+    moves = await mover.plan_even()
+    assert len(moves) == 4
+    await mover.move_many(moves)
+
+    counts = [0] * SHARD_COUNT
+    for shard in sharded.shards:
+        async with shard.session_factory() as session:
+            rows = await session.execute(
+                select(shard_slots.c.slot).where(
+                    shard_slots.c.status == SlotStatus.OWNED
+                )
+            )
+            counts[shard.index] = len(rows.all())
+    assert sorted(counts) == [5, 5, 6]
@@ -0,0 +1,232 @@
+"""
+Тесты трассировки запросов.
+
+Покрывает span-ы, заголовок Server-Timing, выгрузку трасс в OTLP/JSON,
+журнал медленных запросов и запись SQL-запросов.
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from collections.abc import AsyncGenerator
+
+import pytest
+from httpx import ASGITransport, AsyncClient
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from app.configs.config import settings
+from app.limiter import limiter
+from app.main import app
+from app.tracing import (
+    FileSpanExporter,
+    TracingMiddleware,
+    finish_trace,
+    instrument_engine,
+    span,
+    start_trace,
+)
+
+pytestmark = pytest.mark.asyncio
+
+
+@pytest.fixture
+def traces_path(tmp_path) -> str:
+    """Путь к файлу выгрузки трасс."""
+    return str(tmp_path / "traces.jsonl")
+
+
+@pytest.fixture
+async def exporter(traces_path: str) -> AsyncGenerator[FileSpanExporter, None]:
+    """Экспортёр трасс во временный файл."""
+    exporter = FileSpanExporter(traces_path)
+    yield exporter
+    exporter.close()
+
+
+@pytest.fixture
+async def traced_client(
+    exporter: FileSpanExporter,
+) -> AsyncGenerator[AsyncClient, None]:
+    """HTTP-клиент приложения, обёрнутого в TracingMiddleware."""
+    traced_app = TracingMiddleware(app, exporter=exporter, slow_request_ms=0)
+    transport = ASGITransport(app=traced_app)
+    async with AsyncClient(transport=transport, base_url="http://test") as ac:
+        yield ac
+
+
+async def test_span_outside_trace_is_noop():
+    """Вне трассы span() возвращает общий no-op объект."""
+    first = span("db.lock")
+    with first as current:
+        current.set_attribute("key", "value")
+    assert span("db.update") is first
+
+
+async def test_nested_spans():
+    """Вложенные span-ы получают родителя из текущего контекста."""
+    trace, token = start_trace("test")
+    with span("outer") as outer:
+        with span("inner"):
+            pass
+    finish_trace(trace, token)
+
+    inner = trace.spans[-1]
+    assert inner.name == "inner"
+    assert inner.parent_id == outer.span.span_id
+    assert outer.span.parent_id == trace.root.span_id
+    assert span("after") is not outer
+
+
+async def test_server_timing_header(
+    traced_client: AsyncClient, wallet_id: str, traces_path: str
+):
+    """Ответ содержит Server-Timing с фазами операции."""
+    response = await traced_client.post(
+        f"/api/v1/wallets/{wallet_id}/operation",
+        json={"operation_type": "DEPOSIT", "amount": "10.00"},
+    )
+    assert response.status_code == 200
+    metrics = {
+        item.split(";")[0].strip()
+        for item in response.headers["server-timing"].split(",")
+    }
+    assert {"handler", "db.lock", "db.update", "db.commit", "serialize"} <= metrics
+    assert "total" in metrics
+
+
+async def test_limiter_span_covers_stacked_limits(
+    traced_client: AsyncClient,
+    wallet_id: str,
+    exporter: FileSpanExporter,
+    traces_path: str,
+    monkeypatch,
+):
+    """Проверка всех лимитов эндпоинта записывается одним span-ом до handler."""
+    checks = []
+    check = limiter._check_request_limit
+
+    def slow_check(*args, **kwargs):
+        started = time.time_ns()
+        check(*args, **kwargs)
+        time.sleep(0.02)
+        checks.append((started, time.time_ns()))
+
+    monkeypatch.setattr(limiter, "_check_request_limit", slow_check)
+    limiter.reset()
+    limiter.enabled = True
+    try:
+        response = await traced_client.post(
+            f"/api/v1/wallets/{wallet_id}/operation",
+            json={"operation_type": "DEPOSIT", "amount": "10.00"},
+        )
+    finally:
+        limiter.enabled = False
+        limiter.reset()
+    assert response.status_code == 200
+    assert "limiter;dur=" in response.headers["server-timing"]
+
+    exporter.flush()
+    with open(traces_path) as f:
+        spans = json.loads(f.readline())["resourceSpans"][0]["scopeSpans"][0]["spans"]
+    names = [s["name"] for s in spans]
+    assert names.count("limiter") == 1
+    limiter_span = spans[names.index("limiter")]
+    handler = spans[names.index("handler")]
+    assert checks
+    assert int(limiter_span["startTimeUnixNano"]) <= checks[0][0]
+    assert int(limiter_span["endTimeUnixNano"]) >= checks[-1][1]
+    assert int(limiter_span["endTimeUnixNano"]) <= int(handler["startTimeUnixNano"])
+
+
+async def test_spans_exported_as_otlp(
+    traced_client: AsyncClient,
+    wallet_id: str,
+    exporter: FileSpanExporter,
+    traces_path: str,
+):
+    """Трасса запроса выгружается в файл одной строкой OTLP/JSON."""
+    await traced_client.get(f"/api/v1/wallets/{wallet_id}")
+    exporter.flush()
+
+    with open(traces_path) as f:
+        exported = [json.loads(line) for line in f]
+    assert len(exported) == 1
+
+    spans = exported[0]["resourceSpans"][0]["scopeSpans"][0]["spans"]
+    root = spans[0]
+    assert root["name"] == "GET /api/v1/wallets/{wallet_id}"
+    assert "parentSpanId" not in root
+    assert len({s["traceId"] for s in spans}) == 1
+    assert all(s["parentSpanId"] for s in spans[1:])
+
+
+async def test_exporter_writes_in_background(
+    traces_path: str, monkeypatch: pytest.MonkeyPatch
+):
+    """export() не пишет в файл сам: трассы пишет фоновый поток пачками."""
+    release = threading.Event()
+    batches = []
+    write = FileSpanExporter._write
+
+    def slow_write(self, traces):
+        release.wait()
+        batches.append(len(traces))
+        write(self, traces)
+
+    monkeypatch.setattr(FileSpanExporter, "_write", slow_write)
+    exporter = FileSpanExporter(traces_path, batch_size=10)
+    for number in range(25):
+        trace, token = start_trace(f"request {number}")
+        finish_trace(trace, token)
+        exporter.export(trace)
+    assert not os.path.exists(traces_path)
+
+    release.set()
+    exporter.close()
+
+    with open(traces_path) as f:
+        names = [
+            json.loads(line)["resourceSpans"][0]["scopeSpans"][0]["spans"][0]["name"]
+            for line in f
+        ]
+    assert names == [f"request {number}" for number in range(25)]
+    assert max(batches) == 10
+    assert len(batches) < 25
+
+
+async def test_slow_request_logged(
+    traced_client: AsyncClient, wallet_id: str, caplog: pytest.LogCaptureFixture
+):
+    """Запрос дольше порога пишется в лог с деревом span-ов."""
+    logger = logging.getLogger("wallet_api")
+    logger.addHandler(caplog.handler)
+    try:
+        await traced_client.get(f"/api/v1/wallets/{wallet_id}")
+    finally:
+        logger.removeHandler(caplog.handler)
+
+    records = [r for r in caplog.records if "Медленный запрос" in r.getMessage()]
+    assert len(records) == 1
+    assert "handler" in records[0].getMessage()
+
+
+async def test_sql_statements_recorded():
+    """SQL-запросы инструментированного движка попадают в трассу."""
+    engine = create_async_engine(settings.database_url, echo=False)
+    instrument_engine(engine.sync_engine)
+    trace, token = start_trace("test")
+    try:
+        with span("db.select"):
+            async with engine.connect() as conn:
+                await conn.execute(text("SELECT 1"))
+    finally:
+        finish_trace(trace, token)
+        await engine.dispose()
+
+    statements = [s for s in trace.spans if s.name == "db.sql"]
+    assert any(s.attributes["db.statement"] == "SELECT 1" for s in statements)
+    select_span = next(s for s in trace.spans if s.name == "db.select")
+    assert all(s.parent_id == select_span.span_id for s in statements)
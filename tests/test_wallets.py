@@ -1,16 +1,19 @@
 """
 Тесты эндпоинтов Wallet API.
 
-Покрывает CRUD-операции, валидацию, обработку ошибок
+Покрывает CRUD-операции, пакетное чтение, валидацию, обработку ошибок
 и корректность работы в конкурентной среде.
 """
 
 import asyncio
+import uuid
 from decimal import Decimal
 
 import pytest
 from httpx import AsyncClient
 
+from app.schemas.wallet import MAX_BATCH_WALLET_IDS
+
 pytestmark = pytest.mark.asyncio
 
 
@@ -78,6 +81,25 @@ async def test_invalid_amount(client: AsyncClient, wallet_id: str):
     assert response.status_code == 422
 
 
+async def test_invalid_amount_precision(client: AsyncClient, wallet_id: str):
+    """Сумма точнее копейки возвращает 422: баланс хранится в копейках."""
+    response = await client.post(
+        f"/api/v1/wallets/{wallet_id}/operation",
+        json={"operation_type": "DEPOSIT", "amount": "10.001"},
+    )
+    assert response.status_code == 422
+
+
+async def test_deposit_fractional_amount(client: AsyncClient, wallet_id: str):
+    """Копейки сохраняются без потерь при переводе в минорные единицы."""
+    response = await client.post(
+        f"/api/v1/wallets/{wallet_id}/operation",
+        json={"operation_type": "DEPOSIT", "amount": "0.07"},
+    )
+    assert response.status_code == 200
+    assert response.json()["balance"] == "0.07"
+
+
 async def test_operation_not_found_wallet(client: AsyncClient):
     """Операция над несуществующим кошельком возвращает 404."""
     fake_id = "00000000-0000-0000-0000-000000000000"
@@ -133,3 +155,44 @@ async def test_concurrent_withdrawals(client: AsyncClient, funded_wallet_id: str
 
     response = await client.get(f"/api/v1/wallets/{funded_wallet_id}")
     assert Decimal(response.json()["balance"]) == Decimal("0.00")
+
+
+async def test_get_wallets_batch(
+    client: AsyncClient, wallet_id: str, funded_wallet_id: str
+):
+    """Пакетный запрос возвращает кошельки в порядке запроса и список missing."""
+    fake_id = "00000000-0000-0000-0000-000000000000"
+    response = await client.post(
+        "/api/v1/wallets/batch",
+        json={"ids": [funded_wallet_id, fake_id, wallet_id, funded_wallet_id]},
+    )
+    assert response.status_code == 200
+    data = response.json()
+    assert [w["id"] for w in data["wallets"]] == [funded_wallet_id, wallet_id]
+    assert Decimal(data["wallets"][0]["balance"]) == Decimal("5000.00")
+    assert data["missing"] == [fake_id]
+
+
+async def test_get_wallets_batch_matches_get_wallet(
+    client: AsyncClient, funded_wallet_id: str
+):
+    """Кошелёк в пакетном ответе записан так же, как в GET /wallets/{id}."""
+    await client.post(
+        f"/api/v1/wallets/{funded_wallet_id}/holds", json={"amount": "0.05"}
+    )
+    single = (await client.get(f"/api/v1/wallets/{funded_wallet_id}")).json()
+    response = await client.post(
+        "/api/v1/wallets/batch", json={"ids": [funded_wallet_id]}
+    )
+    assert response.json()["wallets"] == [single]
+    assert single["available"] == "4999.95"
+
+
+async def test_get_wallets_batch_limit(client: AsyncClient):
+    """Пустой список и список длиннее лимита возвращают 422."""
+    response = await client.post("/api/v1/wallets/batch", json={"ids": []})
+    assert response.status_code == 422
+
+    ids = [str(uuid.uuid4()) for _ in range(MAX_BATCH_WALLET_IDS + 1)]
+    response = await client.post("/api/v1/wallets/batch", json={"ids": ids})
+    assert response.status_code == 422